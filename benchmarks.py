@@ -0,0 +1,694 @@
+""" Time the faster replacements for parts of excel_to_ppt.py against the code they replaced.
+
+    Typical usage, to time tidy_text on the December workbook scaled up to 20 times its size:
+        py benchmarks.py --ifile=Insights_thru_Dec1.xlsx -r9 --scale=20 tidy_text
+
+    Each benchmark prints its timings, plus how many results differ between the old and new code.
+"""
+import pandas as pd
+import time
+import sys, getopt
+import configparser
+import json
+import re
+import os
+import io
+import tracemalloc
+import functools
+from collections import Counter
+from synonym_normalizer import SynonymNormalizer
+from keyword_matcher import KeywordMatcher
+from insights_data import insights_columns, stream_insights
+import render_jobs
+
+excel_file='Insights_thru_Dec1.xlsx'
+header_row=9
+scale=1
+render_dpi=200
+wordcloud_dpi=150
+font_path=os.path.join("fonts","Arial","arial.ttf")
+
+def print_help():
+    print("benchmarks.py  --ifile=<inputExcelFile>    default is Insights_thru_Dec1.xlsx")
+    print("               -r<n>                      which row of the spreadsheet is the header row.  Default is 9.")
+    print("               --scale=<n>                repeat the spreadsheet rows n times, to simulate a bigger file")
+    print("               --dpi=<n>                  resolution of the charts in the render benchmarks.  Default is 200")
+    print("               --clouddpi=<n>             resolution of the wordclouds in the render benchmarks.  Default is 150")
+    print("               <benchmark> ...            which benchmarks to run, from: "+", ".join(benchmarks))
+    return
+
+def load_synonyms(ini_file='excel_to_ppt.ini'):
+    """Return the synonym -> root word dictionary from the [synonyms] section of the ini file
+    """
+    cfg = configparser.ConfigParser()
+    cfg.optionxform = str
+    cfg.read(ini_file)
+    synonym_list={}
+    for i in cfg.items('synonyms'):
+        for j in json.loads(i[1]):
+            synonym_list[j]=i[0]
+    return synonym_list
+
+def load_keyword_colours(ini_file='excel_to_ppt.ini'):
+    """Return the list of colours from the [colours] section of the ini file, and the
+       colour -> keyword list dictionary from its [keywords] section
+    """
+    cfg = configparser.ConfigParser()
+    cfg.optionxform = str
+    cfg.read(ini_file)
+    colour_codes = dict(cfg.items('colours'))
+    colour_of_keywords = {colour_codes[k]: json.loads(v) for k,v in cfg.items('keywords') if k in colour_codes}
+    return list(colour_codes.values()), colour_of_keywords
+
+def load_workbook():
+    """Read the spreadsheet, repeated 'scale' times.  The row order is kept but every copy gets
+       its own index, and its own text (a suffix on each cell) so nothing can be memoised away.
+    """
+    df = pd.read_excel(open(excel_file,'rb'),header=header_row-1,usecols="A:S")
+    if scale > 1:
+        copies = []
+        for n in range(scale):
+            copy = df.copy()
+            for col in ('Want to Learn More About','Action Items','Objectives','Customer Overall Comments'):
+                is_text = copy[col].map(lambda v: type(v) is str).astype(bool)
+                copy[col] = copy[col].where(~is_text, copy[col].astype(str)+" #"+str(n))
+            copies.append(copy)
+        df = pd.concat(copies, ignore_index=True)
+    return df
+
+def report(name, rows, old_secs, new_secs, differences):
+    print("%-26s %8i rows   old %8.3fs   new %8.3fs   speed-up x%.1f   %i results differ" %
+          (name, rows, old_secs, new_secs, old_secs/new_secs if new_secs>0 else float('inf'), differences))
+
+def bench_tidy_text(df):
+    """The old per-cell tidy_text, with its str.replace loop over every synonym, against SynonymNormalizer
+       (differences are expected where the old code rewrote synonyms inside other words)
+    """
+    synonym_list = load_synonyms()
+
+    def legacy_tidy_text(cell_val):
+        if type(cell_val) is str:
+            cell = cell_val.lower()
+            cell=re.sub('[\n&@,.:-]',' ',cell)
+            cell=" ".join(cell.split())
+            for k,v in synonym_list.items():
+                cell=cell.replace(k,v)
+        else:
+            cell=""
+        return cell
+
+    for col in ('Want to Learn More About','Action Items','Objectives'):
+        start = time.perf_counter()
+        old = df[col].apply(legacy_tidy_text)
+        old_secs = time.perf_counter()-start
+
+        start = time.perf_counter()
+        normalizer = SynonymNormalizer(synonym_list)    # include compiling the trie in the timing
+        new = normalizer.tidy_series(df[col])
+        new_secs = time.perf_counter()-start
+
+        report(col, len(df.index), old_secs, new_secs, (old!=new).sum())
+    return
+
+def bench_ingest(df):
+    """pd.read_excel of the whole sheet against stream_insights(), each keeping insights_columns.
+       Reads excel_file itself, so --scale has no effect.  Also reports the peak memory
+       allocated by each (as traced by tracemalloc, so it covers openpyxl and pandas' Python objects)
+    """
+    def legacy_read():
+        whole = pd.read_excel(open(excel_file,'rb'),header=header_row-1,usecols="A:S")
+        return whole[[c for c in insights_columns if c in whole.columns]]
+
+    def streamed_read():
+        return pd.concat(stream_insights(excel_file, header_row, chunk_rows=1000))
+
+    start = time.perf_counter()
+    old = legacy_read()
+    old_secs = time.perf_counter()-start
+
+    start = time.perf_counter()
+    new = streamed_read()
+    new_secs = time.perf_counter()-start
+
+    new = new[old.columns]
+    differences = ((old!=new) & ~(old.isna() & new.isna())).any(axis=1).sum() if len(old)==len(new) else abs(len(old)-len(new))
+    report("ingest", len(new.index), old_secs, new_secs, differences)
+
+    for name,read in (("ingest old",legacy_read),("ingest new",streamed_read)):
+        tracemalloc.start()
+        read()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print("%-26s peak traced memory %8.1f MB" % (name, peak/2**20))
+    return
+
+def bench_render(df):
+    """Each kind of image in the deck, rendered as it used to be (wordclouds at 2500x500 or 2000x500
+       pixels, charts at matplotlib's default 100 dpi) against rendering at the size it is shown on
+       the slide, at wordcloud_dpi or render_dpi.  The wordcloud layouts kept by FastWordCloud are
+       dropped before each render, so no cloud reuses another's.  Reports the PNG size and render time
+       of each, and the savings
+    """
+    from pptx.util import Mm
+    import matplotlib.pyplot as plt
+    from fast_wordcloud import FastWordCloud
+
+    colour_list, colour_of_keywords = load_keyword_colours()
+    normalizer = SynonymNormalizer(load_synonyms())
+    vocab = [kwd for kwds in colour_of_keywords.values() for kwd in kwds]
+    counts = KeywordMatcher(vocab).keyword_counts([normalizer.tidy_series(df['Want to Learn More About']),
+                                                   normalizer.tidy_series(df['Action Items'])])
+    counts += Counter()
+    useful_rows = (df["Want to Learn More About"].notnull() | df["Action Items"].notnull()).sum()
+    biggest = round(196*round(100*counts.most_common(1)[0][1]/useful_rows)/30)
+    partners = Counter({name: len(name) for name in df['Account Name'].dropna().astype(str).unique()[:30]})
+    cloud_colours = render_jobs.SimpleGroupedColorFunc(colour_of_keywords, 'grey')
+    partner_colours = functools.partial(render_jobs.hpe_color_fn, colour_list=colour_list)
+    legend = ("Palo Alto","Houston","NY","London","Singapore")
+
+    def legacy_png(fig):
+        buffer = io.BytesIO()
+        fig.savefig(buffer,format="png",bbox_inches="tight")
+        plt.close(fig)
+        return buffer.getvalue()
+
+    def legacy_line_graph():
+        fig,ax=plt.subplots(figsize=(5.75,3.25))
+        ax.plot([0.3,0.2,0.25],colour_list[0],linewidth=3)
+        ax.set_axis_off()
+        ax.text(0,0.32,"Apr\n30%",fontsize=30)
+        ax.text(2,0.27,"Jun\n25%",fontsize=30)
+        return legacy_png(fig)
+
+    def legacy_donut():
+        fig, ax = plt.subplots()
+        ax.axis('equal')
+        outside, _ = ax.pie((5,4,3,2,1),startangle=90,counterclock=False,colors=colour_list)
+        ax.legend(legend,fontsize=24,bbox_to_anchor=(0.8,1.0),frameon=False)
+        plt.setp( outside, width=0.5, edgecolor='white')
+        return legacy_png(fig)
+
+    def new_wordcloud(box, frequencies, biggest, colours, recolor_random_state=None):
+        width, height = render_jobs.pixels(box[0],wordcloud_dpi), render_jobs.pixels(box[1],wordcloud_dpi)
+        return lambda: render_jobs.wordcloud_png(frequencies, width, height, round(biggest*height/500),
+                                                 font_path, colours, recolor_random_state)
+
+    inch = render_jobs.emu_per_inch
+    images = [("wordcloud 3rd slide",
+               lambda: render_jobs.wordcloud_png(counts, 2500, 500, biggest, font_path, cloud_colours),
+               new_wordcloud((Mm(315),Mm(63)), counts, biggest, cloud_colours)),
+              ("wordcloud 4th/14th slide",
+               lambda: render_jobs.wordcloud_png(counts, 2500, 500, biggest, font_path, cloud_colours),
+               new_wordcloud((Mm(190),Mm(38)), counts, biggest, cloud_colours)),
+              ("partner wordcloud",
+               lambda: render_jobs.wordcloud_png(partners, 2000, 500, 196, font_path, partner_colours, 3),
+               new_wordcloud((Mm(178),Mm(40)), partners, 196, partner_colours, 3)),
+              ("line graph", legacy_line_graph,
+               lambda: render_jobs.line_graph_png([0.3,0.2,0.25], [4,5,6], colour_list[0], Mm(43)/inch, Mm(25)/inch, render_dpi)),
+              ("donut", legacy_donut,
+               lambda: render_jobs.donut_png((5,4,3,2,1), colour_list, legend, Mm(57)/inch, Mm(28)/inch, render_dpi))]
+
+    for name,old_render,new_render in images:
+        sizes, secs = [], []
+        for render in (old_render,new_render):
+            FastWordCloud.layouts.clear()
+            start = time.perf_counter()
+            png = render()
+            secs.append(time.perf_counter()-start)
+            sizes.append(len(png))
+        print("%-26s old %8i bytes %7.3fs   new %8i bytes %7.3fs   saved %8i bytes %7.3fs" %
+              (name, sizes[0], secs[0], sizes[1], secs[1], sizes[0]-sizes[1], secs[0]-secs[1]))
+    return
+
+def bench_wordcloud(df):
+    """The seven wordclouds of a deck for the last month in the workbook (keywords and objectives for it
+       and the two months before, and partners), each laid out and drawn by WordCloud against FastWordCloud,
+       then by FastWordCloud again, as for a second deck in the same process.  Reports the time of each
+       cloud.  A result differs if FastWordCloud's image has any pixel different from WordCloud's
+    """
+    import numpy as np
+    from pptx.util import Mm
+    from wordcloud import WordCloud
+    from fast_wordcloud import FastWordCloud
+    from insights_data import parse_visit_dates
+
+    colour_list, colour_of_keywords = load_keyword_colours()
+    normalizer = SynonymNormalizer(load_synonyms())
+    matcher = KeywordMatcher([kwd for kwds in colour_of_keywords.values() for kwd in kwds])
+    cloud_colours = render_jobs.SimpleGroupedColorFunc(colour_of_keywords, 'grey')
+    partner_colours = functools.partial(render_jobs.hpe_color_fn, colour_list=colour_list)
+    months = parse_visit_dates(df['Visit Date'])['date'].dt.to_period('M')
+    last_months = sorted(months.dropna().unique())[-3:]
+
+    clouds = []     # (name, frequencies, box, biggest word's font size on a cloud 500 pixels high, colours, recolour seed)
+    for prefix, columns in (("wordcloud", ['Want to Learn More About','Action Items']), ("objectives", ['Objectives'])):
+        for n, month in enumerate(reversed(last_months)):
+            rows = df[months == month]
+            counts = matcher.keyword_counts([normalizer.tidy_series(rows[col]) for col in columns]) + Counter()
+            useful_rows = rows[columns].notnull().any(axis=1).sum()
+            box = (Mm(315),Mm(63)) if prefix == "wordcloud" and n == 0 else (Mm(190),Mm(38))
+            clouds.append(("%s %s" % (prefix, month), counts, box,
+                           196*round(100*counts.most_common(1)[0][1]/useful_rows)/30, cloud_colours, None))
+    partners = Counter(df['Account Name'].dropna().astype(str).value_counts().head(30).to_dict())
+    clouds.append(("partners", partners, (Mm(178),Mm(40)),
+                   196*round(100*partners.most_common(1)[0][1]/sum(partners.values()))/15, partner_colours, 3))
+
+    def render(cls, frequencies, box, biggest, colours, recolor_random_state):
+        width, height = render_jobs.pixels(box[0],wordcloud_dpi), render_jobs.pixels(box[1],wordcloud_dpi)
+        wc = cls(font_path=font_path, width=width, height=height, prefer_horizontal=1.0, relative_scaling=0.7,
+                 max_font_size=round(biggest*height/500), background_color="white", random_state=1
+                 ).generate_from_frequencies(frequencies)
+        wc.recolor(color_func=colours, random_state=recolor_random_state)
+        return np.asarray(wc.to_image())
+
+    totals = [0.0, 0.0, 0.0]
+    differences = 0
+    for name, *cloud in clouds:
+        images, secs = [], []
+        for cls in (WordCloud, FastWordCloud, FastWordCloud):
+            start = time.perf_counter()
+            images.append(render(cls, *cloud))
+            secs.append(time.perf_counter()-start)
+        same = all(np.array_equal(images[0], image) for image in images[1:])
+        differences += not same
+        totals = [total+sec for total,sec in zip(totals,secs)]
+        print("%-26s %4i words   old %7.3fs   new %7.3fs   again %7.3fs   %s" %
+              (name, len(cloud[0]), secs[0], secs[1], secs[2], "same pixels" if same else "PIXELS DIFFER"))
+    report("wordclouds", len(clouds), totals[0], totals[1], differences)
+    report("wordclouds again", len(clouds), totals[0], totals[2], differences)
+    return
+
+def bench_render_batch(df):
+    """A batch of decks' worth of images (a wordcloud, three line graphs and three donuts for each deck), drawn
+       as they were with pyplot, where each wordcloud left a figure open, against render_jobs, serially and in
+       four threads.  Reports the time taken and how much the traced memory grew from the first deck to the last.
+       A result differs if an image from the threads differs from the same image rendered serially
+    """
+    import gc
+    import logging
+    import matplotlib.pyplot as plt
+    from pptx.util import Mm
+    from fast_wordcloud import FastWordCloud
+
+    decks = 10
+    colour_list, colour_of_keywords = load_keyword_colours()
+    normalizer = SynonymNormalizer(load_synonyms())
+    vocab = [kwd for kwds in colour_of_keywords.values() for kwd in kwds]
+    counts = KeywordMatcher(vocab).keyword_counts([normalizer.tidy_series(df['Want to Learn More About']),
+                                                   normalizer.tidy_series(df['Action Items'])]) + Counter()
+    cloud_colours = render_jobs.SimpleGroupedColorFunc(colour_of_keywords, 'grey')
+    legend = ("Palo Alto","Houston","NY","London","Singapore")
+    width, height = render_jobs.pixels(Mm(315),wordcloud_dpi), render_jobs.pixels(Mm(63),wordcloud_dpi)
+    inch = render_jobs.emu_per_inch
+    logging.getLogger("matplotlib.axes._base").setLevel(logging.ERROR)   # the donut's legend moves its x limits
+
+    def pyplot_deck():
+        wc = FastWordCloud(font_path=font_path, width=width, height=height, prefer_horizontal=1.0,
+                           relative_scaling=0.7, max_font_size=height//2, background_color="white",
+                           random_state=1).generate_from_frequencies(counts)
+        wc.recolor(color_func=cloud_colours)
+        plt.imshow(wc,interpolation='bilinear')
+        plt.axis("off")
+        plt.figure()
+        plt.imsave(io.BytesIO(),wc,format="png")
+        plt.close()
+        for n in range(3):
+            fig,ax=plt.subplots(figsize=(5.75,3.25))
+            ax.plot([0.3,0.2,0.25],colour_list[n],linewidth=3)
+            fig.savefig(io.BytesIO(),format="png",dpi=render_dpi)
+            plt.close(fig)
+            fig, ax = plt.subplots()
+            outside, _ = ax.pie((5,4,3,2,n+1),startangle=90,counterclock=False,colors=colour_list)
+            ax.legend(legend,fontsize=24,bbox_to_anchor=(0.8,1.0),frameon=False)
+            plt.setp( outside, width=0.5, edgecolor='white')
+            fig.savefig(io.BytesIO(),format="png",dpi=render_dpi)
+            plt.close(fig)
+
+    def render_jobs_deck(renderer, deck):
+        names = [renderer.submit("wordcloud-%i" % deck, render_jobs.wordcloud_png, counts, width, height, height//2,
+                                 font_path, cloud_colours)]
+        for n in range(3):
+            names.append(renderer.submit("graph-%i-%i" % (deck,n), render_jobs.line_graph_png, [0.3,0.2,0.25], [4,5,6],
+                                         colour_list[n], Mm(43)/inch, Mm(25)/inch, render_dpi))
+            names.append(renderer.submit("donut-%i-%i" % (deck,n), render_jobs.donut_png, (5,4,3,2,n+1), colour_list,
+                                         legend, Mm(57)/inch, Mm(28)/inch, render_dpi))
+        return [renderer.result(name) for name in names]
+
+    def serial_deck(deck):
+        return render_jobs_deck(render_jobs.RenderScheduler(), deck)
+
+    threaded = render_jobs.RenderScheduler(jobs=4, threads=True)
+    results = {}
+    for name, render_deck in (("pyplot", lambda deck: pyplot_deck()),
+                              ("render_jobs", serial_deck),
+                              ("render_jobs 4 threads", functools.partial(render_jobs_deck, threaded))):
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        images = [render_deck(0)]
+        after_first = tracemalloc.get_traced_memory()[0]
+        images += [render_deck(deck) for deck in range(1, decks)]
+        secs = time.perf_counter()-start
+        gc.collect()
+        growth = tracemalloc.get_traced_memory()[0]-after_first
+        tracemalloc.stop()
+        results[name] = images
+        print("%-26s %4i decks %7.3fs   memory grew %8.1f MB over the batch   %i pyplot figures left open" %
+              (name, decks, secs, growth/2**20, len(plt.get_fignums())))
+        plt.close("all")
+    threaded.close()
+    differences = sum(a!=b for serial,threads in zip(results["render_jobs"], results["render_jobs 4 threads"])
+                      for a,b in zip(serial,threads))
+    print("%-26s %4i images differ between serial and threaded rendering" % ("render_jobs", differences))
+    return
+
+def bench_sentiment(df):
+    """VADER's polarity_scores() for every 'Customer Overall Comments' cell, against SentimentScores with a new
+       store (each comment scored and written to it), the same in four processes, then with the store as a later
+       run finds it.  A result differs if any of the four scores differs from VADER's.
+       Then the top and bottom 4 comments picked from those scores as top_sentiment_in_month used to, against
+       top_n().  A result differs if a comment is picked with a different score (of comments with equal
+       scores, either may be picked)
+    """
+    import tempfile
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    from sentiment_scores import SentimentScores, score_names, top_n
+
+    comments = [cell for cell in df['Customer Overall Comments'] if isinstance(cell, str)]
+    start = time.perf_counter()
+    analyzer = SentimentIntensityAnalyzer()
+    old = [analyzer.polarity_scores(comment) for comment in comments]
+    old_secs = time.perf_counter()-start
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        store = os.path.join(store_dir, "sentiment_scores.sqlite")
+        for name, jobs in (("sentiment new store", 1), ("sentiment new store x4", 4), ("sentiment later run", 1)):
+            if jobs > 1:
+                os.remove(store)
+            start = time.perf_counter()
+            sentiment = SentimentScores(store)
+            new = sentiment.scores(comments, jobs)
+            sentiment.close()
+            new_secs = time.perf_counter()-start
+            differences = sum(any(a[k]!=b[k] for k in score_names) for a,b in zip(old,new))
+            report(name, len(comments), old_secs, new_secs, differences)
+            hits, misses, saved_secs = sentiment.report()
+            print("%-26s %8i from the store (%.0f%%), saving %.3fs" % (name, hits, 100*hits/max(1,len(comments)), saved_secs))
+
+    def legacy_top(count, sign):
+        # top_sentiment_in_month's selection: a dict of the best so far, searched for its lowest on every comment
+        results = {}
+        lowest_top_snt = 0.0
+        for cell, snt in zip(comments, old):
+            if len(results) < count:
+                results[cell] = sign*snt['compound']
+            elif sign*snt['compound'] > lowest_top_snt:
+                del results[ min(results, key=results.get) ]
+                results[cell] = sign*snt['compound']
+            lowest_top_snt = min(results.values())
+        return sorted(sign*score for score in results.values())
+
+    compounds = [snt['compound'] for snt in old]
+    for name, sign in (("top 4 comments", 1), ("bottom 4 comments", -1)):
+        start = time.perf_counter()
+        old_picked = legacy_top(4, sign)
+        old_secs = time.perf_counter()-start
+        start = time.perf_counter()
+        new_picked = sorted(score for _,score in top_n(comments, compounds, 4, largest=sign>0))
+        new_secs = time.perf_counter()-start
+        report(name, len(comments), old_secs, new_secs, sum(a!=b for a,b in zip(old_picked,new_picked)))
+    return
+
+def bench_vector_sentiment(df):
+    """VADER's polarity_scores() for every 'Customer Overall Comments' cell, against
+       VectorSentimentAnalyzer.polarity_scores_batch() for them all, then in SentimentScores' chunks (each time
+       including making the analyzer, which loads VADER's lexicon).  A result differs if any of the four scores
+       differs from VADER's.  Then how well the two agree: exactly, on the compound score to within 0.01, and on
+       whether the comment is positive, neutral or negative (compound above 0.05, between, or below -0.05)
+    """
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    from sentiment_scores import score_names, chunk_size
+    from vector_sentiment import VectorSentimentAnalyzer
+
+    comments = [cell for cell in df['Customer Overall Comments'] if isinstance(cell, str)]
+    start = time.perf_counter()
+    analyzer = SentimentIntensityAnalyzer()
+    old = [analyzer.polarity_scores(comment) for comment in comments]
+    old_secs = time.perf_counter()-start
+
+    for name, size in (("vector sentiment", len(comments)), ("vector sentiment chunks", chunk_size)):
+        start = time.perf_counter()
+        vector = VectorSentimentAnalyzer()
+        new = []
+        for i in range(0, len(comments), max(1,size)):
+            new.extend(vector.polarity_scores_batch(comments[i:i+size]))
+        new_secs = time.perf_counter()-start
+        report(name, len(comments), old_secs, new_secs, sum(any(a[k]!=b[k] for k in score_names) for a,b in zip(old,new)))
+
+    def polarity(scores):
+        return 1 if scores['compound'] > 0.05 else -1 if scores['compound'] < -0.05 else 0
+    agree = [sum(a==b for a,b in zip(old,new)),
+             sum(abs(a['compound']-b['compound']) <= 0.01 for a,b in zip(old,new)),
+             sum(polarity(a)==polarity(b) for a,b in zip(old,new))]
+    for what, count in zip(("exactly", "compound to 0.01", "on polarity"), agree):
+        print("%-26s %8i comments agree %-18s %6.2f%%" % ("vector sentiment", count, what, 100*count/max(1,len(comments))))
+    return
+
+def bench_sentiment_cube(df):
+    """The average sentiment of each keyword by centre, and by industry, over the last six months of the workbook,
+       by filtering the frame for every centre (or industry) and keyword, against one SentimentCube and two of its
+       tables.  A result differs if the average or number of comments of any (centre or industry, keyword) does
+    """
+    import numpy as np
+    from keyword_matcher import KeywordIncidence
+    from insights_data import parse_visit_dates, add_months
+    from sentiment_scores import SentimentScores
+    from sentiment_cube import SentimentCube
+
+    normalizer = SynonymNormalizer(load_synonyms())
+    _, colour_of_keywords = load_keyword_colours()
+    matcher = KeywordMatcher([kwd for kwds in colour_of_keywords.values() for kwd in kwds])
+    industry = [c for c in df.columns if "Industry" in str(c)][0]
+    frame = pd.DataFrame({"date": parse_visit_dates(df['Visit Date'])['date'], "Ctr": df["Ctr"],
+                          "Industry": df[industry],
+                          "wtlma": normalizer.tidy_series(df['Want to Learn More About']),
+                          "actions": normalizer.tidy_series(df['Action Items'])})
+    frame = frame.join(SentimentScores().score_frame(df['Customer Overall Comments']))
+    incidence = KeywordIncidence(frame, ["wtlma","actions"], matcher)
+    last = frame["date"].max()
+    months = [add_months(last.year, last.month, n) for n in range(-5,1)]
+    centres = ["H","NY1","SNG","LON1","PA"]
+    in_months = (frame["date"] >= pd.Timestamp(*months[0], 1)) & (frame["date"] < pd.Timestamp(*add_months(*months[-1], 1), 1))
+    frame = frame[in_months]
+
+    def legacy_table(column, labels):
+        # a fresh filter of the frame for every label and keyword, as slicing it by hand would do
+        means, counts = {}, {}
+        hits = incidence.rows_by_keyword(frame, ["wtlma","actions"])
+        for label in labels:
+            for k,kwd in enumerate(incidence.keywords):
+                rows = frame[(frame[column].fillna("Unknown")==label) & frame["Ctr"].isin(centres) & hits[:,k]]
+                scores = rows["sentiment"].dropna()
+                means[(label,kwd)], counts[(label,kwd)] = (scores.mean() if len(scores) else float("nan")), len(scores)
+        return means, counts
+
+    start = time.perf_counter()
+    old = [legacy_table("Ctr", centres), legacy_table("Industry", sorted(frame["Industry"].fillna("Unknown").unique()))]
+    old_secs = time.perf_counter()-start
+    start = time.perf_counter()
+    cube = SentimentCube(frame, incidence.rows_by_keyword(frame, ["wtlma","actions"]), incidence.keywords, months, centres)
+    new = [cube.table("centre", "keyword"), cube.table("industry", "keyword")]
+    new_secs = time.perf_counter()-start
+    differences = 0
+    for (old_means, old_counts), (new_means, new_counts) in zip(old, new):
+        for (label,kwd), count in old_counts.items():
+            mean = new_means.loc[label,kwd]
+            differences += count != new_counts.loc[label,kwd] or \
+                           not (np.isnan(mean) and np.isnan(old_means[(label,kwd)]) or np.isclose(mean, old_means[(label,kwd)]))
+    report("sentiment cube", len(frame), old_secs, new_secs, differences)
+    print("%-26s %8i cells, %i keyword mentions in scored comments" % ("sentiment cube", cube.counts.size, cube.counts.sum()))
+    return
+
+def bench_chart_data(df):
+    """The doughnut charts of the 9th slide (all industries, then visits by centre for each of the eight
+       biggest industries), with python-pptx's ChartData writing each embedded workbook with xlsxwriter
+       against TemplatedChartData.  Times building just the workbooks, then adding the charts to a slide.
+       A result differs if a workbook read back with openpyxl has different cells
+    """
+    import openpyxl
+    from pptx import Presentation
+    from pptx.chart.data import ChartData
+    from pptx.enum.chart import XL_CHART_TYPE
+    from pptx.util import Mm
+    from chart_workbook import TemplatedChartData
+
+    industry = [c for c in df.columns if "Industry" in str(c)][0]
+    industry_counts = df[industry].value_counts()
+    charts = [("Industries", list(industry_counts.index), list(industry_counts.values))]
+    for ind in industry_counts.index[:8]:
+        centre_counts = df[df[industry]==ind]["Ctr"].value_counts()
+        charts.append(("Centres", ['PA','H','NY','L','SNG'], [centre_counts.get(c,0) for c in ('PA','H','NY1','LON1','SNG')]))
+
+    def chart_data(cls):
+        datas = []
+        for name, categories, values in charts:
+            data = cls()
+            data.categories = categories
+            data.add_series(name, values)
+            datas.append(data)
+        return datas
+
+    def cells(blob):
+        return [[c.value for c in row] for row in openpyxl.load_workbook(io.BytesIO(blob)).active.iter_rows()]
+
+    timings, blobs = [], []
+    for cls in (ChartData, TemplatedChartData):
+        start = time.perf_counter()
+        blobs.append([data.xlsx_blob for data in chart_data(cls)])
+        timings.append(time.perf_counter()-start)
+    differences = sum(cells(old)!=cells(new) for old,new in zip(*blobs))
+    report("chart workbooks", len(charts), timings[0], timings[1], differences)
+    print("%-26s old %8i bytes   new %8i bytes" % ("chart workbooks", sum(map(len,blobs[0])), sum(map(len,blobs[1]))))
+
+    timings = []
+    for cls in (ChartData, TemplatedChartData):
+        slide_shapes = Presentation().slides.add_slide(Presentation().slide_layouts[6]).shapes
+        start = time.perf_counter()
+        for data in chart_data(cls):
+            slide_shapes.add_chart(XL_CHART_TYPE.DOUGHNUT, Mm(10), Mm(10), Mm(50), Mm(50), data)
+        timings.append(time.perf_counter()-start)
+    report("add_chart", len(charts), timings[0], timings[1], 0)
+    return
+
+def bench_template(df):
+    """Opening each template for every deck of a year of monthly decks and five centre decks, with
+       Presentation() against deck_template's cache (the first two opens parse the template), and then
+       opening and saving a single deck, as each script does, with prs.save() against save_deck().
+       A result differs if a saved deck has any part whose bytes differ from the template's saved as it is
+    """
+    import zipfile
+    from pptx import Presentation
+    import deck_template
+    from deck_template import TemplateCache
+
+    opens = ['GCA_Customer_Insights_Month-Year.pptx']*12 + ['GCA_Centre_Insights_Month-Year - ctr.pptx']*5
+
+    def parts(prs):
+        saved = io.BytesIO()
+        prs.save(saved)
+        with zipfile.ZipFile(saved) as pptx:
+            return {name: pptx.read(name) for name in pptx.namelist()}
+
+    start = time.perf_counter()
+    old = [Presentation(template) for template in opens]
+    old_secs = time.perf_counter()-start
+
+    cache = TemplateCache()
+    start = time.perf_counter()
+    new = [cache.presentation(template) for template in opens]
+    new_secs = time.perf_counter()-start
+
+    differences = sum(parts(a)!=parts(b) for a,b in zip(old,new))
+    report("open template", len(opens), old_secs, new_secs, differences)
+
+    # What each script does: open and save one deck in a process, with a cache as a new process has it
+    deck_template.templates = TemplateCache()
+    old_saved, new_saved = io.BytesIO(), io.BytesIO()
+    start = time.perf_counter()
+    Presentation(opens[0]).save(old_saved)
+    old_secs = time.perf_counter()-start
+    start = time.perf_counter()
+    deck_template.save_deck(deck_template.open_template(opens[0]), new_saved)
+    new_secs = time.perf_counter()-start
+    report("open and save one deck", 1, old_secs, new_secs,
+           int(parts(Presentation(old_saved)) != parts(Presentation(new_saved))))
+    return
+
+def bench_save(df):
+    """Saving a deck made from the monthly template (a title changed and the icons added to one slide)
+       with prs.save() against deck_template.save_deck(store_media=True).  Reports the time and size of each.
+       A result differs if a deck has different members, or a member with different content (XML compared
+       after parsing, and the order of relationships not counting)
+    """
+    import zipfile
+    from lxml import etree
+    from pptx.oxml import parse_xml
+    from deck_template import open_template, save_deck
+
+    template = 'GCA_Customer_Insights_Month-Year.pptx'
+    prs = open_template(template)
+    prs.slides[2].shapes.title.text_frame.text = "Changed"
+    for n,icon in enumerate(sorted(os.listdir("icons"))[:20]):
+        prs.slides[3].shapes.add_picture(os.path.join("icons",icon), n*100000, 0)
+
+    def content(name, member):
+        if name.endswith(".rels"):      # the order of the relationships doesn't matter
+            return sorted(etree.tostring(rel, method="c14n") for rel in parse_xml(member))
+        if name.endswith(".xml"):
+            return etree.tostring(parse_xml(member), method="c14n")
+        return member
+
+    def contents(blob):
+        with zipfile.ZipFile(io.BytesIO(blob)) as pptx:
+            return {name: content(name, pptx.read(name)) for name in pptx.namelist()}
+
+    saves = [("prs.save()", lambda out: prs.save(out)),
+             ("save_deck(store_media)", lambda out: save_deck(prs, out, store_media=True))]
+    decks = []
+    for name, save in saves:
+        out = io.BytesIO()
+        start = time.perf_counter()
+        for n in range(10):
+            out.seek(0)
+            out.truncate()
+            save(out)
+        secs = (time.perf_counter()-start)/10
+        decks.append(out.getvalue())
+        differences = 0 if len(decks)==1 else sum(a!=b for a,b in zip(contents(decks[0]).items(), contents(decks[-1]).items()))
+        print("%-26s %8.3fs per deck %10i bytes   %i members differ" % (name, secs, len(decks[-1]), differences))
+    return
+
+benchmarks = {"tidy_text": bench_tidy_text,
+              "ingest": bench_ingest,
+              "render": bench_render,
+              "wordcloud": bench_wordcloud,
+              "render_batch": bench_render_batch,
+              "sentiment": bench_sentiment,
+              "vector_sentiment": bench_vector_sentiment,
+              "sentiment_cube": bench_sentiment_cube,
+              "chart_data": bench_chart_data,
+              "template": bench_template,
+              "save": bench_save}
+
+if __name__=="__main__":
+    try:
+        opts, args = getopt.getopt(sys.argv[1:],"?hr:",["ifile=","scale=","dpi=","clouddpi="])
+    except getopt.GetoptError as err:
+        print(err)
+        print_help()
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt in ("-?","-h"):
+            print_help()
+            sys.exit()
+        elif opt in ("--ifile"):
+            excel_file = arg
+        elif opt in ("-r"):
+            header_row = int(arg)
+        elif opt in ("--scale"):
+            scale = int(arg)
+        elif opt in ("--dpi"):
+            render_dpi = int(arg)
+        elif opt in ("--clouddpi"):
+            wordcloud_dpi = int(arg)
+    to_run = args if args else list(benchmarks)
+    for name in to_run:
+        if name not in benchmarks:
+            print("Unknown benchmark {}".format(name))
+            print_help()
+            sys.exit(2)
+
+    df = load_workbook()
+    print("Benchmarking on {} ({} rows after scaling x{})".format(excel_file,len(df.index),scale))
+    for name in to_run:
+        benchmarks[name](df)
@@ -0,0 +1,150 @@
+""" Minimal embedded workbooks for the charts we put in the deck.
+
+    Every python-pptx chart carries an Excel workbook holding its data, so it can be edited in
+    PowerPoint.  python-pptx writes that workbook with xlsxwriter, one full workbook (theme,
+    styles, shared strings, document properties) per chart, which is a surprising share of the
+    time spent putting the slides together when a slide has eight donuts on it.
+
+    TemplatedChartData is a drop-in replacement for pptx.chart.data.ChartData that writes just
+    the parts Excel needs: the other package parts are fixed text, and only the worksheet
+    (with the values written in as inline strings and numbers) and a small number-format table
+    are generated per chart.  The charts reference the cells in the same places python-pptx
+    would put them, so "Edit Data" in PowerPoint works as before.
+
+    Typical usage:
+        chart_data = TemplatedChartData()
+        chart_data.categories = ["Palo Alto","Houston","NY","London","Singapore"]
+        chart_data.add_series("Centres", (3,4,5,1,2))
+        slide_shapes.add_chart(XL_CHART_TYPE.DOUGHNUT, left_x, top_y, width, height, chart_data)
+"""
+import io
+import numbers
+import zipfile
+from xml.sax.saxutils import escape
+from pptx.chart.data import CategoryChartData
+
+zip_date_time = (1980,1,1,0,0,0)   # fixed, so the same chart data always gives the same bytes
+
+package_parts = (
+    ("[Content_Types].xml",
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+     '<Default Extension="xml" ContentType="application/xml"/>'
+     '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+     '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+     '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+     '</Types>'),
+    ("_rels/.rels",
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+     '</Relationships>'),
+    ("xl/workbook.xml",
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+     '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+     'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+     '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+     '</workbook>'),
+    ("xl/_rels/workbook.xml.rels",
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+     '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+     '</Relationships>'),
+)
+
+styles_template = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                   '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                   '{numFmts}'
+                   '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+                   '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+                   '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+                   '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+                   '<cellXfs count="{xf_count}"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>{xfs}</cellXfs>'
+                   '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+                   '</styleSheet>')
+
+sheet_template = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                  '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                  '<dimension ref="A1:{last_cell}"/>'
+                  '<sheetData>{rows}</sheetData>'
+                  '</worksheet>')
+
+def column_letter(column_number):
+    """Return the Excel column letters, e.g. 'BQ', for the 1-based column_number
+    """
+    letters = ""
+    while column_number:
+        column_number, remainder = divmod(column_number-1, 26)
+        letters = chr(ord("A")+remainder)+letters
+    return letters
+
+def cell_xml(ref, value, style=0):
+    """Return the <c> element for one cell, or "" for an empty (None) value
+    """
+    if value is None:
+        return ''
+    style_attr = ' s="%i"' % style if style else ''
+    if isinstance(value, numbers.Real) and not isinstance(value, bool):
+        return '<c r="%s"%s><v>%r</v></c>' % (ref, style_attr, float(value))
+    return '<c r="%s"%s t="inlineStr"><is><t xml:space="preserve">%s</t></is></c>' % (ref, style_attr, escape(str(value)))
+
+def xlsx_blob(categories, series):
+    """Build the workbook for a chart with one column of category labels and one column per series,
+       laid out as python-pptx's CategoryWorkbookWriter lays it out, i.e. the labels in A2 downwards and
+       each series in the following columns with its name in row 1.  series is a list of
+       (name, values, number_format) tuples.
+       Returns the .xlsx file as bytes
+    """
+    number_formats = []
+    for _, _, number_format in series:
+        if number_format != "General" and number_format not in number_formats:
+            number_formats.append(number_format)
+    style_of = {number_format: i+1 for i,number_format in enumerate(number_formats)}   # 0 is General
+
+    n_rows = max([len(categories)]+[len(values) for _, values, _ in series])
+    rows = []
+    for row in range(1, n_rows+2):
+        cells = [cell_xml("A%i" % row, categories[row-2] if 2 <= row < len(categories)+2 else None)]
+        for col, (name, values, number_format) in enumerate(series, start=2):
+            ref = "%s%i" % (column_letter(col), row)
+            if row == 1:
+                cells.append(cell_xml(ref, name))
+            elif row-2 < len(values):
+                cells.append(cell_xml(ref, values[row-2], style_of.get(number_format, 0)))
+        rows.append('<row r="%i">%s</row>' % (row, "".join(cells)))
+    sheet = sheet_template.format(last_cell="%s%i" % (column_letter(len(series)+1), n_rows+1), rows="".join(rows))
+
+    if number_formats:
+        num_fmts = '<numFmts count="%i">%s</numFmts>' % (len(number_formats), "".join(
+            '<numFmt numFmtId="%i" formatCode="%s"/>' % (164+i, escape(f, {'"': '&quot;'})) for i,f in enumerate(number_formats)))
+    else:
+        num_fmts = ''
+    xfs = "".join('<xf numFmtId="%i" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>' % (164+i)
+                  for i in range(len(number_formats)))
+    styles = styles_template.format(numFmts=num_fmts, xf_count=len(number_formats)+1, xfs=xfs)
+
+    blob = io.BytesIO()
+    with zipfile.ZipFile(blob, "w", zipfile.ZIP_DEFLATED) as xlsx:
+        for name, xml in package_parts+(("xl/styles.xml", styles), ("xl/worksheets/sheet1.xml", sheet)):
+            xlsx.writestr(zipfile.ZipInfo(name, zip_date_time), xml.encode("utf-8"), zipfile.ZIP_DEFLATED)
+    return blob.getvalue()
+
+class TemplatedChartData(CategoryChartData):
+    """ChartData whose embedded workbook is written by xlsx_blob(), not by xlsxwriter.
+       Charts with multi-level or date categories still get python-pptx's own workbook.
+
+       Parameters
+       ----------
+       number_format : str
+         As for pptx.chart.data.CategoryChartData, the Excel number format of the values.
+    """
+
+    @property
+    def xlsx_blob(self):
+        categories = self.categories
+        if categories.depth != 1 or categories.are_dates:
+            return super(TemplatedChartData, self).xlsx_blob
+        return xlsx_blob([category.label for category in categories],
+                         [(s.name, s.values, s.number_format) for s in self])
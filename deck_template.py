@@ -0,0 +1,115 @@
+""" Parse each PowerPoint template once per process, and hand out copies of it to fill in.
+
+    Presentation('GCA_Customer_Insights_Month-Year.pptx') unzips the template and parses every slide,
+    layout, master and theme part each time it is called.  TemplateCache hands out the first deck from a
+    template as parsed, as a deep copy would only cost more when a run makes one deck.  For a second deck
+    it keeps one pristine parsed copy of the template and returns a deep copy of that for every deck from
+    then on, so building several decks in one process (say, each month or each centre) parses the template
+    only twice.  The copies share nothing that can be changed: the XML of every part is copied, only the
+    (immutable) bytes of the media are shared.
+
+    A template is parsed again if its file has changed since it was cached.
+
+    move_slide() moves a slide to another place in its deck, which python-pptx has no public way to do.
+
+    save_deck() saves a deck with prs.save(), and logs its size and the time taken.  With store_media, the
+    PNG and JPEG pictures, which are compressed already, are stored in the zip rather than deflated: the
+    deck python-pptx wrote is zipped again with zipfile, which costs a little more time than prs.save() alone.
+
+    Typical usage:
+        prs = open_template('GCA_Customer_Insights_Month-Year.pptx')
+        ...
+        save_deck(prs, 'GCA_Customer_Insights_June-2018.pptx')
+"""
+import copy
+import io
+import os
+import logging
+import time
+import zipfile
+
+logger = logging.getLogger("insights.template")
+
+class TemplateCache(object):
+    """Pristine parsed copies of PowerPoint templates, by file name
+    """
+
+    def __init__(self):
+        self.pristine = {}    # template file -> ((modification time, size), Presentation)
+        self.opened = set()   # (template file, (modification time, size)) of each template handed out already
+
+    def _version(self, template_file):
+        stat = os.stat(template_file)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _pristine(self, template_file):
+        """Returns the pristine Presentation of template_file, parsing it if it is not cached or has changed.
+           It must not be changed: hand out copies of it
+        """
+        version = self._version(template_file)
+        cached = self.pristine.get(template_file)
+        if cached is None or cached[0] != version:
+            from pptx import Presentation
+            logger.debug("Parsing template %s" % template_file)
+            cached = (version, Presentation(template_file))
+            self.pristine[template_file] = cached
+        return cached[1]
+
+    def presentation(self, template_file):
+        """Returns a new Presentation, a copy of the one in template_file, which can be changed freely
+        """
+        version = self._version(template_file)
+        if (template_file, version) in self.opened:
+            return copy.deepcopy(self._pristine(template_file))
+
+        # The first deck from a template: a run making one deck would never use a pristine copy again, so hand out
+        # the parsed template itself
+        from pptx import Presentation
+        logger.debug("Parsing template %s" % template_file)
+        prs = Presentation(template_file)
+        self.opened.add((template_file, version))
+        return prs
+
+templates = TemplateCache()
+
+def open_template(template_file):
+    """Presentation(template_file), but parsing each template only once per process
+       Returns a new Presentation to fill in
+    """
+    return templates.presentation(template_file)
+
+def move_slide(prs, slide, position):
+    """Move slide to be slide number position (counting from 1) of the Presentation prs
+       Returns True, or False if this python-pptx can't move slides, when the slide is left where it was
+    """
+    # python-pptx can only add slides at the end, and has no public way to reorder them.  This relies on its
+    # internals: the order of the slides is that of the p:sldId entries of prs.slides._sldIdLst, a private
+    # attribute in python-pptx 1.0.2.  If that has gone, the slide stays where it is
+    slide_ids = getattr(prs.slides, "_sldIdLst", None)
+    if slide_ids is None:
+        logger.warning("Can't move slides with this python-pptx, so slide %i stays where it is" % slide.slide_id)
+        return False
+    slide_id = next(entry for entry in slide_ids if int(entry.get("id")) == slide.slide_id)
+    slide_ids.remove(slide_id)
+    slide_ids.insert(position-1, slide_id)
+    return True
+
+def save_deck(prs, pkg_file, store_media=False):
+    """prs.save(pkg_file), with store_media not deflating the PNG and JPEG pictures.
+       Logs the size of the deck and the time taken.
+       Returns the size of the deck in bytes
+    """
+    start = time.perf_counter()
+    if not store_media:
+        prs.save(pkg_file)
+    else:
+        saved = io.BytesIO()
+        prs.save(saved)
+        with zipfile.ZipFile(saved) as deck, zipfile.ZipFile(pkg_file, "w", zipfile.ZIP_DEFLATED) as stored:
+            for info in deck.infolist():
+                picture = os.path.splitext(info.filename)[1].lower() in (".png",".jpg",".jpeg")
+                stored.writestr(info, deck.read(info), zipfile.ZIP_STORED if picture else zipfile.ZIP_DEFLATED)
+    size = os.path.getsize(pkg_file) if isinstance(pkg_file, str) else pkg_file.tell()
+    logger.info("Saved %s in %.2fs: %.0f kB" % (pkg_file if isinstance(pkg_file, str) else "deck",
+                                                 time.perf_counter()-start, size/1024))
+    return size
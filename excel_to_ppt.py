@@ -9,32 +9,57 @@
     Required packages: pandas, matplotlib, python-pptx, xlrd, wordcloud, vaderSentiment, requests
     You can use 'pip install' to get these down.
 """
+import sys
+from startup_profile import StartupProfile
+startup = StartupProfile(enabled=__name__=="__main__" and "--startup-profile" in sys.argv)   # made first, to time the imports below
 import pandas as pd
 from datetime import datetime, date
-import matplotlib.pyplot as plt
 import collections
 from collections import Counter
 import calendar
-from pptx.dml.color import RGBColor
-from pptx.enum.dml import MSO_THEME_COLOR
-from pptx.util import Pt
 import os
-import sys
+import io
 import logging
 import re
-import sys, getopt
+import getopt
+from keyword_matcher import KeywordMatcher, KeywordIncidence
+from synonym_normalizer import SynonymNormalizer
+from insights_data import read_insights, month_start, add_months, DateIndex
+from icon_registry import IconRegistry
+import functools
+# python-pptx, the renderers (and through them matplotlib and wordcloud) and the sentiment modules are only
+# imported once the word check (-w) is done, as it needs none of them: see the imports after it
+startup.stage("imports")
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-tmpdir = "tmp/"
+tmpdir = "tmp/"                              # where --dumpimages writes the wordclouds and charts
+cache_dir = "tmp/"                           # where the caches kept between runs go, see --cachedir
+render_cache_name = "render_cache"           # wordclouds from earlier runs, in cache_dir
+render_cache_bytes = 100*2**20               # least recently used wordclouds are deleted beyond this
+sentiment_store_name = "sentiment_scores.sqlite"     # sentiment scores of every comment seen so far, in cache_dir
+render_dpi = 200                             # resolution of the charts, at the size they appear on the slides
+wordcloud_dpi = 150                          # resolution of the wordclouds: flat text, which needs less than the charts' thin lines
 icondir = "icons/"
+font_path = os.path.join("fonts","Arial","arial.ttf")    # the font of the wordclouds, bundled so every machine draws the same clouds
 excel_file='Insights.xlsx'
 stop_after_wordcheck = False
 yyyy,mm=date.today().year,date.today().month-1
 header_row=1
 oldMode_1 = False
 sentimentCalcs = False
+sentiment_slide = False
+use_cache = True
+streaming = False
+jobs = 1
+sentiment_scorer = "vader"
+render_threads = False
+dump_images = False
+native_charts = False
+store_media = False
+optimize = False
+template_file = 'GCA_Customer_Insights_Month-Year.pptx'
 
 def print_help():
     print("excel_to_ppt.py  -ifile=<inputExcelFile>    default is Insights.xlsx")
@@ -46,145 +71,29 @@ def print_help():
     print("                 -r<n>                  set which row of the spreadsheet is the first (header) row.  Default is 1.")
     print("                 -d                     turn on debugging trace")
     print("                 -s                     turn on experiemental sentiment analysis")
+    print("                 --sentimentslide       add a slide after the 11th of the average sentiment of the top interests, by centre")
     print("                 -q                     turn on quiet mode - shows only information")
+    print("                 --nocache              always re-read the Excel file and re-draw the wordclouds, ignoring (and not writing) the caches")
+    print("                 --cachedir=<dir>       keep the wordclouds and sentiment scores of earlier runs in dir.  Default is "+cache_dir+".  If it can't be written the run goes on without them")
+    print("                 --stream               read the Excel file row by row, keeping only the columns we use (for very large files with many other columns)")
+    print("                 --jobs=<n>             render the wordclouds and charts, and score many new comments, in n worker processes.  Default is 1 (no workers)")
+    print("                 --scorer=<name>        score the comments' sentiment with vader (VADER, a word at a time) or vector (the same rules on whole batches).  Default is vader")
+    print("                 --threads              with --jobs, render in n threads of this process rather than worker processes")
+    print("                 --dpi=<n>              resolution of the charts, at the size they appear on the slides.  Default is 200")
+    print("                 --clouddpi=<n>         resolution of the wordclouds, at the size they appear on the slides.  Default is 150")
+    print("                 --dumpimages           also write the wordclouds and charts to "+tmpdir+", for debugging")
+    print("                 --nativecharts         draw the 5th slide's line graphs and donuts as PowerPoint charts, not pictures")
+    print("                 --storemedia           store the PNG and JPEG pictures in the deck without deflating them (a slightly bigger deck, and zipped twice)")
+    print("                 --optimize             shrink the pictures in the deck before saving it: downscale, palette, strip metadata, dedupe")
+    print("                 --startup-profile      print how long the imports and each stage of starting up took, up to the word check")
     print("For example, excel_to_ppt.py -m8 -y2018 -s")
     return
 
-if __name__=="__main__":
-    logging.debug("Parsing arguments")
-    try:
-        opts, args = getopt.getopt(sys.argv[1:],"?hdwsvi:y:m:r:",["ifile=","year=","month="])
-    except getopt.GetoptError as err:
-        print(err)
-        print_help()
-        sys.exit(2)
-    logger.debug("opt: "+str(opts)+" and args: "+str(args))  
-    for opt, arg in opts:
-        if opt in ("-?","-h"):
-            print_help()
-            sys.exit()
-        elif opt == "-d":
-            logger.setLevel(logging.DEBUG)
-        elif opt == "-q": # lowest level of messages printed
-            logger.setLevel(logging.WARNING)
-        elif opt in ("--ifile"):
-            excel_file = arg
-        elif opt in ("-y","--year"):
-            logging.debug("Found argument yyyy with {}".format(arg))
-            yyyy = int(arg)
-        elif opt in ("-m", "--month"):
-            logging.debug("Found argument mm with {}".format(arg))
-            mm = int(arg)
-        elif opt in ("-r"):
-            logging.debug("Found argument header_row with {}".format(arg))
-            header_row = int(arg)
-        elif opt == "-w":
-            stop_after_wordcheck = True
-        elif opt == "-s":
-            sentimentCalcs = True
-        elif opt == "-o":
-            logging.info("Working in old mode {}".format(arg))
-            if int(arg)==1:
-                oldMode_1 = True
-            #endif
-        #endif
-
-logger.info('Starting run for %i-%i...' % (yyyy,mm))
-
-# Read in the ini file
-import configparser
-import json
-ini_file = 'excel_to_ppt.ini'
-cfg = configparser.ConfigParser()
-cfg.optionxform = str    # read strings as-is from INI file (default is to lowercase keys)
-cfg.read(ini_file)
-
-colour_list=[]   # list of the colour code values
-if 'colours' in cfg:
-    colour_codes = dict(cfg.items('colours'))
-    for i in cfg.items('colours'):
-        colour_list.append(i[1])       # put this hex value in list of available colours
-else:
-    logger.error('No [colours] section in {}'.format(ini_file))
-
-if 'keywords' in cfg:
-    c_to_k=cfg.items('keywords')
-    dict_colour_of_keywords={}
-    for i in cfg.items('keywords'):
-        if i[0] in colour_codes:
-            dict_colour_of_keywords[colour_codes[i[0]]]=json.loads(i[1])
-        else:
-            logger.error('In {}, section [keywords], found colour {} which was not listed in [colours] section'.format(ini_file,i[0]))
-else:
-    logger.error('No [keywords] section in {}'.format(ini_file))
-
-#Build a list of all the keywords.  Use all the things we have a colour for as the list items.
-vocab=[]
-for i in dict_colour_of_keywords.values():
-    for j in i:
-        vocab.append(j)
-
-# load the list of synonyms (or mis-spellings) of the keywords
-synonym_list={}
-for i in cfg.items('synonyms'):
-    lst=json.loads(i[1])
-    for j in lst:
-        synonym_list[j]=i[0]
-
-JapanAndChinaToOther=True
-industry_list=[]   # list of the industry code values
-if 'industries' in cfg:
-    industry_longnames = dict(cfg.items('industries'))
-    for i in cfg.items('industries'):
-        industry_list.append(i[0])
-    if (cfg.has_option('industries','JapanAndChinaToOther')):
-        try:
-            JapanAndChinaToOther = cfg.getboolean('industries','JapanAndChinaToOther')
-        except:
-            logger.error('In [industries] section item JapanAndChinaToOther is not boolean')
-else:
-    logger.error('No [industries] section in {}'.format(ini_file))
-
-centres = ["H","NY1","SNG","LON1","PA"]   # short names used in the Excel file
-centres_long = ["Houston", "New York", "Singapore", "London", "Palo Alto"]  # same order as short names
-
-stop_words=[]
-if 'stopwords' in cfg:
-    stop_words+=json.loads(cfg.get('stopwords','stop_words'))
-else:
-    logger.error('No [stopwords] section in {}'.format(ini_file))
-stop_words+=vocab
-
-
-
-def make_date(cell_val):
-    """Used to create a better-structured date value from the sometimes-odd values in the date column
-       Returns a datetime
-    """
-    if type(cell_val) is datetime:
-        v=cell_val.date()
-    elif type(cell_val) is str:
-        try:
-            v=datetime.strptime(cell_val,"%b %d, %Y").date()
-        except ValueError:
-            v=date.fromordinal(1)
-    else:
-        v=date.fromordinal(2)
-    return v
-
 def tidy_text(cell_val):
     """Standardises the text in a cell: removes lots of punctuation, and replaces synonyms by their root word
        Returns the tidied text
     """
-    if type(cell_val) is str:
-        cell = cell_val.lower()
-        cell=re.sub('[\n&@,.:-]',' ',cell)
-        cell=" ".join(cell.split())   # idiom to turn multiple spaces between words into single spaces
-        for k,v in synonym_list.items():
-            cell=cell.replace(k,v)
-    else:
-        cell=""
-    return cell
+    return synonym_normalizer.tidy_text(cell_val)
 
 def bool_list_of_occurrences(series,kwd):
     """Return a boolean list, 1 where an element of 'series' contains word 'kwd', else 0
@@ -228,7 +137,8 @@ def print_new_candidate_words(df,stop_words,top_n=25):
     return
 
 def dataframe_for_month(df, year=2017, month=1):
-    """Yields a subset the dataframe with only those rows in the given month
+    """Yields a subset the dataframe with only those rows in the given month.  df is a dataframe with a 'date'
+       column, or the whole spreadsheet's DateIndex, which finds the month's rows by binary search
        Returns a dataframe
     """
     mm=month
@@ -237,13 +147,17 @@ def dataframe_for_month(df, year=2017, month=1):
     else: mm2,yyyy2=mm+1,yyyy
 
     logger.debug("Selecting rows for %i-%i" % (yyyy,mm))
-    month_df = df.loc[ (df.date>=date(yyyy,mm,1)) & (df.date<date(yyyy2,mm2,1)) ]
+    if isinstance(df, DateIndex):
+        month_df = df.month(yyyy,mm)
+    else:
+        month_df = df.loc[ (df.date>=month_start(yyyy,mm)) & (df.date<month_start(yyyy2,mm2)) ]
     logger.debug("Found %i rows for this month" % len(month_df.index))
 
     return month_df
 
 def dataframe_for_6months(df, year=2017, month=1):
-    """Yields a subset the dataframe with those rows for last 6 months up to given month
+    """Yields a subset the dataframe with those rows for last 6 months up to given month.  df is a dataframe
+       with a 'date' column, or the whole spreadsheet's DateIndex, which finds the rows by binary search
        Returns a dataframe
     """
     mm=month
@@ -256,7 +170,10 @@ def dataframe_for_6months(df, year=2017, month=1):
     else: mm_start,yyyy_start=mm-5,yyyy
 
     logger.debug("Selecting rows for %i-%i to %i-%i" % (yyyy_start,mm_start,yyyy,mm))
-    month_df = df.loc[ (df.date>=date(yyyy_start,mm_start,1)) & (df.date<date(yyyy_end,mm_end,1)) ]
+    if isinstance(df, DateIndex):
+        month_df = df.months(yyyy,mm,count=6)
+    else:
+        month_df = df.loc[ (df.date>=month_start(yyyy_start,mm_start)) & (df.date<month_start(yyyy_end,mm_end)) ]
     logger.debug("Found %i rows for this month" % len(month_df.index))
 
     return month_df
@@ -268,31 +185,24 @@ def found_word_list(df_col_list, kwd):
        Can be used to subset the original dataframe to pick out the rows with the keyword in them:
            df[found_word_list({df.wtlma, df.actions},"foo")]   => subset of df with "foo" in one of the columns
     """
-    found_list = [0] * df_col_list[0].count()   # set up with list of zeros, same length as first column in the list
-    for col in df_col_list:
-        found_list = bool_list_of_occurrences(col, kwd) | found_list
-
-    return found_list
+    fields = [col.name for col in df_col_list]
+    return kwd_incidence.rows_with_keyword(df_col_list[0], fields, kwd)
 
 def kwds_in_wtlma_actions(df,keyword_list):
     """ Count each keyword in the dataframe's important columns, wtlma and actions.
         Returns a Counter collection of (keyword:count)
     """
-    counter_words_to_freq = Counter()
-    for w in keyword_list:
-         counter_words_to_freq[w] += sum(found_word_list([df.wtlma, df.actions],w))
-
-    return counter_words_to_freq
+    if not kwd_incidence.has_keywords(keyword_list):
+        return KeywordMatcher(keyword_list).keyword_counts([df.wtlma, df.actions])
+    return kwd_incidence.keyword_counts(df, ["wtlma","actions"])
     
 def kwds_in_objectives(df,keyword_list):
     """ Count each keyword in the dataframe's 'objectives' column.
         Returns a Counter collection of (keyword:count)
     """
-    counter_words_to_freq = Counter()
-    for w in keyword_list:
-         counter_words_to_freq[w] += sum(found_word_list([df.objectives],w))
-
-    return counter_words_to_freq
+    if not kwd_incidence.has_keywords(keyword_list):
+        return KeywordMatcher(keyword_list).keyword_counts([df.objectives])
+    return kwd_incidence.keyword_counts(df, ["objectives"])
 
 
 def count_rows_with_comments(df):
@@ -311,81 +221,16 @@ def counts_by_centre(dataframe):
                    )
     return counts_list
 
-class SimpleGroupedColorFunc(object):
-    """Create a color function object which assigns EXACT colors
-       to certain words based on the color to words mapping
-
-       Parameters
-       ----------
-       color_to_words : dict(str -> list(str))
-         A dictionary that maps a color to the list of words.
-
-       default_color : str
-         Color that will be assigned to a word that's not a member
-         of any value from color_to_words.
-    """
-
-    def __init__(self, color_to_words, default_color):
-        self.word_to_color = {word: color
-                              for (color, words) in color_to_words.items()
-                              for word in words}
-
-        self.default_color = default_color
-
-    def __call__(self, word, **kwargs):
-        return self.word_to_color.get(word, self.default_color)
-
-class GroupedColorFunc(object):
-    """Create a color function object which assigns DIFFERENT SHADES of
-       specified colors to certain words based on the color to words mapping.
-
-       Uses wordcloud.get_single_color_func
-
-       Parameters
-       ----------
-       color_to_words : dict(str -> list(str))
-         A dictionary that maps a color to the list of words.
-
-       default_color : str
-         Color that will be assigned to a word that's not a member
-         of any value from color_to_words.
-    """
-
-    def __init__(self, color_to_words, default_color):
-        from wordcloud import get_single_color_func
-        self.color_func_to_words = [
-            (get_single_color_func(color), set(words))
-            for (color, words) in color_to_words.items()]
-
-        self.default_color_func = get_single_color_func(default_color)
-
-    def get_color_func(self, word):
-        """Returns a single_color_func associated with the word"""
-        try:
-            color_func = next(
-                color_func for (color_func, words) in self.color_func_to_words
-                if word in words)
-        except StopIteration:
-            color_func = self.default_color_func
-
-        return color_func
-
-    def __call__(self, word, **kwargs):
-        return self.get_color_func(word)(word, **kwargs)
-
-def file_wordcloud_for_month(keywords_for_month, useful_rows_for_month, year=2017, month=8):
+def file_wordcloud_for_month(keywords_for_month, useful_rows_for_month, year, month, box, prefix="wordcloud"):
     """Input is a keywords_for_month, a Counter, plus useful_rows_for_month, an integer, and year and month as integers.  
-       Returns the filename where the wordcloud is stored
+       box is the (width, height) in EMU of the picture it will be placed in.
+       Submits the wordcloud for rendering.
+       Returns the name of the wordcloud image - pass it to renderer.image() to wait for it
     """
-    ##Build a wordcloud, using the wordcloud code from Andreas Mueller
-    # (to install, run "pip install wordcloud")
-    from wordcloud import WordCloud
-    import matplotlib.pyplot as plt
-    import os
-
-    # set font so 30% occurrence of top word uses 196 point font
+    width, height = render_jobs.pixels(box[0],wordcloud_dpi), render_jobs.pixels(box[1],wordcloud_dpi)
+    # set font so 30% occurrence of top word uses 196 point font (on a wordcloud 500 pixels high)
     percent = round(100*(keywords_for_month.most_common(1)[0][1]/useful_rows_for_month))
-    font_for_biggest_word = round( 196 * percent/30 )
+    font_for_biggest_word = round( 196 * percent/30 * height/500 )
     logger.debug("font for word {} is {} based on {}% = {} / {}".format(
                                keywords_for_month.most_common(1)[0][0],
                                      font_for_biggest_word,
@@ -393,18 +238,8 @@ def file_wordcloud_for_month(keywords_for_month, useful_rows_for_month, year=201
                                                 keywords_for_month.most_common(1)[0][1],
                                                         useful_rows_for_month))
 
-    font_path = os.path.join("C:",os.sep,"Windows",os.sep,"Fonts",os.sep,'arial.ttf')
     logger.debug("Generating the wordcloud")
     keywords_for_month += Counter()    # remove any zero or negative counts from the list
-    wc_for_month = WordCloud(font_path=font_path,
-                             width=2500,height=500,
-                             prefer_horizontal=1.0,
-                             relative_scaling=0.7,
-                             max_font_size=font_for_biggest_word,
-                             background_color="white",
-                             random_state=1
-                             ).generate_from_frequencies(keywords_for_month)
-
 
     # Words that are not in any of the dict_colour_of_keywords values
     # will be colored with a grey single color function
@@ -413,61 +248,36 @@ def file_wordcloud_for_month(keywords_for_month, useful_rows_for_month, year=201
     # Apply our color function
     #grouped_color_func = GroupedColorFunc(dict_colour_of_keywords, default_color)
     grouped_color_func = SimpleGroupedColorFunc(dict_colour_of_keywords, default_color)
-    wc_for_month.recolor(color_func=grouped_color_func)
 
-    # Build the generated image
-    plt.imshow(wc_for_month,interpolation='bilinear')
-    plt.axis("off")
-    plt.figure()
-    #plt.show()
+    name = prefix+"-"+calendar.month_name[month]+".png"
+    logger.debug("Rendering %s at %ix%i pixels" % (name,width,height))
+    return renderer.submit(name, render_jobs.wordcloud_png, keywords_for_month,
+                           width, height, font_for_biggest_word, font_path, grouped_color_func, cache=render_cache)
 
-    filename = tmpdir+"wordcloud-"+calendar.month_name[month]+".png"
-    plt.imsave(filename,wc_for_month,format="png")
-    plt.close()
-
-    return filename
-
-
-def file_graph_for_month_kwd(kwd,kwd_pos,vals,months,line_color):
-    fig,ax=plt.subplots(figsize=(5.75,3.25))
-    ##############ax.clear()
-
-    ax.plot(vals,line_color,linewidth=3)
-    ax.set_axis_off()
-    plt.ylim(min(vals)-0.05,max(vals)+0.05)
-    m_minus_2_percent = "{0:.0f}%".format(vals[0] * 100)
-    m_this_percent    = "{0:.0f}%".format(vals[2] * 100)
-    ax.text(0,vals[0]+0.02,calendar.month_abbr[months[0]]+"\n"+m_minus_2_percent,fontsize=30)
-    ax.text(2,vals[2]+0.02,calendar.month_abbr[months[2]]+"\n"+m_this_percent,fontsize=30)
-    filename = tmpdir+"graph-"+str(kwd_pos)+".png"
-    logger.debug("Saving %s graph for keyword %s in file %s" % (kwd_pos,kwd,filename))
-    fig.savefig(filename,bbox_inches="tight")
-    plt.close(fig)
-
-    return filename
-
-def file_donut_pie_for_month(values,name):
-    fig, ax = plt.subplots()
-    ax.axis('equal')
-    outside, _ = ax.pie(values,startangle=90,counterclock=False,
-                        colors=list(colour_list))
-    ax.legend(("Palo Alto","Houston","NY","London","Singapore"),fontsize=24,bbox_to_anchor=(0.8,1.0),frameon=False)
-    width = 0.50  #determines the thickness of donut rim
-    plt.setp( outside, width=width, edgecolor='white')
-
-    filename = tmpdir+"donut-"+re.sub(r"[& ]","_",str(name))+".png"
-    logger.debug("Saving <%s> donut in file %s with values %r" % (name, filename, values))
-    fig.savefig(filename,bbox_inches="tight")
-
-    plt.close(fig)
-
-    return filename
+def file_graph_for_month_kwd(kwd,kwd_pos,vals,months,line_color,box):
+    """Submits the line graph of vals for rendering, to fit box, the (width, height) in EMU of the picture it will be placed in.
+       Returns the name of the graph image - pass it to renderer.image() to wait for it
+    """
+    image_name = "graph-"+str(kwd_pos)+".png"
+    logger.debug("Rendering %s graph for keyword %s as %s" % (kwd_pos,kwd,image_name))
+    return renderer.submit(image_name, render_jobs.line_graph_png, vals, months, line_color,
+                           box[0]/render_jobs.emu_per_inch, box[1]/render_jobs.emu_per_inch, render_dpi)
+
+def file_donut_pie_for_month(values,name,box):
+    """Submits the donut pie of values by centre for rendering, to fit box, the (width, height) in EMU of the picture it will be placed in.
+       Returns the name of the donut image - pass it to renderer.image() to wait for it
+    """
+    image_name = "donut-"+re.sub(r"[& ]","_",str(name))+".png"
+    logger.debug("Rendering <%s> donut as %s with values %r" % (name, image_name, values))
+    return renderer.submit(image_name, render_jobs.donut_png, values, colour_list,
+                           ("Palo Alto","Houston","NY","London","Singapore"),
+                           box[0]/render_jobs.emu_per_inch, box[1]/render_jobs.emu_per_inch, render_dpi)
 
 def donut_pie_for_industries(industries,slide_shapes):
     """Given a Series resulting from value_counts(), and a slide_shapes, we create
        the doughnut pie chart corresponding to the value counts on the slide_shapes object.
     """
-    from pptx.chart.data import ChartData
+    from chart_workbook import TemplatedChartData
     from pptx.enum.chart import XL_CHART_TYPE, XL_LEGEND_POSITION
     from collections import Counter
 
@@ -482,7 +292,7 @@ def donut_pie_for_industries(industries,slide_shapes):
     industry_counts = Counter( dict(zip(industries.keys().tolist(),industries.tolist())) )    # put in Counter so we can retrieve in descending order
 
     logger.debug("Adding pie for industries with data: "+str(industry_counts))
-    chart_data=ChartData()
+    chart_data=TemplatedChartData()
     # This next is a bit obscure, but if i_c=Counter([('A':5),('B':4),('C':3)])
     # then zip(*i_c.most_common()) gives us a zip object which iterates out to a list of the keys, and the values, in descending order
     ind_lists = [i for i in zip(*industry_counts.most_common())] 
@@ -506,11 +316,11 @@ def donut_pie_for_centres(value_tuple,legend,slide_shapes,left_x,top_y,width,hei
        with a legend underneath the pie of the data element names (the keys in the list).
        We use a list, not a dictionary, because we want to preserve order of the keys.
     """
-    from pptx.chart.data import ChartData
+    from chart_workbook import TemplatedChartData
     from pptx.enum.chart import XL_CHART_TYPE, XL_LEGEND_POSITION
 
     logger.debug("Adding pie with data: "+str(value_tuple))
-    chart_data=ChartData()
+    chart_data=TemplatedChartData()
     chart_data.categories=legend
     chart_data.add_series("Centres",value_tuple)
     chart = slide_shapes.add_chart(XL_CHART_TYPE.DOUGHNUT, left_x,top_y, width, height, chart_data).chart   
@@ -520,7 +330,72 @@ def donut_pie_for_centres(value_tuple,legend,slide_shapes,left_x,top_y,width,hei
     chart.legend.include_in_layout = 0 
     chart.legend.font.size = Pt(10) 
 
-    return 
+    return chart
+
+def line_chart_for_month_kwd(vals,months,line_color,slide_shapes,left_x,top_y,width,height):
+    """Native PowerPoint version of the line graph from render_jobs.line_graph_png: the three values in vals
+       as a line in line_color (a #rrggbb string), with no axes, labelled at each end with the month (from months)
+       and the value as a percentage.  The chart is put on slide_shapes in the given position & size.
+       Returns the chart
+    """
+    from chart_workbook import TemplatedChartData
+    from pptx.enum.chart import XL_CHART_TYPE, XL_LABEL_POSITION, XL_MARKER_STYLE
+
+    logger.debug("Adding line chart with data: "+str(vals))
+    chart_data=TemplatedChartData(number_format='0%')
+    chart_data.categories=[calendar.month_abbr[m] for m in months]
+    chart_data.add_series("Visits",vals)
+    chart = slide_shapes.add_chart(XL_CHART_TYPE.LINE, left_x,top_y, width, height, chart_data).chart
+    chart.has_title = False
+    chart.has_legend = False
+    chart.category_axis.visible = False
+    chart.value_axis.visible = False
+    chart.value_axis.has_major_gridlines = False
+    chart.value_axis.minimum_scale = min(vals)-0.05
+    chart.value_axis.maximum_scale = max(vals)+0.05
+    series = chart.plots[0].series[0]
+    series.smooth = False
+    series.marker.style = XL_MARKER_STYLE.NONE
+    series.format.line.color.rgb = RGBColor.from_string(line_color.lstrip('#'))
+    series.format.line.width = Pt(2.25)
+    for i in (0,len(vals)-1):
+        data_label = series.points[i].data_label
+        data_label.text_frame.text = calendar.month_abbr[months[i]]+"\n"+"{0:.0f}%".format(vals[i] * 100)
+        data_label.position = XL_LABEL_POSITION.ABOVE
+        data_label.font.size = Pt(9)
+    return chart
+
+def donut_chart_for_month(values,slide_shapes,left_x,top_y,width,height):
+    """Native PowerPoint version of the donut from render_jobs.donut_png: values by centre,
+       in the colours from the ini file, with the legend alongside.  The chart is put on slide_shapes
+       in the given position & size.
+       Returns the chart
+    """
+    from pptx.enum.chart import XL_LEGEND_POSITION
+    from pptx.oxml.xmlchemy import OxmlElement
+    from pptx.oxml.ns import qn
+
+    chart = donut_pie_for_centres(values,["Palo Alto","Houston","NY","London","Singapore"],
+                                  slide_shapes,left_x,top_y,width,height)
+    chart.legend.position = XL_LEGEND_POSITION.RIGHT
+    chart.legend.font.size = Pt(8)
+    # same rim thickness as the matplotlib donut.  python-pptx has no property for the hole size, and may not
+    # write the (optional) c:holeSize element, so add it where the schema puts it if it isn't there
+    doughnut = chart.plots[0]._element
+    hole_size = doughnut.find(qn('c:holeSize'))
+    if hole_size is None:
+        hole_size = OxmlElement('c:holeSize')
+        ext_list = doughnut.find(qn('c:extLst'))
+        if ext_list is None:
+            doughnut.append(hole_size)
+        else:
+            ext_list.addprevious(hole_size)
+    hole_size.set('val','50')
+    for point,colour in zip(chart.plots[0].series[0].points,colour_list):
+        point.format.fill.solid()
+        point.format.fill.fore_color.rgb = RGBColor.from_string(colour.lstrip('#'))
+        point.format.line.color.rgb = RGBColor(0xFF,0xFF,0xFF)
+    return chart
 
 def write_customer_list(df_for_kwd,text_frame):
     text_frame.text = "Briefings"
@@ -571,32 +446,24 @@ def write_top_keywords(text_frame,titleText,kwd_counts_for_ind,rowcount,percent=
 
     return
 
-def find_text_in_shapes(slide_shapes,searchword):
-    """Find the given text in the list of powerpoint shapes passed in slide_shapes
+def slide_placeholders(slide_shapes,slidename):
+    """Index the placeholder text in slide_shapes, so it can be found and replaced without searching every shape
+       Returns the PlaceholderIndex, which is also kept to report the unused placeholders once the deck is done
     """
-    found_idx = -1
-    for i in range(len(slide_shapes)):
-        if (slide_shapes[i].has_text_frame):
-            text_frame = slide_shapes[i].text_frame
-            if (text_frame.text.find(searchword)>=0):
-                found_idx = i
-                break
-
-    return found_idx
-
-def replace_text_in_shape(slide_shapes,find,use,slidename):
-    """Find the placeholder text "find" in the slide_shapes, replace it with "use",
-       reporting an error on "slidename" if we can't find "find"
+    placeholders = PlaceholderIndex(slide_shapes,slidename)
+    placeholder_indexes.append(placeholders)
+    return placeholders
+
+def replace_text_in_shape(placeholders,find,use):
+    """Find the placeholder text "find" in the slide indexed by placeholders, replace it with "use",
+       reporting an error if we can't find "find"
        Returns the text_frame written
     """
-    i = find_text_in_shapes(slide_shapes,find)
-    if (i>=0):
-        text_frame = slide_shapes[i].text_frame
-        text_frame.text = use
-    else:
-        logger.error("Could not find %s placeholder on %s" % (find,slidename))
+    text_frame = placeholders.replace(find,use)
+    if text_frame is None:
+        logger.error("Could not find %s placeholder on %s" % (find,placeholders.slidename))
 
-    return
+    return text_frame
 
 def new_run_in_slide(para,text='text',fontname='Arial',fontsize=24):
     "Add new run to a paragraph in a powerpoint slide"
@@ -607,118 +474,55 @@ def new_run_in_slide(para,text='text',fontname='Arial',fontsize=24):
     font.name = fontname
     return run
 
-import struct
-import imghdr
-
-def get_image_size(fname):
-    '''Determine the image type of fname and return its width, height.
-    from draco (via stackoverflow)'''
-    with open(fname, 'rb') as fhandle:
-        head = fhandle.read(24)
-        if len(head) != 24:
-            return
-        if imghdr.what(fname) == 'png':
-            check = struct.unpack('>i', head[4:8])[0]
-            if check != 0x0d0a1a0a:
-                return
-            width, height = struct.unpack('>ii', head[16:24])
-        elif imghdr.what(fname) == 'gif':
-            width, height = struct.unpack('<HH', head[6:10])
-        elif imghdr.what(fname) == 'jpeg':
-            try:
-                fhandle.seek(0) # Read 0xff next
-                size = 2
-                ftype = 0
-                while not 0xc0 <= ftype <= 0xcf:
-                    fhandle.seek(size, 1)
-                    byte = fhandle.read(1)
-                    while ord(byte) == 0xff:
-                        byte = fhandle.read(1)
-                    ftype = ord(byte)
-                    size = struct.unpack('>H', fhandle.read(2))[0] - 2
-                # We are at a SOFn block
-                fhandle.seek(1, 1)  # Skip `precision' byte.
-                height, width = struct.unpack('>HH', fhandle.read(4))
-            except Exception: #IGNORE:W0703
-                return
-        else:
-            return
-        return width, height
-
 def add_icon(ss,icon_name,left,top,small=False):
-    """Add the icon in icondir/icon_name to the slide shape ss at coordinates left,top
+    """Add the icon for keyword icon_name, from the icon registry, to the slide shape ss at coordinates left,top
        If small is True, make it a smaller icon.
     """
     ## ok if icon exists, and use error icon if not
     logger.debug("adding icon <{}> at ({},{})".format(icon_name,left,top))
-    try:
-        filename = icondir+icon_name+".png"
-        icon_width, _icon_height = get_image_size(filename)
-        pixels_per_mm = 6
-        if small:
-            icon_width = 0.4*icon_width
-            ss.add_picture(filename,round(left-icon_width/pixels_per_mm),top,Mm(12),Mm(12))
-        else:
-            ss.add_picture(filename,round(left-icon_width/pixels_per_mm),top,Mm(34),Mm(34))
-    except:
-        logger.warning("Could not find icon {}".format(icondir+icon_name+'.png'))
+    found = icons.icon(icon_name)
+    if found is None:
+        return
+    blob, icon_width, _icon_height = found
+    pixels_per_mm = 6
+    if small:
+        icon_width = 0.4*icon_width
+        ss.add_picture(io.BytesIO(blob),round(left-icon_width/pixels_per_mm),top,Mm(12),Mm(12))
+    else:
+        ss.add_picture(io.BytesIO(blob),round(left-icon_width/pixels_per_mm),top,Mm(34),Mm(34))
     return
 
 
-def hpe_color_fn(word, font_size, position, orientation, random_state=None, **kwargs):
-    """Returns colour to use for given word, font_size, etc.
-    """
-    import random
-    colour = random.choice(colour_list)
-    return colour
-
-def file_wordcloud_for_partners(partner_counts):
-    """Input is partner_counts, a Counter of partner names and occurrences
-       Returns the filename where the wordcloud is stored
+def file_wordcloud_for_partners(partner_counts, box):
+    """Input is partner_counts, a Counter of partner names and occurrences, and box, the (width, height)
+       in EMU of the picture it will be placed in.
+       Submits the wordcloud for rendering.
+       Returns the name of the wordcloud image - pass it to renderer.image() to wait for it
     """
-    ##Build a wordcloud, using the wordcloud code from Andreas Mueller
-    from wordcloud import WordCloud
-    import matplotlib.pyplot as plt
-    import os
-
+    width, height = render_jobs.pixels(box[0],wordcloud_dpi), render_jobs.pixels(box[1],wordcloud_dpi)
     # Chop list after most common 30 partners (note, need to use dict() around most_common() as it returns a list)
     p_counts = Counter(dict(partner_counts.most_common(30)))
-    # set font so 15% occurrence of top word uses 196 point font
+    # set font so 15% occurrence of top word uses 196 point font (on a wordcloud 500 pixels high)
     percent = round(100*(p_counts.most_common(1)[0][1]/sum(p_counts.values())))
-    font_for_biggest_word = round( 196 * percent/15 )
+    font_for_biggest_word = round( 196 * percent/15 * height/500 )
 
-    font_path = "C:"+os.sep+"Windows"+os.sep+"Fonts"+os.sep+'arial.ttf'
     logger.debug("Generating the wordcloud for Partners")
     p_counts += Counter()    # remove any zero or negative counts from the list
-    wc_partners = WordCloud(font_path=font_path,
-                            width=2000,height=500,
-                            prefer_horizontal=1.0,
-                            relative_scaling=0.7,
-                            max_font_size=font_for_biggest_word,
-                            background_color="white",
-                            random_state=1
-                            ).generate_from_frequencies(p_counts)
-
-    # Re-colour to the required colour se
-    wc_partners.recolor(color_func=hpe_color_fn, random_state=3)
-
-    # Build the generated image
-    plt.imshow(wc_partners,interpolation='bilinear')
-    plt.axis("off")
-    plt.figure()
-    # Save the wordcloud to file
-    filename = tmpdir+"partner_wordcloud.png"
-    plt.imsave(filename,wc_partners,format="png")
-    plt.close()
-    return filename
+
+    # Re-colour to the required colour set
+    name = "partner_wordcloud.png"
+    logger.debug("Rendering %s at %ix%i pixels" % (name,width,height))
+    return renderer.submit(name, render_jobs.wordcloud_png, p_counts,
+                           width, height, font_for_biggest_word, font_path,
+                           functools.partial(hpe_color_fn, colour_list=colour_list), recolor_random_state=3,
+                           cache=render_cache)
 
 def sentiment_by_month(df, count, year, month):
     # Calculate the sentiment by month for the last 'count' months from 'month' in 'year'
     # Returns an array with the average compound sentiment score per month, from
     # most recent month to oldest month (so July, June, May, in that order, etc)
-    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    # df must have the score columns from sentiment.score_frame(), for every row in those months
     assert (count<12),"only works for intervals of up to 12 months"   
-    analyzer = SentimentIntensityAnalyzer()
     result=[]
     for i in range(0,count):
         m = month-i
@@ -727,16 +531,10 @@ def sentiment_by_month(df, count, year, month):
             m += 12
             y -= 1
         month_df = dataframe_for_month(df, year=y, month=m)
-        avg_snt = tot_snt = {'neg': 0.0, 'neu':0.0, 'pos': 0.0, 'compound':0.0}
-        n=0
-        for _, row in month_df.iterrows():
-            cell = row["Customer Overall Comments"]
-            if (isinstance(cell, str)):
-                snt = analyzer.polarity_scores(cell)
-                n += 1
-                tot_snt['neg'] += snt['neg']
-                tot_snt['neu'] += snt['neu']
-                tot_snt['pos'] += snt['pos']
+        avg_snt = {'neg': 0.0, 'neu':0.0, 'pos': 0.0, 'compound':0.0}
+        commented = month_df[month_df["sentiment"].notna()]
+        n = len(commented.index)
+        tot_snt = {name: sum(commented[column]) for name,column in score_columns.items()}
         if (n > 0):        
             avg_snt['neg'] = round(tot_snt['neg'] / n, 3)         
             avg_snt['neu'] = round(tot_snt['neu'] / n, 3)         
@@ -747,579 +545,850 @@ def sentiment_by_month(df, count, year, month):
     return result
 
 
-def top_sentiment_in_month(month_df, count=4):
-    # Return dictionary with top [count] comments for given month, by sentiment
-    # Each dictionary item is   {"user comment in full": compound_sentiment_score}
-    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+def sentiment_of_keywords(cube, keywords, **where):
+    """Describe the average sentiment of the comments mentioning each of keywords, from the SentimentCube cube,
+       in the months, centre and industry given by where (e.g. centre="PA"), or all of them
+       Returns a string, e.g. "synergy 0.62 (n=12), aruba 0.48 (n=9)"
+    """
+    described = []
+    for kwd in keywords:
+        mean, count = cube.total(keyword=kwd, **where)
+        described.append("%s %s (n=%i)" % (kwd, "%.2f" % mean if count else "-", count))
+    return ", ".join(described)
+
+def add_sentiment_slide(prs, cube, keywords, slide_centres, position, title):
+    """Add a slide with a table of the average sentiment of the comments mentioning each of keywords, from the
+       SentimentCube cube, for all centres and then each of slide_centres, and move it to be slide number
+       position (counting from 1).  Its notes give the same for the biggest industries.
+       Returns the new slide, or None if the template has no "Title Only" layout to make it from
+    """
+    layout = prs.slide_layouts.get_by_name("Title Only")
+    if layout is None:
+        logger.warning('No "Title Only" layout in the template, so no sentiment slide')
+        return None
+    s = prs.slides.add_slide(layout)
+    title_frame = s.shapes.title.text_frame
+    title_frame.clear()
+    new_run_in_slide(title_frame.paragraphs[0],text=title,fontname="Arial",fontsize=28)
+
+    means, counts = cube.table("keyword", "centre")
+    table = s.shapes.add_table(len(keywords)+1, len(slide_centres)+2, Mm(17), Mm(32),
+                               Mm(305), Mm(8)*(len(keywords)+1)).table
+    headings = ["Interest", "All centres"] + [centres_long[centres.index(ctr)] for ctr in slide_centres]
+    for col,heading in enumerate(headings):
+        new_run_in_slide(table.cell(0,col).text_frame.paragraphs[0],text=heading,fontname="Arial",fontsize=14)
+    for row,kwd in enumerate(keywords,start=1):
+        mean, count = cube.total(keyword=kwd)
+        cells = ["%.2f (n=%i)" % (mean,count) if count else "-"]
+        for ctr in slide_centres:
+            count = counts.loc[kwd,ctr]
+            cells.append("%.2f (n=%i)" % (means.loc[kwd,ctr],count) if count else "-")
+        new_run_in_slide(table.cell(row,0).text_frame.paragraphs[0],text=kwd,fontname="Arial",fontsize=12)
+        for col,text in enumerate(cells,start=1):
+            new_run_in_slide(table.cell(row,col).text_frame.paragraphs[0],text=text,fontname="Arial",fontsize=12)
+
+    # The notes: the same keywords in each of the industries with the most mentions of them
+    industry_counts = cube.table("industry", "keyword")[1][keywords].sum(axis=1).sort_values(ascending=False)
+    notes_tf = s.notes_slide.notes_text_frame
+    notes_tf.text = "Average sentiment (-1 to 1) of the comments mentioning each interest, by industry:\n"
+    for ind in industry_counts.index[:8]:
+        notes_tf.text += "%s: %s\n" % (ind, sentiment_of_keywords(cube, keywords, industry=ind))
+
+    move_slide(prs, s, position)     # python-pptx adds it at the end
+    return s
+
+def top_sentiment_in_month(month_df, count=4, lowest=False):
+    # Return dictionary with top [count] comments for given month, by sentiment (or with lowest, the bottom [count])
+    # Each dictionary item is   {"user comment in full": compound_sentiment_score}, best (or worst) first
+    # month_df must have the "sentiment" column from sentiment.score_frame()
     assert (isinstance(count,int)),"only works for values of count which are integers"
     assert (count>0),"only works for values of count which are greater than zero"
-    analyzer = SentimentIntensityAnalyzer()
-    results={}
-    lowest_top_snt = 0.0  # lowest sentiment to make it into top N
-    found_count=0
-    for _, row in month_df.iterrows():
-        cell = row["Customer Overall Comments"]
-        if (isinstance(cell, str)):
-            this_snt = analyzer.polarity_scores(cell)
-            if (found_count < count):
-                # Haven't yet found [count] items to return, so this will automatically be added
-                found_count += 1 
-                results[cell] = this_snt['compound']
-            elif (this_snt["compound"] > lowest_top_snt):
-                # This item is more positive than lowest in top so far
-                # So find lowest scoring item already saved, and discard 
-                del results[ min(results, key=results.get) ]
-                results[cell]=this_snt['compound']
-            lowest_top_snt = min(results.values())
-    return results
-
-
-logger.info("Importing excel file "+excel_file+" with header in row "+str(header_row))
-# Note that "header" is zero-indexed, so must subtract one from header_row
-all_df = pd.read_excel(open(excel_file,'rb'),header=header_row-1,usecols="A:S")   
-
-logger.debug("Adding structured columns")
-all_df.insert(loc=0,column='date',value=all_df['Visit Date'].apply(make_date))
-all_df.insert(loc=1,column='wtlma',value=all_df['Want to Learn More About'].apply(tidy_text))
-all_df.insert(loc=2,column='actions',value=all_df['Action Items'].apply(tidy_text))
-all_df.insert(loc=3,column='objectives',value=all_df['Objectives'].apply(tidy_text))
-
-print_new_candidate_words(all_df,stop_words,top_n=40)
-if stop_after_wordcheck:
-    sys.exit()
-
-
-## Given the month and year, calc the number of the previous few months
-if (mm==1): mm_minus_1,year_for_mm_minus_1 = 12, yyyy-1
-else: mm_minus_1, year_for_mm_minus_1 = mm-1, yyyy
-if (mm<=2): mm_minus_2,year_for_mm_minus_2 = mm+10, yyyy-1
-else: mm_minus_2, year_for_mm_minus_2 = mm-2, yyyy
-if (mm<6): mm_6_before,year_for_mm_6_before = mm+7, yyyy-1   #6 months before Jan is Aug
-else: mm_6_before, year_for_mm_6_before = mm-5, yyyy    #6 months before Jul is Feb
-
-### Now start to generate the powerpoint
-from pptx import Presentation
-from pptx.util import Inches, Pt, Mm
-
-# These appear to be the layouts used in the master for this slide deck
-LAYOUT_TITLE_WITH_DARK_PICTURE = 0
-LAYOUT_TITLE_SLIDE_WITH_NAME   = 1
-LAYOUT_DIVIDER                 = 2
-LAYOUT_TITLE_ONLY              = 3
-LAYOUT_TITLE_AND_SUBTITLE      = 4
-LAYOUT_BLANK                   = 5
-
-## Open up the source presentation
-prs = Presentation('GCA_Customer_Insights_Month-Year.pptx')
-this_month = calendar.month_name[mm]
-earliest_month = calendar.month_name[mm_minus_2]
-logger.info("Creating presentation for %s" % (this_month))
-
-################################################
-## Modify existing title slide with month
-################################################
-logger.info("Modifying text in slide 0")
-s = prs.slides[0]
-slide_shapes = s.shapes
-text_frame = slide_shapes[0].text_frame  # should be the the title textframe
-#clear existing text, and write new text into title textframe
-text_frame.clear()
-# First para with a run of 60-point Arial font
-new_run_in_slide(text_frame.paragraphs[0],text='Customer Insights',fontname='Arial',fontsize=60)
-# Second para with a run of 32-point font
-new_run_in_slide(text_frame.add_paragraph(),text='Learnings from '+this_month+' EBC/CEC visits',fontsize=32)
-
-################################################
-## 3rd slide: count the keywords for this month and build the wordcloud
-################################################
-logger.info("3rd slide: large wordcloud for this month, and top 3 keywords")
-df_for_month = dataframe_for_month(all_df, year=yyyy, month=mm)
-kwd_count_for_month = kwds_in_wtlma_actions(df_for_month,vocab)
-useful_rows_in_m = count_rows_with_comments(df_for_month)
-logger.info("Top keyword/counts for month %i : %r" % (mm,kwd_count_for_month.most_common(5)) )
-file_wordcloud_for_month(kwd_count_for_month, useful_rows_in_m,
-                         year=yyyy,month=mm)
-## Modifying main wordcloud slide by changing title and adding pic for this month's wordcloud
-logger.debug("Modifying text and adding wordcloud in slide 2")
-s = prs.slides[2]
-slide_shapes=s.shapes
-title_frame = slide_shapes.title.text_frame
-title_frame.clear()
-new_run_in_slide(title_frame.paragraphs[0],text="In "+this_month+" customers wanted to learn more about...",
-       fontname="Arial",fontsize=28)
-left=Mm(12.5); top=Mm(100)
-slide_shapes.add_picture(tmpdir+"wordcloud-"+this_month+".png",left,top,height=Mm(63))
-
-##Find where the placeholders are for the top 3 keywords, update them, then add their icons
-top_3 = kwd_count_for_month.most_common(3)   # top 3 keywords for most recent month in list with their counts
-kwd0=top_3[0][0]
-kwd1=top_3[1][0]
-kwd2=top_3[2][0]
-logger.debug("Top 3 keywords for current month are %s %s %s" % (kwd0,kwd1,kwd2))
-replace_text_in_shape(slide_shapes,find="topword_1",use=kwd0,slidename="3rd slide")
-replace_text_in_shape(slide_shapes,find="topword_2",use=kwd1,slidename="3rd slide")
-replace_text_in_shape(slide_shapes,find="topword_3",use=kwd2,slidename="3rd slide")
-t=Mm(51)
-add_icon(slide_shapes,kwd0,left=Mm(47),top=t)
-add_icon(slide_shapes,kwd1,left=Mm(152),top=t)
-add_icon(slide_shapes,kwd2,left=Mm(255),top=t)
-
-## @15mar18: add text into notes for this slide to show actual counts for top 10 words
-notes_for_slide = s.notes_slide
-notes_tf = notes_for_slide.notes_text_frame
-notes_tf.text = ("Found %i rows with comments in this month.\nTop ten keyword/counts for %s: \n%r" % (useful_rows_in_m,this_month,kwd_count_for_month.most_common(10)) )
-
-################################################
-## 4th slide: count the keywords for previous two months, and build their wordclouds.
-################################################
-logger.info(">>>> 4th slide: three wordclouds for most recent 3 months")
-df_for_month_minus_1 = dataframe_for_month(all_df, year=year_for_mm_minus_1, month=mm_minus_1)
-kwd_count_for_m_minus_1 = kwds_in_wtlma_actions(df_for_month_minus_1,vocab)
-logger.info("Top keyword/counts for month %i : %r" % (mm_minus_1,kwd_count_for_m_minus_1.most_common(5)) )
-
-df_for_month_minus_2 = dataframe_for_month(all_df, year=year_for_mm_minus_2, month=mm_minus_2)
-kwd_count_for_m_minus_2 = kwds_in_wtlma_actions(df_for_month_minus_2,vocab)
-logger.info("Top keyword/counts for month %i : %r" % (mm_minus_2,kwd_count_for_m_minus_2.most_common(5)) )
-
-useful_rows_in_m_2 = count_rows_with_comments(df_for_month_minus_2)
-useful_rows_in_m_1 = count_rows_with_comments(df_for_month_minus_1)
-logger.info("Number of useful rows in months -2,-1,0 are %i, %i, %i" % (useful_rows_in_m_2,useful_rows_in_m_1,useful_rows_in_m))
-
-file_wordcloud_for_month(kwd_count_for_m_minus_1, useful_rows_in_m_1, year=year_for_mm_minus_1,month=mm_minus_1)
-file_wordcloud_for_month(kwd_count_for_m_minus_2, useful_rows_in_m_2, year=year_for_mm_minus_2,month=mm_minus_2)
-
-## Modifying 3-month wordcloud slide by adding pic for last 3 months' wordcloud
-logger.debug("Adding three wordclouds in 4th slide")
-s = prs.slides[3]
-slide_shapes=s.shapes
-left=Mm(93)
-top=Mm(36)
-h=Mm(38)
-slide_shapes.add_picture(tmpdir+"wordcloud-"+calendar.month_name[mm_minus_2]+".png",
-                         left,top,height=h)
-top=Mm(83)
-slide_shapes.add_picture(tmpdir+"wordcloud-"+calendar.month_name[mm_minus_1]+".png",
-                         left,top,height=h)
-top=Mm(128)
-slide_shapes.add_picture(tmpdir+"wordcloud-"+this_month+".png",
-                         left,top,height=h)
-#Find where the placeholders are for the keywords whose frequency we are graphing and update them
-replace_text_in_shape(slide_shapes,find="Month-2",use=calendar.month_name[mm_minus_2],slidename="4th slide")
-replace_text_in_shape(slide_shapes,find="Month-1",use=calendar.month_name[mm_minus_1],slidename="4th slide")
-replace_text_in_shape(slide_shapes,find="Month-0",use=calendar.month_name[mm],slidename="4th slide")
-
-################################################
-## 5th slide: for top 3 keywords for this month graph their usage
-################################################
-logger.info(">>>> 5th slide: top keywords for this month")
-months=[mm_minus_2,mm_minus_1,mm]
-
-kwd0_c2 = kwd_count_for_m_minus_2[kwd0] if (kwd0 in kwd_count_for_m_minus_2) else 0
-kwd0_c1 = kwd_count_for_m_minus_1[kwd0] if (kwd0 in kwd_count_for_m_minus_1) else 0
-kwd0_c0 = kwd_count_for_month[kwd0]     # must have keyword as it came from this dictionary
-vals_kwd0=[kwd0_c2/useful_rows_in_m_2, kwd0_c1/useful_rows_in_m_1, kwd0_c0/useful_rows_in_m]
-file_linegraph_topic1 = file_graph_for_month_kwd(kwd0,"1st",vals_kwd0,months,colour_list[0])
-logger.debug("Kwd0 is %s, data %r" % (kwd0,vals_kwd0))
-kwd1_c2 = kwd_count_for_m_minus_2[kwd1] if (kwd1 in kwd_count_for_m_minus_2) else 0
-
-kwd1_c1 = kwd_count_for_m_minus_1[kwd1] if (kwd1 in kwd_count_for_m_minus_1) else 0
-kwd1_c0 = kwd_count_for_month[kwd1]     # must have keyword as it came from this dictionary
-vals_kwd1=[kwd1_c2/useful_rows_in_m_2, kwd1_c1/useful_rows_in_m_1, kwd1_c0/useful_rows_in_m]
-file_linegraph_topic2 = file_graph_for_month_kwd(kwd1,"2nd",vals_kwd1,months,colour_list[1])
-logger.debug("Kwd1 is %s, data %r" % (kwd1,vals_kwd1))
-
-kwd2_c2 = kwd_count_for_m_minus_2[kwd2] if (kwd2 in kwd_count_for_m_minus_2) else 0
-kwd2_c1 = kwd_count_for_m_minus_1[kwd2] if (kwd2 in kwd_count_for_m_minus_1) else 0
-kwd2_c0 = kwd_count_for_month[kwd2]     # must have keyword as it came from this dictionary
-vals_kwd2=[kwd2_c2/useful_rows_in_m_2, kwd2_c1/useful_rows_in_m_1, kwd2_c0/useful_rows_in_m]
-file_linegraph_topic3 = file_graph_for_month_kwd(kwd2,"3rd",vals_kwd2,months,colour_list[2])
-logger.debug("Kwd0 is %s, data %r" % (kwd2,vals_kwd2))
-
-## Build a subset of the dataframe for last 3 months that uses each of the top 3 kwds in this month
-df_for_3months = pd.concat([df_for_month,df_for_month_minus_1,df_for_month_minus_2])
-col_list = [df_for_3months.actions, df_for_3months.wtlma]  # list of columns to search for kwds
-df_for_kwd0 = df_for_3months.loc[found_word_list(col_list,kwd0)]
-df_for_kwd1 = df_for_3months.loc[found_word_list(col_list,kwd1)]
-df_for_kwd2 = df_for_3months.loc[found_word_list(col_list,kwd2)]
-
-## Create donut pies showing split of visits expressing interest in top 3 topics by centre over last 3 months
-kwd0_counts = counts_by_centre(df_for_kwd0)
-file_donut_topic1 = file_donut_pie_for_month(counts_by_centre(df_for_kwd0),"1st")
-file_donut_topic2 = file_donut_pie_for_month(counts_by_centre(df_for_kwd1),"2nd")
-file_donut_topic3 = file_donut_pie_for_month(counts_by_centre(df_for_kwd2),"3rd")
-
-## Add the line graphs and donut pies to the Top 3 Customer Interests chart
-logger.debug("Adding line graphs, donuts and customers to the Top 3 Customer Interests slide (5th slide)")
-s = prs.slides[4]
-slide_shapes=s.shapes
-#Update the title
-title_frame = slide_shapes.title.text_frame
-title_frame.clear()
-new_run_in_slide(title_frame.paragraphs[0],text="Top 3 Customer Interests: "+earliest_month+"-"+this_month,
-       fontname="Arial",fontsize=28)
-#Find where the placeholders are for the keywords whose frequency we are graphing and update them
-replace_text_in_shape(slide_shapes,find="Topic1",use=kwd0,slidename="5th slide")
-replace_text_in_shape(slide_shapes,find="Topic2",use=kwd1,slidename="5th slide")
-replace_text_in_shape(slide_shapes,find="Topic3",use=kwd2,slidename="5th slide")
-
-#Add the line graphs and the donuts for each of the topics
-top=Mm(46); h=Mm(25); w=Mm(43)
-slide_shapes.add_picture(file_linegraph_topic1,Mm(19),top,height=h,width=w)
-slide_shapes.add_picture(file_linegraph_topic2,Mm(120),top,height=h,width=w)
-slide_shapes.add_picture(file_linegraph_topic3,Mm(223),top,height=h,width=w)
-top=Mm(43); h=Mm(28); w=Mm(57)
-slide_shapes.add_picture(file_donut_topic1,Mm(58),top,height=h,width=w)
-slide_shapes.add_picture(file_donut_topic2,Mm(160),top,height=h,width=w)
-slide_shapes.add_picture(file_donut_topic3,Mm(263),top,height=h,width=w)
-
-#Find where the placeholders are for the customer lists and update them
-col_list = [df_for_month.actions, df_for_month.wtlma]  # list of columns to search for kwds
-df_for_kwd0_month0 = df_for_month.loc[found_word_list(col_list,kwd0)]
-df_for_kwd1_month0 = df_for_month.loc[found_word_list(col_list,kwd1)]
-df_for_kwd2_month0 = df_for_month.loc[found_word_list(col_list,kwd2)]
-i = find_text_in_shapes(slide_shapes,"Customers1")
-if (i>=0):
-    logger.debug("Writing list of %i customers for first keyword" % (len(df_for_kwd0)))
-    write_customer_list(df_for_kwd0_month0,slide_shapes[i].text_frame)
-else:
-    logger.error("Could not find Customers1 placeholder")
-
-i = find_text_in_shapes(slide_shapes,"Customers2")
-if (i>=0):
-    logger.debug("Writing list of %i customers for second keyword" % (len(df_for_kwd1)))
-    write_customer_list(df_for_kwd1_month0,slide_shapes[i].text_frame)
-else:
-    logger.error("Could not find Customers2 placeholder")
-
-i = find_text_in_shapes(slide_shapes,"Customers3")
-if (i>=0):
-    logger.debug("Writing list of %i customers for third keyword" % (len(df_for_kwd2)))
-    write_customer_list(df_for_kwd2_month0,slide_shapes[i].text_frame)
-else:
-    logger.error("Could not find Customers3 placeholder")
-
-################################################
-## 9th slide: Now generate the Industry Insights donuts and top keyword lists
-################################################
-logger.info(">>>> 9th slide: industries and how they show up across the centres")
-
-## Sort through the dataframes, extracting relevant information, saving it in dictionaries for later use
-df_for_ind={}
-kwd_counts_for_ind={}
-ctr_counts_for_ind={}
-
-logger.debug("Generating dataframes for each industry for last 3 months")
-for ind in industry_list:
-    df_for_ind[ind] = df_for_3months[df_for_3months["Industry"]==ind]
-    ctr_counts_for_ind[ind]=counts_by_centre( df_for_ind[ind] )
-    kwd_counts_for_ind[ind] = kwds_in_wtlma_actions(df_for_ind[ind],vocab)
-    logger.debug("Top keyword/counts for %s: %r" % (ind,kwd_counts_for_ind[ind].most_common(4)) )
-
-## Now write out the charts and text on industry slide
-s = prs.slides[8]
-slide_shapes=s.shapes
-
-#Update the title
-title_frame = slide_shapes.title.text_frame
-title_frame.clear()
-new_run_in_slide(title_frame.paragraphs[0],text="Industry Insights "+earliest_month+"-"+this_month,
-       fontname="Arial",fontsize=28)
-
-#Add the one big donut showing volumes for each industry to the slide
-logger.debug("Adding main donut to Industry Insights slide (9th slide)")
-industry_counts = df_for_3months["Industry"].value_counts()
-donut_pie_for_industries(industry_counts,slide_shapes)
-
-#Add the individual industry donuts broken down by centre to the slide
-#Need to pick the top N, excluding "Other", from the list in industry_list
-logger.debug("Adding donuts for top industries in each centre (9th slide)")
-pie_left=(Mm(110),Mm(164),Mm(217),Mm(272), Mm(110),Mm(164),Mm(217),Mm(272))
-pie_top =(Mm(40), Mm(40), Mm(40), Mm(40),  Mm(115),Mm(115),Mm(115),Mm(115))
-pie_h=Mm(50); pie_w=Mm(35)
-icon_left=(Mm(143),Mm(198),Mm(252),Mm(306))    # Placement for icons in each of 4 columns
-icon_top=(Mm(48),Mm(65),Mm(82),Mm(122),Mm(138),Mm(156))   # Placement of icons in two sets of rows, three in each row
-for n,ind in enumerate(['Public Sector','Fin Svcs','RCG','Energy','Health & LS','Mfg','CME','Travel & Trans']):
-    #['Public Sector','Fin Svcs','RCG','Energy','Health & LS','Mfg','CME','Travel & Trans']
-    logger.debug("Writing %s as industry %i" %(ind,n))
-    #Write the industry name as the main title for this box
-    replace_text_in_shape(slide_shapes,"Industry-{}".format(n),ind,"9th slide")
-    #Add the donut showing breakdown of centres that hosted this industry
-    donut_pie_for_centres(ctr_counts_for_ind[ind],['PA','H','NY','L','SNG'],slide_shapes,pie_left[n],pie_top[n],pie_w,pie_h)
-    #Now write the list of top interests for this industry
-    for interest_idx, p in enumerate(kwd_counts_for_ind[ind].most_common(3)):
-        interest=p[0]
-        logger.debug("Replacing {}-interest-{} with {} and its icon".format(n,interest_idx,interest))
-        replace_text_in_shape(slide_shapes,"{}-interest-{}".format(n,interest_idx),interest,"9th slide")
-        add_icon(slide_shapes,interest,left=icon_left[n%4],top=icon_top[3*(n//4)+interest_idx],small=True)
-
-################################################
-## 10th slide: Partner insights
-################################################
-logger.info(">>>> 10th slide: top partner keywords and partner attendance broken out by centre")
-# rather copmlex expression to find which rows are partners who are attending as partners, or partner-led briefings for customers
-df_for_partners = df_for_3months.loc[ ( df_for_3months['Account Type'].isin(["Channel/ Reseller","Systems Integrator"])
-                                        & (df_for_3months['Partner / Customer']!="Customer")
-                                      ) | (df_for_3months['Partner / Customer']=="Partner")
-                                    ]
-kwd_count_for_partners = kwds_in_wtlma_actions(df_for_partners,vocab)
-useful_rows_in_partners = count_rows_with_comments(df_for_partners)
-
-df_channel = df_for_partners[ df_for_partners['Account Type']=="Channel/ Reseller" ]
-df_SI = df_for_partners[ df_for_partners['Account Type']=="Systems Integrator" ]
-df_accompanied = df_for_partners[ df_for_partners['Partner / Customer']=="Partner" ]
-
-
-SI_count=[len(df_SI[df_SI.Ctr==c]) for c in centres]
-Channel_count=[len(df_channel[df_channel.Ctr==c]) for c in centres]
-Attended_count=[len(df_accompanied[df_accompanied.Ctr==c]) for c in centres]
-logger.debug("Centres being looked at: %r" %(centres))
-logger.debug("Volume by centre - partner: %r" %(Channel_count))
-logger.debug("Volume by centre - SI: %r" %(SI_count))
-logger.debug("Volume by centre - attended: %r" %(Attended_count))
-
-# @edit requested by Tina 26th Feb: combine SI with Channel/Reseller
-channel_plus_SI=[x+y for x,y in zip(Channel_count, SI_count)]
-
-## Start to update the slide
-s = prs.slides[9]
-slide_shapes=s.shapes
-
-#Update the title
-title_frame = slide_shapes.title.text_frame
-title_frame.clear()
-new_run_in_slide(title_frame.paragraphs[0],text="Partner Insights ("+earliest_month+"-"+this_month+")",
-       fontname="Arial",fontsize=28)
-
-# Update the top 3 most common keywords, and their percentages
-logger.debug("top 3 partner interests: %r" % (kwd_count_for_partners.most_common(4)))
-t=Mm(66)
-l=[Mm(32),Mm(69),Mm(106)]
-for n,p in enumerate(kwd_count_for_partners.most_common(3)):
-    # p is (keyword: count) for each of the top most common keywords
-    replace_text_in_shape(slide_shapes,"Interest-{}".format(n),p[0],"10th slide")
-    add_icon(slide_shapes,p[0],top=t,left=l[n],small=True)
-    replace_text_in_shape(slide_shapes,"Score-{}".format(n),"{0:.0f}%".format(100*p[1]/useful_rows_in_partners),"10th slide")
-
-# @add: show pie charts and partner wordcloud - 19sep18
-# @del: remove pie charts! - 21sep18
-partner_file = "Visits with Partners.xlsx"
-logger.info("Importing excel file for partners: "+partner_file+", with header in row "+str(header_row))
-# Read the dataframe of all the names, partner names, dates, etc, of the individual people from partners who attended a centre
-partner_df = pd.read_excel(open(partner_file,'rb'),header=0,usecols="A:H")   
-# Subset the dataframe to the 3 month window we are intested in
-logger.debug("Selecting rows from Partner file from %i-%i to %i-%i" % (year_for_mm_minus_2,mm_minus_2,yyyy,mm))
-start_date = pd.Timestamp(year_for_mm_minus_2,mm_minus_2,1)
-if (mm==12): # if current month is december, end date is 1st Jan nest year
-    end_date = pd.Timestamp(yyyy+1,1,1)
-else: 
-    end_date = pd.Timestamp(yyyy,mm+1,1)
-partner_3m_df = partner_df.loc[ (partner_df['Visit: Arrival Date']>= start_date) & (partner_df['Visit: Arrival Date'] < end_date) ]
-## Now generate wordcloud, based on the dataframe we just created
-grp_by_partner = partner_3m_df.groupby(['Attendee Company Name']) # group has one row per attendee, grouped by partner name
-ptr_counts = grp_by_partner.size() # counts number of each partner - need to turn this into a python Counter() object
-ptr_counter=Counter()
-for i,v in ptr_counts.iteritems():
-    ptr_counter[i]=v
-ptr_counter['HPE']=0   # Zap out the entry (if any) for HPE as a parter - due to "garbage in" from briefing mgrs
-file_wc_ptr=file_wordcloud_for_partners(ptr_counter)
-# Add it to the slide template
-slide_shapes.add_picture(file_wc_ptr, Mm(142),Mm(50), height=Mm(40),width=Mm(178))
-
-################################################
-## 11th slide: Top interests and industries for last 6 months
-################################################
-logger.info(">>>> 11th slide: top 5 interests, top 3 industries, and their top interests, by centre, for last 6 months")
-df_6months = dataframe_for_6months(all_df, year=yyyy, month=mm)
-
-# Calculate the sentiment by month for the last 6 months
-sentiment_6months = sentiment_by_month(df_6months, count=6, year=yyyy, month=mm)
-if sentimentCalcs:
-    # Get top scoring comments for this month
-    top_comments_in_month = top_sentiment_in_month(df_for_month,count=4)   
-    for c in top_comments_in_month:
-        print(top_comments_in_month[c],":",c)
-    
-#build a dictionary of dataframes subsetted by centre, a dictionary of keywords by centre,
-#and a dict of top 3 industries per centre and their keywords (where the key is a tuple of (centre, industry) )
-dfs_6m_ctr={}
-kwd_counts_6m_ctr={}
-industry_counts_6m = df_6months["Industry"].value_counts()
-kwd_counts_6m_for_top_inds={}
-commented_rows_for_6m={}
-
-for c in centres:
-    logger.info("Working on counts for {}".format(c))
-    dfs_6m_ctr[c]=df_6months[df_6months.Ctr==c]
-    #First, the top keywords for that Centre
-    kwd_counts_6m_ctr[c]=kwds_in_wtlma_actions(dfs_6m_ctr[c],vocab)
-    logger.debug("Top keyword/counts %s: %r" % (c,kwd_counts_6m_ctr[c].most_common(5)) )
-    #Now the top keywords in each industry for that centre
-    industry_counts_6m[c] = (dfs_6m_ctr[c])["Industry"].value_counts()
-    for ind in (industry_counts_6m[c]).index:
-        this_df = dfs_6m_ctr[c][ dfs_6m_ctr[c]["Industry"]==ind ]
-        kwd_counts_6m_for_top_inds[(c,ind)]=kwds_in_wtlma_actions(this_df, vocab)
-        commented_rows_for_6m[(c,ind)]=count_rows_with_comments(this_df)
-        logger.debug("Top keyword/counts in %s for %s: %r" % (c,ind,kwd_counts_6m_for_top_inds[(c,ind)].most_common(3)) )
-
-
-## Build the slide: add the interests, industries, and per-industry interests, for each of the centres
-logger.debug("Setting the title ")
-s = prs.slides[10]
-slide_shapes=s.shapes
-#Update the title
-title_frame = slide_shapes.title.text_frame
-title_frame.clear()
-new_run_in_slide(title_frame.paragraphs[0],text="Breakdown by centre ("+calendar.month_name[mm_6_before]+"-"+this_month+")",
-       fontname="Arial",fontsize=28)
-
-#Update, by centre, the top interests, and the top industries with their top interests
-logger.info("For each centre, getting top 5 interests, and top 3 industries and their interests.")
-top_pos=[Mm(48),Mm(73),Mm(102),Mm(127),Mm(152)]   #distances to top of icon for each row
-left_pos=[Mm(35),Mm(65),Mm(95),Mm(125),Mm(154)]   #distances to centre of icon for each row
-for row,ctr in enumerate(["PA","H","NY1","LON1","SNG"]):  #iterate the centres in the order they appear on the slide
-    #First, the top interests for this centre
-    for col,p in enumerate(kwd_counts_6m_ctr[ctr].most_common(5)):
-        # p is (keyword: count) for each of the keywords, so p[0] is the keyword itself
-        replace_text_in_shape(slide_shapes,"{}-interest-{}".format(ctr,col),p[0],"11th slide")
-        add_icon(slide_shapes,p[0],left=left_pos[col],top=top_pos[row],small=True)
-    #Next, the top industries with their interests for this centre - industry_counts_6m[c] is already ordered highest->lowest count
-    n=0  #count how many displayed - need to do this separately from the loop count, as we ignore "Other" as an industry group
-    for ind in industry_counts_6m[ctr].index:
-        if   (ind!="Other"):
-            logger.debug("For centre <%s> industry <%i> is <%s>" %(ctr,n,ind))
-            #Write the list of top interests for this industry
-            idx = find_text_in_shapes(slide_shapes,"{}-industry-{}".format(ctr,n))
-            if (idx>=0):
-                write_top_keywords(slide_shapes[idx].text_frame,
-                                   ind,
-                                   kwd_counts_6m_for_top_inds[(ctr,ind)],
-                                   commented_rows_for_6m[(ctr,ind)],
-                                   percent=False,
-                                   cutoff=20
-                                  )
+    return dict(top_n(month_df["Customer Overall Comments"], month_df["sentiment"], count, largest=not lowest))
+
+def main():
+    # The settings, the keywords and colours from the ini file, and what the deck is built with are module globals,
+    # as the functions above use them
+    global excel_file, yyyy, mm, header_row, stop_after_wordcheck, oldMode_1, sentimentCalcs, sentiment_slide, \
+        use_cache, cache_dir, streaming, jobs, sentiment_scorer, render_threads, render_dpi, wordcloud_dpi, \
+        dump_images, native_charts, store_media, optimize
+    global colour_list, dict_colour_of_keywords, icons, synonym_normalizer, JapanAndChinaToOther, centres, centres_long
+    global kwd_incidence, renderer, render_cache, placeholder_indexes
+    global RGBColor, MSO_THEME_COLOR, Pt, Mm, render_jobs, SimpleGroupedColorFunc, hpe_color_fn, PlaceholderIndex, \
+        move_slide, score_columns, top_n      # imported once the word check is done
+
+    logging.debug("Parsing arguments")
+    try:
+        opts, args = getopt.getopt(sys.argv[1:],"?hdwsvi:y:m:r:",["ifile=","year=","month=","nocache","cachedir=","stream","jobs=","scorer=","sentimentslide","threads","dpi=","clouddpi=","dumpimages","nativecharts","storemedia","optimize","startup-profile"])
+    except getopt.GetoptError as err:
+        print(err)
+        print_help()
+        sys.exit(2)
+    logger.debug("opt: "+str(opts)+" and args: "+str(args))  
+    for opt, arg in opts:
+        if opt in ("-?","-h"):
+            print_help()
+            sys.exit()
+        elif opt == "-d":
+            logger.setLevel(logging.DEBUG)
+        elif opt == "-q": # lowest level of messages printed
+            logger.setLevel(logging.WARNING)
+        elif opt in ("--ifile"):
+            excel_file = arg
+        elif opt in ("-y","--year"):
+            logging.debug("Found argument yyyy with {}".format(arg))
+            yyyy = int(arg)
+        elif opt in ("-m", "--month"):
+            logging.debug("Found argument mm with {}".format(arg))
+            mm = int(arg)
+        elif opt in ("-r"):
+            logging.debug("Found argument header_row with {}".format(arg))
+            header_row = int(arg)
+        elif opt == "-w":
+            stop_after_wordcheck = True
+        elif opt == "-s":
+            sentimentCalcs = True
+        elif opt == "--sentimentslide":
+            sentiment_slide = True
+        elif opt == "--nocache":
+            use_cache = False
+        elif opt == "--cachedir":
+            cache_dir = arg
+        elif opt == "--stream":
+            streaming = True
+        elif opt == "--jobs":
+            jobs = int(arg)
+        elif opt == "--scorer":
+            if arg not in ("vader","vector"):
+                print("Unknown sentiment scorer {} - use vader or vector".format(arg))
+                print_help()
+                sys.exit(2)
+            sentiment_scorer = arg
+        elif opt == "--threads":
+            render_threads = True
+        elif opt == "--dpi":
+            render_dpi = int(arg)
+        elif opt == "--clouddpi":
+            wordcloud_dpi = int(arg)
+        elif opt == "--dumpimages":
+            dump_images = True
+        elif opt == "--nativecharts":
+            native_charts = True
+        elif opt == "--storemedia":
+            store_media = True
+        elif opt == "--optimize":
+            optimize = True
+        elif opt == "--startup-profile":
+            pass      # startup was made from sys.argv before the imports, so that it could time them
+        elif opt == "-o":
+            logging.info("Working in old mode {}".format(arg))
+            if int(arg)==1:
+                oldMode_1 = True
+            #endif
+        #endif
+
+    logging.getLogger("insights").setLevel(logger.level)   # messages from the shared insights_* modules
+    logger.info('Starting run for %i-%i...' % (yyyy,mm))
+
+    # Read in the ini file
+    import configparser
+    import json
+    ini_file = 'excel_to_ppt.ini'
+    cfg = configparser.ConfigParser()
+    cfg.optionxform = str    # read strings as-is from INI file (default is to lowercase keys)
+    cfg.read(ini_file)
+
+    colour_list=[]   # list of the colour code values
+    if 'colours' in cfg:
+        colour_codes = dict(cfg.items('colours'))
+        for i in cfg.items('colours'):
+            colour_list.append(i[1])       # put this hex value in list of available colours
+    else:
+        logger.error('No [colours] section in {}'.format(ini_file))
+
+    if 'keywords' in cfg:
+        c_to_k=cfg.items('keywords')
+        dict_colour_of_keywords={}
+        for i in cfg.items('keywords'):
+            if i[0] in colour_codes:
+                dict_colour_of_keywords[colour_codes[i[0]]]=json.loads(i[1])
             else:
-                logger.error("Could not find <{}-industry-{}> placeholder on 11th slide - idx={}".format(ctr,n,idx))
-            n+=1   #increment the number of industries written out for this centre
-        if (n>=3): break   #exit the loop after writing in 3 industries+interests
-
-## @24apr18: add text into notes for this slide to show actual counts for top words per centre
-notes_for_slide = s.notes_slide
-notes_tf = notes_for_slide.notes_text_frame
-notes_tf.text = "Counts by centre for last 6 months:\n"
-for row,ctr in enumerate(["PA","H","NY1","LON1","SNG"]):  #iterate the centres in the order they appear on the slide
-    notes_tf.text += "For %s, top eight items were: %r\n" % (ctr, kwd_counts_6m_ctr[ctr].most_common(8))
-
-################################################
-## 13th slide: EBC specific volumes & interests for last 6 months
-################################################
-if False:
-    logger.info(">>>> 13th slide: EBC specific industry volumes and top interests")
-    ## Generate the image for the big donut showing volume for all industries across the months
-    PA_industry_counts = dfs_6m_ctr["PA"]["Industry"].value_counts()
-    file_donut_PA_ind_vols = file_donut_pie_for_industries(PA_industry_counts,center="PA")
-
-    ## Build the slide
-    logger.debug("Setting the title ")
-    s = prs.slides[12]
+                logger.error('In {}, section [keywords], found colour {} which was not listed in [colours] section'.format(ini_file,i[0]))
+    else:
+        logger.error('No [keywords] section in {}'.format(ini_file))
+
+    #Build a list of all the keywords.  Use all the things we have a colour for as the list items.
+    vocab=[]
+    for i in dict_colour_of_keywords.values():
+        for j in i:
+            vocab.append(j)
+    kwd_matcher = KeywordMatcher(vocab)   # finds every keyword in a cell in one pass
+    icons = IconRegistry(icondir)         # every icon read once, by keyword
+    icons.report_missing(vocab)
+
+    # load the list of synonyms (or mis-spellings) of the keywords
+    synonym_list={}
+    for i in cfg.items('synonyms'):
+        lst=json.loads(i[1])
+        for j in lst:
+            synonym_list[j]=i[0]
+    synonym_normalizer = SynonymNormalizer(synonym_list)   # compiled once, replaces whole words only
+
+    JapanAndChinaToOther=True
+    industry_list=[]   # list of the industry code values
+    if 'industries' in cfg:
+        industry_longnames = dict(cfg.items('industries'))
+        for i in cfg.items('industries'):
+            industry_list.append(i[0])
+        if (cfg.has_option('industries','JapanAndChinaToOther')):
+            try:
+                JapanAndChinaToOther = cfg.getboolean('industries','JapanAndChinaToOther')
+            except:
+                logger.error('In [industries] section item JapanAndChinaToOther is not boolean')
+    else:
+        logger.error('No [industries] section in {}'.format(ini_file))
+
+    centres = ["H","NY1","SNG","LON1","PA"]   # short names used in the Excel file
+    centres_long = ["Houston", "New York", "Singapore", "London", "Palo Alto"]  # same order as short names
+
+    stop_words=[]
+    if 'stopwords' in cfg:
+        stop_words+=json.loads(cfg.get('stopwords','stop_words'))
+    else:
+        logger.error('No [stopwords] section in {}'.format(ini_file))
+    stop_words+=vocab
+    startup.stage("ini file")
+
+    all_df = read_insights(excel_file, header_row=header_row, usecols="A:S",
+                           text_columns=[("wtlma","Want to Learn More About"),
+                                         ("actions","Action Items"),
+                                         ("objectives","Objectives")],
+                           normalizer=synonym_normalizer, use_cache=use_cache, streaming=streaming)
+
+    logger.debug("Indexing the months")
+    date_index = DateIndex(all_df)
+    startup.stage("read the workbook")
+
+    print_new_candidate_words(all_df,stop_words,top_n=40)
+    startup.stage("word check")
+    startup.report()
+    if stop_after_wordcheck:
+        return
+
+    # Only building the deck needs these, so -w starts without them
+    from pptx.dml.color import RGBColor
+    from pptx.enum.dml import MSO_THEME_COLOR
+    from pptx.util import Pt, Mm
+    import render_jobs
+    from render_jobs import SimpleGroupedColorFunc, GroupedColorFunc, hpe_color_fn, RenderScheduler, RenderCache
+    from placeholder_index import PlaceholderIndex
+    from deck_template import open_template, move_slide, save_deck
+    from media_optimizer import optimize_media
+    from sentiment_scores import SentimentScores, score_columns, top_n
+    from vector_sentiment import VectorSentimentAnalyzer
+    from sentiment_cube import SentimentCube
+
+    logger.debug("Building keyword incidence matrix")
+    kwd_incidence = KeywordIncidence(all_df, ["wtlma","actions","objectives"], kwd_matcher)
+
+
+    ## Given the month and year, calc the number of the previous few months
+    if (mm==1): mm_minus_1,year_for_mm_minus_1 = 12, yyyy-1
+    else: mm_minus_1, year_for_mm_minus_1 = mm-1, yyyy
+    if (mm<=2): mm_minus_2,year_for_mm_minus_2 = mm+10, yyyy-1
+    else: mm_minus_2, year_for_mm_minus_2 = mm-2, yyyy
+    if (mm<6): mm_6_before,year_for_mm_6_before = mm+7, yyyy-1   #6 months before Jan is Aug
+    else: mm_6_before, year_for_mm_6_before = mm-5, yyyy    #6 months before Jul is Feb
+
+    ################################################
+    ## Count the keywords the images are built from, and submit all the images for rendering,
+    ## so that (with --jobs) they render in parallel while the slides are put together
+    ################################################
+    renderer = RenderScheduler(jobs, dump_dir=tmpdir if dump_images else None, threads=render_threads)
+    render_cache = RenderCache(os.path.join(cache_dir,render_cache_name), render_cache_bytes) if use_cache else None
+    # Sizes of the pictures the images are placed in on the slides, so each is rendered at just the size it is shown
+    wordcloud_box = (Mm(315),Mm(63))           # 3rd slide (wordclouds are 5 times as wide as they are high)
+    small_wordcloud_box = (Mm(190),Mm(38))     # 4th and 14th slides
+    linegraph_box = (Mm(43),Mm(25))            # 5th slide
+    donut_box = (Mm(57),Mm(28))                # 5th slide
+    partner_wordcloud_box = (Mm(178),Mm(40))   # 10th slide
+    logger.info("Counting keywords for the last 3 months, and starting to render the wordclouds and charts")
+    # Wordclouds of the keywords for this month and the previous two, for the 3rd & 4th slides
+    df_for_month = dataframe_for_month(date_index, year=yyyy, month=mm)
+    kwd_count_for_month = kwds_in_wtlma_actions(df_for_month,vocab)
+    useful_rows_in_m = count_rows_with_comments(df_for_month)
+    logger.info("Top keyword/counts for month %i : %r" % (mm,kwd_count_for_month.most_common(5)) )
+    file_wordcloud_m = file_wordcloud_for_month(kwd_count_for_month, useful_rows_in_m,
+                                                year=yyyy,month=mm,box=wordcloud_box)
+
+    df_for_month_minus_1 = dataframe_for_month(date_index, year=year_for_mm_minus_1, month=mm_minus_1)
+    kwd_count_for_m_minus_1 = kwds_in_wtlma_actions(df_for_month_minus_1,vocab)
+    logger.info("Top keyword/counts for month %i : %r" % (mm_minus_1,kwd_count_for_m_minus_1.most_common(5)) )
+
+    df_for_month_minus_2 = dataframe_for_month(date_index, year=year_for_mm_minus_2, month=mm_minus_2)
+    kwd_count_for_m_minus_2 = kwds_in_wtlma_actions(df_for_month_minus_2,vocab)
+    logger.info("Top keyword/counts for month %i : %r" % (mm_minus_2,kwd_count_for_m_minus_2.most_common(5)) )
+
+    useful_rows_in_m_2 = count_rows_with_comments(df_for_month_minus_2)
+    useful_rows_in_m_1 = count_rows_with_comments(df_for_month_minus_1)
+    logger.info("Number of useful rows in months -2,-1,0 are %i, %i, %i" % (useful_rows_in_m_2,useful_rows_in_m_1,useful_rows_in_m))
+
+    file_wordcloud_m_1 = file_wordcloud_for_month(kwd_count_for_m_minus_1, useful_rows_in_m_1, year=year_for_mm_minus_1,month=mm_minus_1,
+                                                  box=small_wordcloud_box)
+    file_wordcloud_m_2 = file_wordcloud_for_month(kwd_count_for_m_minus_2, useful_rows_in_m_2, year=year_for_mm_minus_2,month=mm_minus_2,
+                                                  box=small_wordcloud_box)
+
+    # Line graphs and donuts for the top 3 keywords this month, for the 5th slide
+    top_3 = kwd_count_for_month.most_common(3)   # top 3 keywords for most recent month in list with their counts
+    kwd0=top_3[0][0]
+    kwd1=top_3[1][0]
+    kwd2=top_3[2][0]
+    logger.debug("Top 3 keywords for current month are %s %s %s" % (kwd0,kwd1,kwd2))
+    months=[mm_minus_2,mm_minus_1,mm]
+
+    kwd0_c2 = kwd_count_for_m_minus_2[kwd0] if (kwd0 in kwd_count_for_m_minus_2) else 0
+    kwd0_c1 = kwd_count_for_m_minus_1[kwd0] if (kwd0 in kwd_count_for_m_minus_1) else 0
+    kwd0_c0 = kwd_count_for_month[kwd0]     # must have keyword as it came from this dictionary
+    vals_kwd0=[kwd0_c2/useful_rows_in_m_2, kwd0_c1/useful_rows_in_m_1, kwd0_c0/useful_rows_in_m]
+    if not native_charts: file_linegraph_topic1 = file_graph_for_month_kwd(kwd0,"1st",vals_kwd0,months,colour_list[0],linegraph_box)
+    logger.debug("Kwd0 is %s, data %r" % (kwd0,vals_kwd0))
+    kwd1_c2 = kwd_count_for_m_minus_2[kwd1] if (kwd1 in kwd_count_for_m_minus_2) else 0
+
+    kwd1_c1 = kwd_count_for_m_minus_1[kwd1] if (kwd1 in kwd_count_for_m_minus_1) else 0
+    kwd1_c0 = kwd_count_for_month[kwd1]     # must have keyword as it came from this dictionary
+    vals_kwd1=[kwd1_c2/useful_rows_in_m_2, kwd1_c1/useful_rows_in_m_1, kwd1_c0/useful_rows_in_m]
+    if not native_charts: file_linegraph_topic2 = file_graph_for_month_kwd(kwd1,"2nd",vals_kwd1,months,colour_list[1],linegraph_box)
+    logger.debug("Kwd1 is %s, data %r" % (kwd1,vals_kwd1))
+
+    kwd2_c2 = kwd_count_for_m_minus_2[kwd2] if (kwd2 in kwd_count_for_m_minus_2) else 0
+    kwd2_c1 = kwd_count_for_m_minus_1[kwd2] if (kwd2 in kwd_count_for_m_minus_1) else 0
+    kwd2_c0 = kwd_count_for_month[kwd2]     # must have keyword as it came from this dictionary
+    vals_kwd2=[kwd2_c2/useful_rows_in_m_2, kwd2_c1/useful_rows_in_m_1, kwd2_c0/useful_rows_in_m]
+    if not native_charts: file_linegraph_topic3 = file_graph_for_month_kwd(kwd2,"3rd",vals_kwd2,months,colour_list[2],linegraph_box)
+    logger.debug("Kwd0 is %s, data %r" % (kwd2,vals_kwd2))
+
+    ## Build a subset of the dataframe for last 3 months that uses each of the top 3 kwds in this month
+    df_for_3months = pd.concat([df_for_month,df_for_month_minus_1,df_for_month_minus_2])
+    col_list = [df_for_3months.actions, df_for_3months.wtlma]  # list of columns to search for kwds
+    df_for_kwd0 = df_for_3months.loc[found_word_list(col_list,kwd0)]
+    df_for_kwd1 = df_for_3months.loc[found_word_list(col_list,kwd1)]
+    df_for_kwd2 = df_for_3months.loc[found_word_list(col_list,kwd2)]
+
+    ## Create donut pies showing split of visits expressing interest in top 3 topics by centre over last 3 months
+    kwd0_counts = counts_by_centre(df_for_kwd0)
+    if not native_charts: file_donut_topic1 = file_donut_pie_for_month(counts_by_centre(df_for_kwd0),"1st",donut_box)
+    if not native_charts: file_donut_topic2 = file_donut_pie_for_month(counts_by_centre(df_for_kwd1),"2nd",donut_box)
+    if not native_charts: file_donut_topic3 = file_donut_pie_for_month(counts_by_centre(df_for_kwd2),"3rd",donut_box)
+
+    # Wordcloud of partner attendees, for the 10th slide
+    partner_file = "Visits with Partners.xlsx"
+    logger.info("Importing excel file for partners: "+partner_file+", with header in row "+str(header_row))
+    # Read the dataframe of all the names, partner names, dates, etc, of the individual people from partners who attended a centre
+    partner_df = pd.read_excel(open(partner_file,'rb'),header=0,usecols="A:H")   
+    # Subset the dataframe to the 3 month window we are intested in
+    logger.debug("Selecting rows from Partner file from %i-%i to %i-%i" % (year_for_mm_minus_2,mm_minus_2,yyyy,mm))
+    start_date = pd.Timestamp(year_for_mm_minus_2,mm_minus_2,1)
+    if (mm==12): # if current month is december, end date is 1st Jan nest year
+        end_date = pd.Timestamp(yyyy+1,1,1)
+    else: 
+        end_date = pd.Timestamp(yyyy,mm+1,1)
+    partner_3m_df = partner_df.loc[ (partner_df['Visit: Arrival Date']>= start_date) & (partner_df['Visit: Arrival Date'] < end_date) ]
+    ## Now generate wordcloud, based on the dataframe we just created
+    grp_by_partner = partner_3m_df.groupby(['Attendee Company Name']) # group has one row per attendee, grouped by partner name
+    ptr_counts = grp_by_partner.size() # counts number of each partner - need to turn this into a python Counter() object
+    ptr_counter=Counter()
+    for i,v in ptr_counts.iteritems():
+        ptr_counter[i]=v
+    ptr_counter['HPE']=0   # Zap out the entry (if any) for HPE as a parter - due to "garbage in" from briefing mgrs
+    file_wc_ptr=file_wordcloud_for_partners(ptr_counter,partner_wordcloud_box)
+
+    # Wordclouds of the keywords in the objectives, for the 14th slide
+    kwd_obj_count_for_month = kwds_in_objectives(df_for_month,vocab)
+    logger.debug("Top objectives keyword/counts for month %i : %r" % (mm,kwd_obj_count_for_month.most_common(5)) )
+    kwd_obj_count_for_m_minus_1 = kwds_in_objectives(df_for_month_minus_1,vocab)
+    logger.debug("Top objectives keyword/counts for month %i : %r" % (mm_minus_1,kwd_obj_count_for_m_minus_1.most_common(5)) )
+    kwd_obj_count_for_m_minus_2 = kwds_in_objectives(df_for_month_minus_2,vocab)
+    logger.debug("Top objectives keyword/counts for month %i : %r" % (mm_minus_2,kwd_obj_count_for_m_minus_2.most_common(5)) )
+    file_obj_wordcloud_m = file_wordcloud_for_month(kwd_obj_count_for_month, useful_rows_in_m,
+                                                    year=yyyy,month=mm,box=small_wordcloud_box,prefix="objectives")
+    file_obj_wordcloud_m_1 = file_wordcloud_for_month(kwd_obj_count_for_m_minus_1, useful_rows_in_m_1,
+                                                      year=year_for_mm_minus_1,month=mm_minus_1,box=small_wordcloud_box,prefix="objectives")
+    file_obj_wordcloud_m_2 = file_wordcloud_for_month(kwd_obj_count_for_m_minus_2, useful_rows_in_m_2,
+                                                      year=year_for_mm_minus_2,month=mm_minus_2,box=small_wordcloud_box,prefix="objectives")
+
+    ### Now start to generate the powerpoint
+    from pptx import Presentation
+    from pptx.util import Inches, Pt, Mm
+
+    # These appear to be the layouts used in the master for this slide deck
+    LAYOUT_TITLE_WITH_DARK_PICTURE = 0
+    LAYOUT_TITLE_SLIDE_WITH_NAME   = 1
+    LAYOUT_DIVIDER                 = 2
+    LAYOUT_TITLE_ONLY              = 3
+    LAYOUT_TITLE_AND_SUBTITLE      = 4
+    LAYOUT_BLANK                   = 5
+
+    ## Open up the source presentation
+    prs = open_template(template_file)
+    placeholder_indexes = []   # one PlaceholderIndex per slide with placeholders, see slide_placeholders()
+    this_month = calendar.month_name[mm]
+    earliest_month = calendar.month_name[mm_minus_2]
+    logger.info("Creating presentation for %s" % (this_month))
+
+    ################################################
+    ## Modify existing title slide with month
+    ################################################
+    logger.info("Modifying text in slide 0")
+    s = prs.slides[0]
+    slide_shapes = s.shapes
+    text_frame = slide_shapes[0].text_frame  # should be the the title textframe
+    #clear existing text, and write new text into title textframe
+    text_frame.clear()
+    # First para with a run of 60-point Arial font
+    new_run_in_slide(text_frame.paragraphs[0],text='Customer Insights',fontname='Arial',fontsize=60)
+    # Second para with a run of 32-point font
+    new_run_in_slide(text_frame.add_paragraph(),text='Learnings from '+this_month+' EBC/CEC visits',fontsize=32)
+
+    ################################################
+    ## 3rd slide: count the keywords for this month and build the wordcloud
+    ################################################
+    logger.info("3rd slide: large wordcloud for this month, and top 3 keywords")
+    ## Modifying main wordcloud slide by changing title and adding pic for this month's wordcloud
+    logger.debug("Modifying text and adding wordcloud in slide 2")
+    s = prs.slides[2]
     slide_shapes=s.shapes
+    placeholders = slide_placeholders(slide_shapes,"3rd slide")
+    title_frame = slide_shapes.title.text_frame
+    title_frame.clear()
+    new_run_in_slide(title_frame.paragraphs[0],text="In "+this_month+" customers wanted to learn more about...",
+           fontname="Arial",fontsize=28)
+    left=Mm(12.5); top=Mm(100)
+    slide_shapes.add_picture(renderer.image(file_wordcloud_m),left,top,height=wordcloud_box[1])
+
+    ##Find where the placeholders are for the top 3 keywords, update them, then add their icons
+    replace_text_in_shape(placeholders,find="topword_1",use=kwd0)
+    replace_text_in_shape(placeholders,find="topword_2",use=kwd1)
+    replace_text_in_shape(placeholders,find="topword_3",use=kwd2)
+    t=Mm(51)
+    add_icon(slide_shapes,kwd0,left=Mm(47),top=t)
+    add_icon(slide_shapes,kwd1,left=Mm(152),top=t)
+    add_icon(slide_shapes,kwd2,left=Mm(255),top=t)
+
+    ## @15mar18: add text into notes for this slide to show actual counts for top 10 words
+    notes_for_slide = s.notes_slide
+    notes_tf = notes_for_slide.notes_text_frame
+    notes_tf.text = ("Found %i rows with comments in this month.\nTop ten keyword/counts for %s: \n%r" % (useful_rows_in_m,this_month,kwd_count_for_month.most_common(10)) )
+
+    ################################################
+    ## 4th slide: count the keywords for previous two months, and build their wordclouds.
+    ################################################
+    logger.info(">>>> 4th slide: three wordclouds for most recent 3 months")
+    ## Modifying 3-month wordcloud slide by adding pic for last 3 months' wordcloud
+    logger.debug("Adding three wordclouds in 4th slide")
+    s = prs.slides[3]
+    slide_shapes=s.shapes
+    placeholders = slide_placeholders(slide_shapes,"4th slide")
+    left=Mm(93)
+    top=Mm(36)
+    w,h=small_wordcloud_box
+    slide_shapes.add_picture(renderer.image(file_wordcloud_m_2),
+                             left,top,width=w,height=h)
+    top=Mm(83)
+    slide_shapes.add_picture(renderer.image(file_wordcloud_m_1),
+                             left,top,width=w,height=h)
+    top=Mm(128)
+    slide_shapes.add_picture(renderer.image(file_wordcloud_m),
+                             left,top,width=w,height=h)
+    #Find where the placeholders are for the keywords whose frequency we are graphing and update them
+    replace_text_in_shape(placeholders,find="Month-2",use=calendar.month_name[mm_minus_2])
+    replace_text_in_shape(placeholders,find="Month-1",use=calendar.month_name[mm_minus_1])
+    replace_text_in_shape(placeholders,find="Month-0",use=calendar.month_name[mm])
+
+    ################################################
+    ## 5th slide: for top 3 keywords for this month graph their usage
+    ################################################
+    logger.info(">>>> 5th slide: top keywords for this month")
+    ## Add the line graphs and donut pies to the Top 3 Customer Interests chart
+    logger.debug("Adding line graphs, donuts and customers to the Top 3 Customer Interests slide (5th slide)")
+    s = prs.slides[4]
+    slide_shapes=s.shapes
+    placeholders = slide_placeholders(slide_shapes,"5th slide")
     #Update the title
     title_frame = slide_shapes.title.text_frame
     title_frame.clear()
-    new_run_in_slide(title_frame.paragraphs[0],text="EBC six month view ("+calendar.month_name[mm_6_before]+"-"+this_month+")",
-        fontname="Arial",fontsize=28)
+    new_run_in_slide(title_frame.paragraphs[0],text="Top 3 Customer Interests: "+earliest_month+"-"+this_month,
+           fontname="Arial",fontsize=28)
+    #Find where the placeholders are for the keywords whose frequency we are graphing and update them
+    replace_text_in_shape(placeholders,find="Topic1",use=kwd0)
+    replace_text_in_shape(placeholders,find="Topic2",use=kwd1)
+    replace_text_in_shape(placeholders,find="Topic3",use=kwd2)
+
+    #Add the line graphs and the donuts for each of the topics
+    top=Mm(46); w,h=linegraph_box
+    if native_charts:
+        line_chart_for_month_kwd(vals_kwd0,months,colour_list[0],slide_shapes,Mm(19),top,w,h)
+        line_chart_for_month_kwd(vals_kwd1,months,colour_list[1],slide_shapes,Mm(120),top,w,h)
+        line_chart_for_month_kwd(vals_kwd2,months,colour_list[2],slide_shapes,Mm(223),top,w,h)
+    else:
+        slide_shapes.add_picture(renderer.image(file_linegraph_topic1),Mm(19),top,height=h,width=w)
+        slide_shapes.add_picture(renderer.image(file_linegraph_topic2),Mm(120),top,height=h,width=w)
+        slide_shapes.add_picture(renderer.image(file_linegraph_topic3),Mm(223),top,height=h,width=w)
+    top=Mm(43); w,h=donut_box
+    if native_charts:
+        donut_chart_for_month(counts_by_centre(df_for_kwd0),slide_shapes,Mm(58),top,w,h)
+        donut_chart_for_month(counts_by_centre(df_for_kwd1),slide_shapes,Mm(160),top,w,h)
+        donut_chart_for_month(counts_by_centre(df_for_kwd2),slide_shapes,Mm(263),top,w,h)
+    else:
+        slide_shapes.add_picture(renderer.image(file_donut_topic1),Mm(58),top,height=h,width=w)
+        slide_shapes.add_picture(renderer.image(file_donut_topic2),Mm(160),top,height=h,width=w)
+        slide_shapes.add_picture(renderer.image(file_donut_topic3),Mm(263),top,height=h,width=w)
+
+    #Find where the placeholders are for the customer lists and update them
+    col_list = [df_for_month.actions, df_for_month.wtlma]  # list of columns to search for kwds
+    df_for_kwd0_month0 = df_for_month.loc[found_word_list(col_list,kwd0)]
+    df_for_kwd1_month0 = df_for_month.loc[found_word_list(col_list,kwd1)]
+    df_for_kwd2_month0 = df_for_month.loc[found_word_list(col_list,kwd2)]
+    i = placeholders.find("Customers1")
+    if (i>=0):
+        logger.debug("Writing list of %i customers for first keyword" % (len(df_for_kwd0)))
+        write_customer_list(df_for_kwd0_month0,slide_shapes[i].text_frame)
+    else:
+        logger.error("Could not find Customers1 placeholder")
+
+    i = placeholders.find("Customers2")
+    if (i>=0):
+        logger.debug("Writing list of %i customers for second keyword" % (len(df_for_kwd1)))
+        write_customer_list(df_for_kwd1_month0,slide_shapes[i].text_frame)
+    else:
+        logger.error("Could not find Customers2 placeholder")
+
+    i = placeholders.find("Customers3")
+    if (i>=0):
+        logger.debug("Writing list of %i customers for third keyword" % (len(df_for_kwd2)))
+        write_customer_list(df_for_kwd2_month0,slide_shapes[i].text_frame)
+    else:
+        logger.error("Could not find Customers3 placeholder")
+
+    ################################################
+    ## 9th slide: Now generate the Industry Insights donuts and top keyword lists
+    ################################################
+    logger.info(">>>> 9th slide: industries and how they show up across the centres")
+
+    ## Sort through the dataframes, extracting relevant information, saving it in dictionaries for later use
+    df_for_ind={}
+    kwd_counts_for_ind={}
+    ctr_counts_for_ind={}
+
+    logger.debug("Generating dataframes for each industry for last 3 months")
+    for ind in industry_list:
+        df_for_ind[ind] = df_for_3months[df_for_3months["Industry"]==ind]
+        ctr_counts_for_ind[ind]=counts_by_centre( df_for_ind[ind] )
+        kwd_counts_for_ind[ind] = kwds_in_wtlma_actions(df_for_ind[ind],vocab)
+        logger.debug("Top keyword/counts for %s: %r" % (ind,kwd_counts_for_ind[ind].most_common(4)) )
+
+    ## Now write out the charts and text on industry slide
+    s = prs.slides[8]
+    slide_shapes=s.shapes
+    placeholders = slide_placeholders(slide_shapes,"9th slide")
+
+    #Update the title
+    title_frame = slide_shapes.title.text_frame
+    title_frame.clear()
+    new_run_in_slide(title_frame.paragraphs[0],text="Industry Insights "+earliest_month+"-"+this_month,
+           fontname="Arial",fontsize=28)
 
     #Add the one big donut showing volumes for each industry to the slide
-    logger.debug("Adding main donut to EBC six month view slide (13th slide)")
-    left=Mm(43); top=Mm(48)
-    slide_shapes.add_picture(file_donut_PA_ind_vols,left,top,height=Mm(115),width=Mm(94))
+    logger.debug("Adding main donut to Industry Insights slide (9th slide)")
+    industry_counts = df_for_3months["Industry"].value_counts()
+    donut_pie_for_industries(industry_counts,slide_shapes)
+
+    #Add the individual industry donuts broken down by centre to the slide
+    #Need to pick the top N, excluding "Other", from the list in industry_list
+    logger.debug("Adding donuts for top industries in each centre (9th slide)")
+    pie_left=(Mm(110),Mm(164),Mm(217),Mm(272), Mm(110),Mm(164),Mm(217),Mm(272))
+    pie_top =(Mm(40), Mm(40), Mm(40), Mm(40),  Mm(115),Mm(115),Mm(115),Mm(115))
+    pie_h=Mm(50); pie_w=Mm(35)
+    icon_left=(Mm(143),Mm(198),Mm(252),Mm(306))    # Placement for icons in each of 4 columns
+    icon_top=(Mm(48),Mm(65),Mm(82),Mm(122),Mm(138),Mm(156))   # Placement of icons in two sets of rows, three in each row
+    for n,ind in enumerate(['Public Sector','Fin Svcs','RCG','Energy','Health & LS','Mfg','CME','Travel & Trans']):
+        #['Public Sector','Fin Svcs','RCG','Energy','Health & LS','Mfg','CME','Travel & Trans']
+        logger.debug("Writing %s as industry %i" %(ind,n))
+        #Write the industry name as the main title for this box
+        replace_text_in_shape(placeholders,"Industry-{}".format(n),ind)
+        #Add the donut showing breakdown of centres that hosted this industry
+        donut_pie_for_centres(ctr_counts_for_ind[ind],['PA','H','NY','L','SNG'],slide_shapes,pie_left[n],pie_top[n],pie_w,pie_h)
+        #Now write the list of top interests for this industry
+        for interest_idx, p in enumerate(kwd_counts_for_ind[ind].most_common(3)):
+            interest=p[0]
+            logger.debug("Replacing {}-interest-{} with {} and its icon".format(n,interest_idx,interest))
+            replace_text_in_shape(placeholders,"{}-interest-{}".format(n,interest_idx),interest)
+            add_icon(slide_shapes,interest,left=icon_left[n%4],top=icon_top[3*(n//4)+interest_idx],small=True)
+
+    ################################################
+    ## 10th slide: Partner insights
+    ################################################
+    logger.info(">>>> 10th slide: top partner keywords and partner attendance broken out by centre")
+    # rather copmlex expression to find which rows are partners who are attending as partners, or partner-led briefings for customers
+    df_for_partners = df_for_3months.loc[ ( df_for_3months['Account Type'].isin(["Channel/ Reseller","Systems Integrator"])
+                                            & (df_for_3months['Partner / Customer']!="Customer")
+                                          ) | (df_for_3months['Partner / Customer']=="Partner")
+                                        ]
+    kwd_count_for_partners = kwds_in_wtlma_actions(df_for_partners,vocab)
+    useful_rows_in_partners = count_rows_with_comments(df_for_partners)
+
+    df_channel = df_for_partners[ df_for_partners['Account Type']=="Channel/ Reseller" ]
+    df_SI = df_for_partners[ df_for_partners['Account Type']=="Systems Integrator" ]
+    df_accompanied = df_for_partners[ df_for_partners['Partner / Customer']=="Partner" ]
+
+
+    SI_count=[len(df_SI[df_SI.Ctr==c]) for c in centres]
+    Channel_count=[len(df_channel[df_channel.Ctr==c]) for c in centres]
+    Attended_count=[len(df_accompanied[df_accompanied.Ctr==c]) for c in centres]
+    logger.debug("Centres being looked at: %r" %(centres))
+    logger.debug("Volume by centre - partner: %r" %(Channel_count))
+    logger.debug("Volume by centre - SI: %r" %(SI_count))
+    logger.debug("Volume by centre - attended: %r" %(Attended_count))
+
+    # @edit requested by Tina 26th Feb: combine SI with Channel/Reseller
+    channel_plus_SI=[x+y for x,y in zip(Channel_count, SI_count)]
+
+    ## Start to update the slide
+    s = prs.slides[9]
+    slide_shapes=s.shapes
+    placeholders = slide_placeholders(slide_shapes,"10th slide")
+
+    #Update the title
+    title_frame = slide_shapes.title.text_frame
+    title_frame.clear()
+    new_run_in_slide(title_frame.paragraphs[0],text="Partner Insights ("+earliest_month+"-"+this_month+")",
+           fontname="Arial",fontsize=28)
+
+    # Update the top 3 most common keywords, and their percentages
+    logger.debug("top 3 partner interests: %r" % (kwd_count_for_partners.most_common(4)))
+    t=Mm(66)
+    l=[Mm(32),Mm(69),Mm(106)]
+    for n,p in enumerate(kwd_count_for_partners.most_common(3)):
+        # p is (keyword: count) for each of the top most common keywords
+        replace_text_in_shape(placeholders,"Interest-{}".format(n),p[0])
+        add_icon(slide_shapes,p[0],top=t,left=l[n],small=True)
+        replace_text_in_shape(placeholders,"Score-{}".format(n),"{0:.0f}%".format(100*p[1]/useful_rows_in_partners))
+
+    # @add: show pie charts and partner wordcloud - 19sep18
+    # @del: remove pie charts! - 21sep18
+    # Add it to the slide template
+    slide_shapes.add_picture(renderer.image(file_wc_ptr), Mm(142),Mm(50), height=partner_wordcloud_box[1],width=partner_wordcloud_box[0])
+
+    ################################################
+    ## 11th slide: Top interests and industries for last 6 months
+    ################################################
+    logger.info(">>>> 11th slide: top 5 interests, top 3 industries, and their top interests, by centre, for last 6 months")
+    df_6months = dataframe_for_6months(date_index, year=yyyy, month=mm)
+
+    # Score the comments of the last 6 months once, for all the sentiment figures, then calculate the sentiment by month
+    sentiment = SentimentScores(os.path.join(cache_dir,sentiment_store_name) if use_cache else None,
+                                analyzer=VectorSentimentAnalyzer() if sentiment_scorer == "vector" else None)
+    df_6months = df_6months.join(sentiment.score_frame(df_6months["Customer Overall Comments"], jobs=jobs))
+    sentiment.report()
+    sentiment.close()
+    sentiment_6months = sentiment_by_month(df_6months, count=6, year=yyyy, month=mm)
+    # and the average sentiment by month, centre, industry and keyword, from the scores and keyword hits of every row at once
+    sentiment_cube = SentimentCube(df_6months, kwd_incidence.rows_by_keyword(df_6months, ["wtlma","actions"]),
+                                   kwd_incidence.keywords, [add_months(yyyy, mm, n) for n in range(-5,1)], centres)
+    if sentimentCalcs:
+        # Get top and bottom scoring comments for this month
+        scored_df_for_month = dataframe_for_month(df_6months, year=yyyy, month=mm)
+        top_comments_in_month = top_sentiment_in_month(scored_df_for_month,count=4)   
+        for c in top_comments_in_month:
+            print(top_comments_in_month[c],":",c)
+        bottom_comments_in_month = top_sentiment_in_month(scored_df_for_month,count=4,lowest=True)
+        for c in bottom_comments_in_month:
+            print(bottom_comments_in_month[c],":",c)
+
+    #build a dictionary of dataframes subsetted by centre, a dictionary of keywords by centre,
+    #and a dict of top 3 industries per centre and their keywords (where the key is a tuple of (centre, industry) )
+    dfs_6m_ctr={}
+    kwd_counts_6m_ctr={}
+    industry_counts_6m = df_6months["Industry"].value_counts()
+    kwd_counts_6m_for_top_inds={}
+    commented_rows_for_6m={}
+
+    for c in centres:
+        logger.info("Working on counts for {}".format(c))
+        dfs_6m_ctr[c]=df_6months[df_6months.Ctr==c]
+        #First, the top keywords for that Centre
+        kwd_counts_6m_ctr[c]=kwds_in_wtlma_actions(dfs_6m_ctr[c],vocab)
+        logger.debug("Top keyword/counts %s: %r" % (c,kwd_counts_6m_ctr[c].most_common(5)) )
+        #Now the top keywords in each industry for that centre
+        industry_counts_6m[c] = (dfs_6m_ctr[c])["Industry"].value_counts()
+        for ind in (industry_counts_6m[c]).index:
+            this_df = dfs_6m_ctr[c][ dfs_6m_ctr[c]["Industry"]==ind ]
+            kwd_counts_6m_for_top_inds[(c,ind)]=kwds_in_wtlma_actions(this_df, vocab)
+            commented_rows_for_6m[(c,ind)]=count_rows_with_comments(this_df)
+            logger.debug("Top keyword/counts in %s for %s: %r" % (c,ind,kwd_counts_6m_for_top_inds[(c,ind)].most_common(3)) )
+
+
+    ## Build the slide: add the interests, industries, and per-industry interests, for each of the centres
+    logger.debug("Setting the title ")
+    s = prs.slides[10]
+    slide_shapes=s.shapes
+    placeholders = slide_placeholders(slide_shapes,"11th slide")
+    #Update the title
+    title_frame = slide_shapes.title.text_frame
+    title_frame.clear()
+    new_run_in_slide(title_frame.paragraphs[0],text="Breakdown by centre ("+calendar.month_name[mm_6_before]+"-"+this_month+")",
+           fontname="Arial",fontsize=28)
 
     #Update, by centre, the top interests, and the top industries with their top interests
-    logger.debug("Setting the per-centre top 5 interests, together with per-centre top 3 industries and their interests")
-    left_pos=[Mm(180),Mm(210),Mm(240),Mm(270),Mm(299)]   #distances to centre of icon for each row
-    #First, the top interests for PA
-    for col,p in enumerate(kwd_counts_6m_ctr["PA"].most_common(5)):
-        # p is (keyword: count) for each of the keywords, so p[0] is the keyword itself
-        replace_text_in_shape(slide_shapes,"PA-interest-{}".format(col),p[0],"13th slide")
-        add_icon(slide_shapes,p[0],left=left_pos[col],top=Mm(59),small=True)
-    #Next, the top industries with their interests for this centre - industry_counts_6m[c] is already ordered highest->lowest count
-    n=0  #count how many displayed - need to do this separately from the loop count, as we ignore "Other" as an industry group
-    for ind in industry_counts_6m["PA"].index:
-        if (ind!="Other"):
-            logger.debug("For Palo Alto, industry <%i> is <%s>" %(n,ind))
-            #Write the list of top interests for this industry
-            idx = find_text_in_shapes(slide_shapes,"PA-industry-{}".format(n))
-            if (idx>=0):
-                write_top_keywords(slide_shapes[idx].text_frame,
-                                ind,
-                                kwd_counts_6m_for_top_inds[("PA",ind)],
-                                commented_rows_for_6m[("PA",ind)]
-                                )
-            else:
-                logger.error("Could not find <PA-industry-{}> placeholder on 13th slide - idx={}".format(n,idx))
-            n+=1   #increment the number of industries written out for this centre
-        if (n>=3): break   #exit the loop after writing in 3 industries+interests
-
-################################################
-## 14th slide: 3 months of wordclouds based on keywords in objectives
-################################################
-logger.info(">>>> 14th slide: wordcloud for 3 months, based on Objectives")
-df_for_month = dataframe_for_month(all_df, year=yyyy, month=mm)
-kwd_count_for_month = kwds_in_objectives(df_for_month,vocab)
-useful_rows_in_m = count_rows_with_comments(df_for_month)
-logger.debug("Top keyword/counts for month %i : %r" % (mm,kwd_count_for_month.most_common(5)) )
-file_wordcloud_for_month(kwd_count_for_month, useful_rows_in_m,
-                         year=yyyy,month=mm)
-
-df_for_month_minus_1 = dataframe_for_month(all_df, year=year_for_mm_minus_1, month=mm_minus_1)
-kwd_count_for_m_minus_1 = kwds_in_objectives(df_for_month_minus_1,vocab)
-logger.debug("Top keyword/counts for month %i : %r" % (mm_minus_1,kwd_count_for_m_minus_1.most_common(5)) )
-
-df_for_month_minus_2 = dataframe_for_month(all_df, year=year_for_mm_minus_2, month=mm_minus_2)
-kwd_count_for_m_minus_2 = kwds_in_objectives(df_for_month_minus_2,vocab)
-logger.debug("Top keyword/counts for month %i : %r" % (mm_minus_2,kwd_count_for_m_minus_2.most_common(5)) )
-
-useful_rows_in_m_2 = count_rows_with_comments(df_for_month_minus_2)
-useful_rows_in_m_1 = count_rows_with_comments(df_for_month_minus_1)
-logger.debug("Number of useful rows in months -2,-1,0 are %i, %i, %i" % (useful_rows_in_m_2,useful_rows_in_m_1,useful_rows_in_m))
-
-file_wordcloud_for_month(kwd_count_for_m_minus_1, useful_rows_in_m_1, year=year_for_mm_minus_1,month=mm_minus_1)
-file_wordcloud_for_month(kwd_count_for_m_minus_2, useful_rows_in_m_2, year=year_for_mm_minus_2,month=mm_minus_2)
-
-## Modifying 3-month wordcloud slide by adding pic for last 3 months' wordcloud
-logger.debug("Adding three wordclouds in 14th slide")
-s = prs.slides[13]
-slide_shapes=s.shapes
-left=Mm(93)
-top=Mm(36)
-h=Mm(38)
-slide_shapes.add_picture(tmpdir+"wordcloud-"+calendar.month_name[mm_minus_2]+".png",
-                         left,top,height=h)
-top=Mm(83)
-slide_shapes.add_picture(tmpdir+"wordcloud-"+calendar.month_name[mm_minus_1]+".png",
-                         left,top,height=h)
-top=Mm(128)
-slide_shapes.add_picture(tmpdir+"wordcloud-"+this_month+".png",
-                         left,top,height=h)
-#Find where the placeholders are for the keywords whose frequency we are graphing and update them
-replace_text_in_shape(slide_shapes,find="Month-2",use=calendar.month_name[mm_minus_2],slidename="14th slide")
-replace_text_in_shape(slide_shapes,find="Month-1",use=calendar.month_name[mm_minus_1],slidename="14th slide")
-replace_text_in_shape(slide_shapes,find="Month-0",use=calendar.month_name[mm],slidename="14th slide")
-
-notes_for_slide = s.notes_slide
-notes_tf = notes_for_slide.notes_text_frame
-notes_tf.text = ("%i rows with objectives in %s: Top keywords \n%r\n" %\
-                    (useful_rows_in_m,this_month,kwd_count_for_month.most_common(10)) )
-notes_tf.text += ("%i rows with objectives in %s: Top keywords \n%r\n" %\
-                    (useful_rows_in_m_1,calendar.month_name[mm_minus_1],kwd_count_for_m_minus_1.most_common(10)) )
-notes_tf.text += ("%i rows with objectives in %s: Top keywords \n%r\n" %\
-                    (useful_rows_in_m_2,calendar.month_name[mm_minus_2],kwd_count_for_m_minus_2.most_common(10)) )
-
-################################################
-## Close the source presentations
-################################################
-logger.info("Saving Powerpoint file for "+this_month)
-prs.save('GCA_Customer_Insights_'+this_month+'-'+str(yyyy)+'.pptx')
-## Close any open figures
-plt.close("all")
-logger.info("...and we're done!")
-for h in list(logger.handlers): logger.removeHandler(h)   # may be several here if we've crashed sometimes
+    logger.info("For each centre, getting top 5 interests, and top 3 industries and their interests.")
+    top_pos=[Mm(48),Mm(73),Mm(102),Mm(127),Mm(152)]   #distances to top of icon for each row
+    left_pos=[Mm(35),Mm(65),Mm(95),Mm(125),Mm(154)]   #distances to centre of icon for each row
+    for row,ctr in enumerate(["PA","H","NY1","LON1","SNG"]):  #iterate the centres in the order they appear on the slide
+        #First, the top interests for this centre
+        for col,p in enumerate(kwd_counts_6m_ctr[ctr].most_common(5)):
+            # p is (keyword: count) for each of the keywords, so p[0] is the keyword itself
+            replace_text_in_shape(placeholders,"{}-interest-{}".format(ctr,col),p[0])
+            add_icon(slide_shapes,p[0],left=left_pos[col],top=top_pos[row],small=True)
+        #Next, the top industries with their interests for this centre - industry_counts_6m[c] is already ordered highest->lowest count
+        n=0  #count how many displayed - need to do this separately from the loop count, as we ignore "Other" as an industry group
+        for ind in industry_counts_6m[ctr].index:
+            if   (ind!="Other"):
+                logger.debug("For centre <%s> industry <%i> is <%s>" %(ctr,n,ind))
+                #Write the list of top interests for this industry
+                idx = placeholders.find("{}-industry-{}".format(ctr,n))
+                if (idx>=0):
+                    write_top_keywords(slide_shapes[idx].text_frame,
+                                       ind,
+                                       kwd_counts_6m_for_top_inds[(ctr,ind)],
+                                       commented_rows_for_6m[(ctr,ind)],
+                                       percent=False,
+                                       cutoff=20
+                                      )
+                else:
+                    logger.error("Could not find <{}-industry-{}> placeholder on 11th slide - idx={}".format(ctr,n,idx))
+                n+=1   #increment the number of industries written out for this centre
+            if (n>=3): break   #exit the loop after writing in 3 industries+interests
+
+    ## @24apr18: add text into notes for this slide to show actual counts for top words per centre
+    notes_for_slide = s.notes_slide
+    notes_tf = notes_for_slide.notes_text_frame
+    notes_tf.text = "Counts by centre for last 6 months:\n"
+    for row,ctr in enumerate(["PA","H","NY1","LON1","SNG"]):  #iterate the centres in the order they appear on the slide
+        notes_tf.text += "For %s, top eight items were: %r\n" % (ctr, kwd_counts_6m_ctr[ctr].most_common(8))
+    ## add the average sentiment (-1 to 1) of the comments mentioning the top interests of each centre, and its top industries
+    notes_tf.text += "Average sentiment of the comments mentioning the top interests, by centre, for last 6 months:\n"
+    for ctr in ["PA","H","NY1","LON1","SNG"]:
+        top_kwds = [kwd for kwd,_ in kwd_counts_6m_ctr[ctr].most_common(5)]
+        notes_tf.text += "For %s: %s\n" % (ctr, sentiment_of_keywords(sentiment_cube, top_kwds, centre=ctr))
+        for ind in [ind for ind in industry_counts_6m[ctr].index if ind!="Other"][:3]:
+            top_kwds = [kwd for kwd,_ in kwd_counts_6m_for_top_inds[(ctr,ind)].most_common(3)]
+            notes_tf.text += "    %s: %s\n" % (ind, sentiment_of_keywords(sentiment_cube, top_kwds, centre=ctr, industry=ind))
+
+    ################################################
+    ## 13th slide: EBC specific volumes & interests for last 6 months
+    ################################################
+    if False:
+        logger.info(">>>> 13th slide: EBC specific industry volumes and top interests")
+        ## Generate the image for the big donut showing volume for all industries across the months
+        PA_industry_counts = dfs_6m_ctr["PA"]["Industry"].value_counts()
+        file_donut_PA_ind_vols = file_donut_pie_for_industries(PA_industry_counts,center="PA")
+
+        ## Build the slide
+        logger.debug("Setting the title ")
+        s = prs.slides[12]
+        slide_shapes=s.shapes
+        placeholders = slide_placeholders(slide_shapes,"13th slide")
+        #Update the title
+        title_frame = slide_shapes.title.text_frame
+        title_frame.clear()
+        new_run_in_slide(title_frame.paragraphs[0],text="EBC six month view ("+calendar.month_name[mm_6_before]+"-"+this_month+")",
+            fontname="Arial",fontsize=28)
+
+        #Add the one big donut showing volumes for each industry to the slide
+        logger.debug("Adding main donut to EBC six month view slide (13th slide)")
+        left=Mm(43); top=Mm(48)
+        slide_shapes.add_picture(file_donut_PA_ind_vols,left,top,height=Mm(115),width=Mm(94))
+
+        #Update, by centre, the top interests, and the top industries with their top interests
+        logger.debug("Setting the per-centre top 5 interests, together with per-centre top 3 industries and their interests")
+        left_pos=[Mm(180),Mm(210),Mm(240),Mm(270),Mm(299)]   #distances to centre of icon for each row
+        #First, the top interests for PA
+        for col,p in enumerate(kwd_counts_6m_ctr["PA"].most_common(5)):
+            # p is (keyword: count) for each of the keywords, so p[0] is the keyword itself
+            replace_text_in_shape(placeholders,"PA-interest-{}".format(col),p[0])
+            add_icon(slide_shapes,p[0],left=left_pos[col],top=Mm(59),small=True)
+        #Next, the top industries with their interests for this centre - industry_counts_6m[c] is already ordered highest->lowest count
+        n=0  #count how many displayed - need to do this separately from the loop count, as we ignore "Other" as an industry group
+        for ind in industry_counts_6m["PA"].index:
+            if (ind!="Other"):
+                logger.debug("For Palo Alto, industry <%i> is <%s>" %(n,ind))
+                #Write the list of top interests for this industry
+                idx = placeholders.find("PA-industry-{}".format(n))
+                if (idx>=0):
+                    write_top_keywords(slide_shapes[idx].text_frame,
+                                    ind,
+                                    kwd_counts_6m_for_top_inds[("PA",ind)],
+                                    commented_rows_for_6m[("PA",ind)]
+                                    )
+                else:
+                    logger.error("Could not find <PA-industry-{}> placeholder on 13th slide - idx={}".format(n,idx))
+                n+=1   #increment the number of industries written out for this centre
+            if (n>=3): break   #exit the loop after writing in 3 industries+interests
+
+    ################################################
+    ## 14th slide: 3 months of wordclouds based on keywords in objectives
+    ################################################
+    logger.info(">>>> 14th slide: wordcloud for 3 months, based on Objectives")
+    ## Modifying 3-month wordcloud slide by adding pic for last 3 months' wordcloud
+    logger.debug("Adding three wordclouds in 14th slide")
+    s = prs.slides[13]
+    slide_shapes=s.shapes
+    placeholders = slide_placeholders(slide_shapes,"14th slide")
+    left=Mm(93)
+    top=Mm(36)
+    w,h=small_wordcloud_box
+    slide_shapes.add_picture(renderer.image(file_obj_wordcloud_m_2),
+                             left,top,width=w,height=h)
+    top=Mm(83)
+    slide_shapes.add_picture(renderer.image(file_obj_wordcloud_m_1),
+                             left,top,width=w,height=h)
+    top=Mm(128)
+    slide_shapes.add_picture(renderer.image(file_obj_wordcloud_m),
+                             left,top,width=w,height=h)
+    #Find where the placeholders are for the keywords whose frequency we are graphing and update them
+    replace_text_in_shape(placeholders,find="Month-2",use=calendar.month_name[mm_minus_2])
+    replace_text_in_shape(placeholders,find="Month-1",use=calendar.month_name[mm_minus_1])
+    replace_text_in_shape(placeholders,find="Month-0",use=calendar.month_name[mm])
+
+    notes_for_slide = s.notes_slide
+    notes_tf = notes_for_slide.notes_text_frame
+    notes_tf.text = ("%i rows with objectives in %s: Top keywords \n%r\n" %\
+                        (useful_rows_in_m,this_month,kwd_obj_count_for_month.most_common(10)) )
+    notes_tf.text += ("%i rows with objectives in %s: Top keywords \n%r\n" %\
+                        (useful_rows_in_m_1,calendar.month_name[mm_minus_1],kwd_obj_count_for_m_minus_1.most_common(10)) )
+    notes_tf.text += ("%i rows with objectives in %s: Top keywords \n%r\n" %\
+                        (useful_rows_in_m_2,calendar.month_name[mm_minus_2],kwd_obj_count_for_m_minus_2.most_common(10)) )
+
+    ################################################
+    ## Optional slide after the 11th: average sentiment of the top interests by centre, for last 6 months
+    ################################################
+    if sentiment_slide:
+        logger.info(">>>> Sentiment slide: average sentiment of the top 10 interests, by centre, for last 6 months")
+        top_kwds_6m = [kwd for kwd,_ in kwds_in_wtlma_actions(df_6months,vocab).most_common(10)]
+        add_sentiment_slide(prs, sentiment_cube, top_kwds_6m, ["PA","H","NY1","LON1","SNG"], position=12,
+                            title="Sentiment by interest and centre ("+calendar.month_name[mm_6_before]+"-"+this_month+")")
+
+    ################################################
+    ## Close the source presentations
+    ################################################
+    for placeholders in placeholder_indexes:
+        placeholders.report_unused()
+    if optimize:
+        optimize_media(prs, dpi=render_dpi)
+    logger.info("Saving Powerpoint file for "+this_month)
+    save_deck(prs, 'GCA_Customer_Insights_'+this_month+'-'+str(yyyy)+'.pptx', store_media=store_media)
+    ## Stop the render workers
+    renderer.close()
+    logger.info("...and we're done!")
+    for h in list(logger.handlers): logger.removeHandler(h)   # may be several here if we've crashed sometimes
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,274 @@
+""" A drop-in WordCloud that lays out the same clouds, pixel for pixel, in less time.
+
+    WordCloud.generate_from_frequencies() loads the TrueType font afresh for every size it tries for
+    every word, measures every word again each time, and after placing each word recomputes the
+    integral image of the whole canvas below and to the right of it with two cumulative sums.
+    FastWordCloud runs the same placement search, drawing each word exactly as WordCloud does, but
+      - keeps the fonts it has loaded, and the size of each word at each font size and orientation,
+        in this process, so later clouds (the deck has seven, all from the same keywords) reuse them,
+      - adds just the pixels of the word it has drawn to the integral image, rather than recomputing it,
+      - keeps the layouts it has made: a cloud of the same words, in the same order and proportions,
+        on a canvas of the same size, is laid out exactly as before, so it is not laid out again
+        (recolouring a layout, or drawing it again, needs no new layout).
+    Clouds with a mask, or with a colour function of their own (which could use the random state
+    differently), are laid out as WordCloud does.
+
+    Clouds can be made in several threads at once: each thread loads its own fonts (a FreeType face
+    must not be used by two threads at a time), and the word sizes and layouts are shared.
+
+    The placement search is a copy of WordCloud's, and IntegralOccupancyMap and colormap_color_func are
+    not part of wordcloud's public API, so FastWordCloud is only right for the wordcloud releases in
+    wordcloud_versions, the range requirements.txt asks for.  Importing it with any other raises ImportError.
+
+    Typical usage:
+        wc = FastWordCloud(font_path=os.path.join("fonts","Arial","arial.ttf"), width=2480, height=496,
+                           max_font_size=196, random_state=1).generate_from_frequencies(counts)
+        wc.recolor(color_func=color_func)
+        image = wc.to_image()
+"""
+import os
+import functools
+import logging
+import re
+import threading
+from collections import OrderedDict
+from operator import itemgetter
+from random import Random
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+import wordcloud
+from wordcloud import WordCloud
+
+logger = logging.getLogger("insights.render")
+
+max_layouts = 32      # layouts kept for reuse, least recently used dropped first
+wordcloud_versions = ("1.9.6", "1.10")      # the wordcloud releases whose layout this copies: from the first, before the second
+
+def version_tuple(version):
+    """Returns the numbers of version, such as "1.9.6", as a tuple of ints
+    """
+    return tuple(int(number) for number in re.findall(r"\d+", version)[:3])
+
+if not version_tuple(wordcloud_versions[0]) <= version_tuple(wordcloud.__version__) < version_tuple(wordcloud_versions[1]):
+    raise ImportError("fast_wordcloud copies the layout of wordcloud>=%s,<%s, not of wordcloud %s: install one of those,"
+                      " or use WordCloud" % (wordcloud_versions+(wordcloud.__version__,)))
+
+from wordcloud.wordcloud import IntegralOccupancyMap, colormap_color_func
+
+fonts = threading.local()      # each thread's fonts
+
+def truetype(font_path, font_size):
+    """ImageFont.truetype(font_path, font_size), loading each font at each size once in each thread
+       Returns the FreeTypeFont
+    """
+    if not hasattr(fonts, "truetype"):
+        fonts.truetype = functools.lru_cache(maxsize=512)(ImageFont.truetype)
+    return fonts.truetype(font_path, font_size)
+
+@functools.lru_cache(maxsize=8192)
+def text_box(font_path, font_size, word, orientation):
+    """The box word takes up in the font at font_size, turned by orientation (None or Image.ROTATE_90),
+       as WordCloud measures it
+       Returns (left, top, right, bottom), with the top left at (0, 0)
+    """
+    draw = ImageDraw.Draw(Image.new("L", (1, 1)))
+    transposed_font = ImageFont.TransposedFont(truetype(font_path, font_size), orientation=orientation)
+    return draw.textbbox((0, 0), word, font=transposed_font, anchor="lt")
+
+class IncrementalOccupancyMap(IntegralOccupancyMap):
+    """IntegralOccupancyMap, but updated from the pixels that changed rather than from the whole image
+    """
+
+    def add(self, patch, pos_x, pos_y):
+        """Add patch, the increase in the pixels of the image at [pos_x:, pos_y:], to the integral image
+        """
+        size_x, size_y = patch.shape
+        partial = np.cumsum(np.cumsum(patch, axis=1), axis=0).astype(np.uint32)
+        integral = self.integral
+        integral[pos_x:pos_x+size_x, pos_y:pos_y+size_y] += partial
+        integral[pos_x:pos_x+size_x, pos_y+size_y:] += partial[:, -1:]
+        integral[pos_x+size_x:, pos_y:pos_y+size_y] += partial[-1:, :]
+        integral[pos_x+size_x:, pos_y+size_y:] += partial[-1, -1]
+
+class FastWordCloud(WordCloud):
+    """WordCloud with cached fonts, word sizes and layouts.  Takes the same arguments as WordCloud.
+    """
+    layouts = OrderedDict()    # layout key -> (words_, layout_, random state afterwards), shared by all clouds
+    layouts_lock = threading.Lock()
+
+    def layout_key(self, frequencies, max_font_size):
+        """Everything that decides the layout of frequencies (the sorted, normalised (word, frequency) list)
+           Returns the key, or None if the layout can't be reused
+        """
+        if self.mask is not None or not isinstance(self.color_func, colormap_color_func) \
+                or self.random_state is None:
+            return None
+        try:
+            stat = os.stat(self.font_path)
+        except OSError:
+            return None
+        return (self.font_path, stat.st_mtime_ns, stat.st_size, self.width, self.height, self.margin,
+                self.prefer_horizontal, self.relative_scaling, self.min_font_size, self.font_step,
+                self.repeat, self.colormap, self.max_font_size, max_font_size, tuple(frequencies),
+                self.random_state.getstate())
+
+    def generate_from_frequencies(self, frequencies, max_font_size=None):
+        """WordCloud.generate_from_frequencies(frequencies, max_font_size), reusing the layout if we have
+           made this one before
+           Returns self
+        """
+        if self.mask is not None:
+            return super().generate_from_frequencies(frequencies, max_font_size)
+
+        # make sure frequencies are sorted and normalized
+        frequencies = sorted(frequencies.items(), key=itemgetter(1), reverse=True)
+        if len(frequencies) <= 0:
+            raise ValueError("We need at least 1 word to plot a word cloud, "
+                             "got %d." % len(frequencies))
+        frequencies = frequencies[:self.max_words]
+        max_frequency = float(frequencies[0][1])
+        frequencies = [(word, freq / max_frequency) for word, freq in frequencies]
+
+        key = self.layout_key(frequencies, max_font_size)
+        with self.layouts_lock:
+            reused = self.layouts.get(key) if key is not None else None
+            if reused is not None:
+                self.layouts.move_to_end(key)
+        if reused is not None:
+            words, layout, state = reused
+            self.words_, self.layout_ = dict(words), list(layout)
+            self.random_state.setstate(state)
+            logger.debug("Reusing the layout of %i words" % len(self.layout_))
+            return self
+
+        self._layout(frequencies, max_font_size)
+        if key is not None:
+            with self.layouts_lock:
+                self.layouts[key] = (dict(self.words_), list(self.layout_), self.random_state.getstate())
+                if len(self.layouts) > max_layouts:
+                    self.layouts.popitem(last=False)
+        return self
+
+    def _layout(self, frequencies, max_font_size):
+        # WordCloud's layout, step for step, so it uses the random state in the same way and gives the same cloud
+        if self.random_state is not None:
+            random_state = self.random_state
+        else:
+            random_state = Random()
+
+        height, width = self.height, self.width
+        occupancy = IncrementalOccupancyMap(height, width, None)
+        img_grey = Image.new("L", (width, height))
+        draw = ImageDraw.Draw(img_grey)
+        font_sizes, positions, orientations, colors = [], [], [], []
+
+        last_freq = 1.
+
+        if max_font_size is None:
+            # if not provided use default font_size
+            max_font_size = self.max_font_size
+
+        if max_font_size is None:
+            # figure out a good font size by trying to draw with just the first two words
+            if len(frequencies) == 1:
+                font_size = self.height
+            else:
+                self.generate_from_frequencies(dict(frequencies[:2]), max_font_size=self.height)
+                sizes = [x[1] for x in self.layout_]
+                try:
+                    font_size = int(2 * sizes[0] * sizes[1] / (sizes[0] + sizes[1]))
+                except IndexError:
+                    try:
+                        font_size = sizes[0]
+                    except IndexError:
+                        raise ValueError(
+                            "Couldn't find space to draw. Either the Canvas size"
+                            " is too small or too much of the image is masked "
+                            "out.")
+        else:
+            font_size = max_font_size
+
+        self.words_ = dict(frequencies)
+
+        if self.repeat and len(frequencies) < self.max_words:
+            # pad frequencies with repeating words.
+            times_extend = int(np.ceil(self.max_words / len(frequencies))) - 1
+            frequencies_org = list(frequencies)
+            downweight = frequencies[-1][1]
+            for i in range(times_extend):
+                frequencies.extend([(word, freq * downweight ** (i + 1))
+                                    for word, freq in frequencies_org])
+
+        for word, freq in frequencies:
+            if freq == 0:
+                continue
+            # select the font size
+            rs = self.relative_scaling
+            if rs != 0:
+                font_size = int(round((rs * (freq / float(last_freq)) + (1 - rs)) * font_size))
+            if random_state.random() < self.prefer_horizontal:
+                orientation = None
+            else:
+                orientation = Image.ROTATE_90
+            tried_other_orientation = False
+            while True:
+                if font_size < self.min_font_size:
+                    break
+                box_size = text_box(self.font_path, font_size, word, orientation)
+                result = occupancy.sample_position(box_size[3] + self.margin,
+                                                   box_size[2] + self.margin,
+                                                   random_state)
+                if result is not None:
+                    break
+                # if we didn't find a place, make font smaller, but first try to rotate
+                if not tried_other_orientation and self.prefer_horizontal < 1:
+                    orientation = Image.ROTATE_90
+                    tried_other_orientation = True
+                else:
+                    font_size -= self.font_step
+                    orientation = None
+
+            if font_size < self.min_font_size:
+                # we were unable to draw any more
+                break
+
+            x, y = np.array(result) + self.margin // 2
+            transposed_font = ImageFont.TransposedFont(truetype(self.font_path, font_size),
+                                                       orientation=orientation)
+            # draw the word, and add the pixels it changed to the occupancy map
+            left, top, right, bottom = draw.textbbox((y, x), word, font=transposed_font)
+            crop = (max(0, left), max(0, top), min(width, right), min(height, bottom))
+            before = np.asarray(img_grey.crop(crop), dtype=np.int64)
+            draw.text((y, x), word, fill="white", font=transposed_font)
+            if crop[2] > crop[0] and crop[3] > crop[1]:
+                occupancy.add(np.asarray(img_grey.crop(crop), dtype=np.int64) - before, crop[1], crop[0])
+            positions.append((x, y))
+            orientations.append(orientation)
+            font_sizes.append(font_size)
+            colors.append(self.color_func(word, font_size=font_size,
+                                          position=(x, y),
+                                          orientation=orientation,
+                                          random_state=random_state,
+                                          font_path=self.font_path))
+            last_freq = freq
+
+        self.layout_ = list(zip(frequencies, font_sizes, positions, orientations, colors))
+        return self
+
+    def to_image(self):
+        """WordCloud.to_image(), drawing with the cached fonts
+           Returns the PIL Image
+        """
+        self._check_generated()
+        if self.mask is not None:
+            return super().to_image()
+        img = Image.new(self.mode, (int(self.width * self.scale), int(self.height * self.scale)),
+                        self.background_color)
+        draw = ImageDraw.Draw(img)
+        for (word, count), font_size, position, orientation, color in self.layout_:
+            transposed_font = ImageFont.TransposedFont(truetype(self.font_path, int(font_size * self.scale)),
+                                                       orientation=orientation)
+            pos = (int(position[1] * self.scale), int(position[0] * self.scale))
+            draw.text(pos, word, fill=color, font=transposed_font)
+        return self._draw_contour(img=img)
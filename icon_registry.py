@@ -0,0 +1,109 @@
+""" The keyword icons in icons/, read once.
+
+    add_icon used to open icons/<keyword>.png, and sniff its type and size, for every icon put on a
+    slide, so slide assembly did file I/O per icon and any failure went unreported beyond "could not
+    find".  IconRegistry scans the directory once, keeping the bytes and pixel size of every image
+    in it by keyword.  File names are matched ignoring case, as Windows does (so 'greenlake.PNG' and
+    'Meridian.PNG' are the icons for greenlake and meridian wherever we run).  A keyword without
+    an icon gets the fallback icon, error.png, with a warning the first time it is asked for.
+
+    Typical usage:
+        icons = IconRegistry("icons/")
+        icons.report_missing(vocab)          # warn about keywords in the ini file with no icon
+        blob, width, height = icons.icon("synergy")
+"""
+import os
+import struct
+import logging
+
+logger = logging.getLogger("insights.icons")
+
+image_extensions = (".png", ".jpg", ".jpeg", ".gif")
+
+def image_size(blob):
+    """Determine the image type of blob, the bytes of a PNG, GIF or JPEG file
+       Returns its (width, height) in pixels, or None if the type isn't recognised or the file is damaged
+    """
+    if blob[:8] == b'\x89PNG\r\n\x1a\n' and len(blob) >= 24:
+        return struct.unpack('>ii', blob[16:24])
+    if blob[:6] in (b'GIF87a', b'GIF89a') and len(blob) >= 10:
+        return struct.unpack('<HH', blob[6:10])
+    if blob[:2] == b'\xff\xd8':
+        # walk the JPEG segments to the start of frame (SOFn) marker, which holds the size
+        pos = 2
+        while pos+9 <= len(blob):
+            if blob[pos] != 0xff:
+                return None
+            marker = blob[pos+1]
+            if marker == 0xff:            # padding
+                pos += 1
+                continue
+            if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc):
+                height, width = struct.unpack('>HH', blob[pos+5:pos+9])
+                return width, height
+            pos += 2+struct.unpack('>H', blob[pos+2:pos+4])[0]
+    return None
+
+class IconRegistry(object):
+    """The bytes and size of every icon in a directory, by keyword
+
+       Parameters
+       ----------
+       icondir : str
+         The directory of icons, each named after its keyword, e.g. icons/synergy.png
+       fallback : str
+         The keyword of the icon to use for keywords without one.
+    """
+
+    def __init__(self, icondir, fallback="error"):
+        self.icondir = icondir
+        self.fallback = fallback
+        self.icons = {}          # keyword (lower case) -> (bytes, width, height)
+        self.filenames = {}      # keyword (lower case) -> file name, for messages
+        self.reported = set()    # keywords already warned about
+        for filename in sorted(os.listdir(icondir)):
+            keyword, extension = os.path.splitext(filename)
+            if extension.lower() not in image_extensions:
+                continue
+            with open(os.path.join(icondir, filename), 'rb') as fhandle:
+                blob = fhandle.read()
+            size = image_size(blob)
+            if size is None:
+                logger.warning("Icon %s is not a PNG, GIF or JPEG image we can read - ignoring it" % os.path.join(icondir, filename))
+                continue
+            key = keyword.lower()
+            if key in self.icons:
+                logger.warning("Icons %s and %s are both for keyword %s - using %s"
+                               % (self.filenames[key], filename, key, self.filenames[key]))
+                continue
+            self.icons[key] = (blob,)+tuple(size)
+            self.filenames[key] = filename
+        if self.fallback not in self.icons:
+            logger.warning("No fallback icon %s.png in %s - keywords without an icon will be left out" % (fallback, icondir))
+        logger.debug("Read %i icons from %s" % (len(self.icons), icondir))
+
+    def has_icon(self, keyword):
+        return keyword.lower() in self.icons
+
+    def icon(self, keyword):
+        """The icon for keyword, or the fallback icon if keyword has none
+           Returns (bytes of the image, width, height), or None if there isn't a fallback icon either
+        """
+        found = self.icons.get(keyword.lower())
+        if found is None:
+            if keyword not in self.reported:
+                self.reported.add(keyword)
+                logger.warning("Could not find icon for %s in %s - using %s instead" % (keyword, self.icondir, self.fallback))
+            found = self.icons.get(self.fallback)
+        return found
+
+    def report_missing(self, keywords):
+        """Warn about each of keywords (e.g. all of those in the [keywords] section of the ini file) with no icon
+           Returns the sorted list of them
+        """
+        missing = sorted(set(k for k in keywords if not self.has_icon(k)))
+        if missing:
+            logger.warning("No icon in %s for %i keywords, which will get %s instead: %s"
+                           % (self.icondir, len(missing), self.fallback, ", ".join(missing)))
+        self.reported.update(missing)
+        return missing
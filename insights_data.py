@@ -0,0 +1,367 @@
+""" Loading and date handling for the Insights spreadsheet, shared by excel_to_ppt.py,
+    single_centre_view.py and count_word.py.
+
+    The 'Visit Date' column holds a mixture of real Excel dates, strings like "Apr 03, 2017",
+    and the odd blank or junk cell.  parse_visit_dates() turns the whole column into a native
+    datetime64 column in one go, so month filters are plain datetime64 comparisons.
+
+    read_insights() reads the spreadsheet and adds the structured columns, keeping a Parquet
+    copy of the result next to the spreadsheet so that later runs can skip parsing the Excel
+    file altogether.  The cache file name holds a hash of the spreadsheet's contents and of
+    everything else the result depends on, so a changed spreadsheet or [synonyms] section is
+    simply a cache miss.  Parquet can't store a column of mixed types, such as 'Visit Date'
+    with its dates and text, so those are stored as text tagged with each value's type and
+    turned back on reading: a cached frame is the same, dtypes and all, as one read afresh.
+
+    With streaming=True the spreadsheet is instead read row by row with openpyxl's read-only
+    mode, keeping just the columns in insights_columns and adding the structured columns a
+    chunk at a time, so the whole workbook is never held in memory at once.
+"""
+import datetime
+import numpy as np
+import pandas as pd
+import hashlib
+import json
+import glob
+import os
+import sys
+import logging
+
+logger = logging.getLogger("insights.data")
+
+cache_version = 2    # bump this if the structured columns change, to invalidate existing caches
+
+visit_date_format = "%b %d, %Y"    # format of the dates held as text in the spreadsheet
+
+# the only columns the scripts use, which is all that streaming mode keeps
+insights_columns = ['Visit Date','Want to Learn More About','Action Items','Objectives','Ctr',
+                    'Industry','Account Name','Account Type','Partner / Customer','Customer Overall Comments']
+
+# how parquet_safe() turns the values of a column of mixed types into text, and parquet_restored() turns them back,
+# by the name of the value's type: those a spreadsheet cell can hold
+mixed_types = {"str": (str, str),
+               "int": (str, int),
+               "float": (repr, float),
+               "bool": (str, lambda text: text == "True"),
+               "datetime": (datetime.datetime.isoformat, datetime.datetime.fromisoformat),
+               "Timestamp": (pd.Timestamp.isoformat, pd.Timestamp),
+               "date": (datetime.date.isoformat, datetime.date.fromisoformat),
+               "time": (datetime.time.isoformat, datetime.time.fromisoformat),
+               "timedelta": (lambda value: repr(value.total_seconds()), lambda text: datetime.timedelta(seconds=float(text))),
+               "NoneType": (lambda value: "", lambda text: None)}     # a blank, where NaN is the other kind
+
+# cell text that read_excel treats as blank: its default na_values, plus Excel's error values
+blank_cell_text = {'', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                   '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+                   '#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!'}
+
+def parse_visit_dates(series):
+    """Vectorised replacement for the old per-cell make_date(), over the whole 'Visit Date' column.
+       Cells holding a datetime, or a string in visit_date_format, become a datetime64 date (time
+       of day dropped).  Everything else becomes NaT, flagged the way make_date() used to flag
+       it with sentinel dates:
+         date_unparsed - a string we could not parse (make_date gave date.fromordinal(1))
+         date_missing  - a blank, or anything else that is not a date (make_date gave date.fromordinal(2))
+       Returns a DataFrame with columns date, date_unparsed and date_missing, with the same index as series
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        # every cell was a real date (or blank), so pandas has already done the work
+        dates = series.dt.normalize()
+        is_text = pd.Series(False, index=series.index)
+    else:
+        series = series.astype(object)
+        dates = pd.to_datetime(series, format=visit_date_format, errors="coerce").dt.normalize()
+        is_text = series.str.len().notna()     # .str gives NaN for anything that isn't a string
+    not_parsed = dates.isna()
+    return pd.DataFrame({"date": dates,
+                         "date_unparsed": not_parsed & is_text,
+                         "date_missing": not_parsed & ~is_text},
+                        index=series.index)
+
+def month_start(year, month):
+    """Return the Timestamp for midnight on the first day of the given month
+    """
+    return pd.Timestamp(year, month, 1)
+
+def add_months(year, month, n):
+    """Return the (year, month) which is n months after (or before, for negative n) the given one
+    """
+    months = year*12 + (month-1) + n
+    return months//12, months%12 + 1
+
+class DateIndex(object):
+    """The spreadsheet's rows ordered by date once, so that any month, or any window of months, is a
+       range of that order found by binary search rather than two boolean masks over every row.
+
+       Parameters
+       ----------
+       df : DataFrame
+         The whole spreadsheet, with the datetime64 'date' column from parse_visit_dates().
+         It is kept, in its own order, as self.df; the rows of a month or window are returned
+         in that order too, as the boolean masks gave them.
+
+       Typical usage:
+           date_index = DateIndex(all_df)
+           df_for_month = date_index.month(2018,6)
+           df_6months = date_index.months(2018,6,count=6)       # Jan-Jun 2018
+           df_fy = date_index.fiscal_year(2018)                 # Nov 2017-Oct 2018
+    """
+
+    def __init__(self, df):
+        self.df = df
+        by_date = df["date"].reset_index(drop=True).sort_values(kind="mergesort", na_position="last")
+        self.order = by_date.index.to_numpy()              # row positions of df, in date order
+        self.dates = by_date.values[:by_date.notna().sum()]   # sorted, with the NaT rows cut off the end
+        self.month_offsets = {}                           # (year, month) -> (start, end) positions in self.order
+        if len(self.dates):
+            first, last = pd.Timestamp(self.dates[0]), pd.Timestamp(self.dates[-1])
+            year, month = first.year, first.month
+            boundaries = [(year, month)]
+            while (year, month) <= (last.year, last.month):
+                year, month = add_months(year, month, 1)
+                boundaries.append((year, month))
+            offsets = self.dates.searchsorted(
+                        pd.DatetimeIndex([month_start(y,m) for y,m in boundaries]).values.astype(self.dates.dtype))
+            for n in range(len(boundaries)-1):
+                self.month_offsets[boundaries[n]] = (int(offsets[n]), int(offsets[n+1]))
+
+    def position(self, when):
+        """Return the position in date order of the first row dated on or after 'when'
+        """
+        return int(self.dates.searchsorted(pd.Timestamp(when).to_datetime64().astype(self.dates.dtype)))
+
+    def rows(self, start, end):
+        """Return the rows from position start up to but not including end in date order, in the spreadsheet's order
+        """
+        return self.df.iloc[np.sort(self.order[start:max(start,end)])]
+
+    def window(self, start, end):
+        """Return the rows dated from 'start' up to but not including 'end'
+        """
+        return self.rows(self.position(start), self.position(end))
+
+    def month(self, year, month):
+        """Return the rows for the given month
+        """
+        if (year, month) in self.month_offsets:
+            return self.rows(*self.month_offsets[(year, month)])
+        return self.window(month_start(year, month), month_start(*add_months(year, month, 1)))
+
+    def months(self, year, month, count):
+        """Return the rows for the 'count' months up to and including the given month
+        """
+        first_year, first_month = add_months(year, month, 1-count)
+        return self.window(month_start(first_year, first_month), month_start(*add_months(year, month, 1)))
+
+    def trailing_12_months(self, year, month):
+        """Return the rows for the 12 months up to and including the given month
+        """
+        return self.months(year, month, 12)
+
+    def quarter(self, year, quarter):
+        """Return the rows for calendar quarter 1-4 of the given year
+        """
+        return self.months(year, 3*quarter, 3)
+
+    def fiscal_year(self, fiscal_year, first_month=11):
+        """Return the rows for the given fiscal year, where the fiscal year starts in first_month
+           of the previous calendar year (HPE's FY2018 ran from November 2017 to October 2018).
+           Use first_month=1 for a calendar year.
+        """
+        first_year = fiscal_year-1 if first_month>1 else fiscal_year
+        return self.months(*add_months(first_year, first_month, 11), count=12)
+
+def file_digest(filename):
+    """Return the SHA-256 hex digest of the contents of filename
+    """
+    digest = hashlib.sha256()
+    with open(filename,'rb') as fhandle:
+        for block in iter(lambda: fhandle.read(1<<20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def add_structured_columns(df, text_columns, normalizer):
+    """Add the columns the scripts work from to the raw spreadsheet dataframe df, in place:
+       'date' first, then the tidied text columns, then the date_unparsed and date_missing flags.
+       text_columns is a list of (new column, source column) pairs, e.g. [("wtlma","Want to Learn More About")]
+    """
+    visit_dates = parse_visit_dates(df['Visit Date'])
+    df.insert(loc=0,column='date',value=visit_dates.date)
+    for n,(column,source) in enumerate(text_columns):
+        df.insert(loc=n+1,column=column,value=normalizer.tidy_series(df[source]))
+    df['date_unparsed'] = visit_dates.date_unparsed   # text in 'Visit Date' we couldn't read as a date
+    df['date_missing'] = visit_dates.date_missing     # blank (or non-date) 'Visit Date'
+    logger.debug("Visit Date: %i rows unparseable, %i rows missing" % (visit_dates.date_unparsed.sum(),visit_dates.date_missing.sum()))
+    return df
+
+def cache_filename(excel_file, header_row, usecols, text_columns, normalizer):
+    """Return the name of the Parquet cache for this spreadsheet and these reading options
+    """
+    options = json.dumps([cache_version, header_row, usecols, text_columns, sorted(normalizer.root_of.items())])
+    options_digest = hashlib.sha256(options.encode('utf-8')).hexdigest()
+    return "{}.{}-{}.parquet".format(excel_file, file_digest(excel_file)[:16], options_digest[:8])
+
+def value_kind(value):
+    """Returns the name of value's type, or "NaN" for NaN
+    """
+    return "NaN" if isinstance(value, float) and np.isnan(value) else type(value).__name__
+
+def parquet_safe(df):
+    """Return a copy of df that Parquet can store, and that parquet_restored() turns back into df.
+       Object columns of text (with blanks all None or all NaN) are stored as they are, and noted
+       in the copy's attrs (which Parquet keeps too), as they are read back as strings.  Object
+       columns holding a mixture of types (such as the raw 'Visit Date', which we have already
+       parsed into 'date') have their values turned into text tagged with the value's type, as
+       in "int:3141", and are noted in the attrs too.  A value of a type not in mixed_types is
+       stored as its str()
+    """
+    def tagged(value):
+        name = value_kind(value)
+        if name == "NaN":
+            return value
+        if name not in mixed_types:
+            name, value = "str", str(value)
+        return name+":"+mixed_types[name][0](value)
+
+    df = df.copy()
+    text, mixed = {}, []
+    for column in df.columns:
+        if df[column].dtype == object:
+            kinds = set(df[column].map(value_kind))
+            blanks = kinds & {"NaN", "NoneType"}
+            if kinds-blanks <= {"str"} and len(blanks) <= 1:
+                text[column] = "NoneType" in blanks     # whether its blanks are None
+            else:
+                df[column] = df[column].map(tagged)
+                mixed.append(column)
+    df.attrs.update(text_columns=text, mixed_columns=mixed)
+    return df
+
+def parquet_restored(df):
+    """Turn the object columns of df, read from a Parquet file written from parquet_safe(), back into the
+       object columns they were
+       Returns df
+    """
+    def value(text):
+        name, _, text = text.partition(":")
+        return mixed_types[name][1](text)
+
+    for column, none_blanks in df.attrs.pop("text_columns", {}).items():
+        values = df[column].astype(object)
+        if none_blanks:
+            values[values.isna()] = None
+        df[column] = values
+    for column in df.attrs.pop("mixed_columns", []):
+        df[column] = df[column].astype(object).map(lambda v: v if pd.isna(v) else value(v))
+    return df
+
+def peak_rss():
+    """Return the peak resident set size of this process so far, in bytes, or None if we can't tell
+    """
+    try:
+        import resource
+    except ImportError:     # Windows - fall back on psutil, if it is installed
+        try:
+            import psutil
+        except ImportError:
+            return None
+        memory = psutil.Process().memory_info()
+        return getattr(memory, "peak_wset", memory.rss)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak*1024    # Linux reports kilobytes, macOS bytes
+
+def stream_insights(excel_file, header_row=1, columns=insights_columns, chunk_rows=10000):
+    """Read the first worksheet of excel_file row by row, without loading the workbook into memory,
+       keeping only the given columns (a column missing from the header row is logged, and left blank).
+       Blank rows after the last row with something in those columns are dropped, as read_excel does.
+       Yields dataframes of up to chunk_rows rows, numbered on from each other like one big
+       dataframe; at least one (perhaps empty) dataframe is always yielded
+    """
+    import openpyxl
+    workbook = openpyxl.load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(min_row=header_row, values_only=True)
+        header = list(next(rows, ()))
+        positions = []
+        for column in columns:
+            if column in header:
+                positions.append(header.index(column))
+            else:
+                logger.warning("No column '{}' in the header row of {}".format(column,excel_file))
+                positions.append(None)
+
+        chunk, first_row, yielded, blank_rows = [], 0, False, 0
+        for row in rows:
+            values = [row[p] if p is not None and p < len(row) else None for p in positions]
+            values = [None if isinstance(v,str) and v in blank_cell_text else v for v in values]
+            if all(v is None for v in values):
+                blank_rows += 1     # held back, so that blank rows at the very end are dropped
+                continue
+            chunk.extend([[None]*len(columns)]*blank_rows)
+            chunk.append(values)
+            blank_rows = 0
+            if len(chunk) >= chunk_rows:
+                yield pd.DataFrame(chunk, columns=columns, index=pd.RangeIndex(first_row, first_row+len(chunk)), dtype=object)
+                first_row += len(chunk)
+                chunk, yielded = [], True
+        if chunk or not yielded:
+            yield pd.DataFrame(chunk, columns=columns, index=pd.RangeIndex(first_row, first_row+len(chunk)), dtype=object)
+    finally:
+        workbook.close()
+
+def read_insights(excel_file, header_row=1, usecols="A:S", text_columns=(), normalizer=None, use_cache=True,
+                  streaming=False, chunk_rows=10000):
+    """Read the Insights spreadsheet, with the header in (1-based) header_row, and add the
+       structured columns (see add_structured_columns).  Uses, or creates, a Parquet cache
+       next to the spreadsheet unless use_cache is False.  Caches for older versions of the
+       spreadsheet are removed when a new one is written.
+       With streaming=True only insights_columns are read (usecols is ignored), chunk_rows
+       rows at a time, so the workbook and its unused columns are never held in memory.  The
+       result still holds both the raw and the tidied text (the scripts count the rows with
+       comments from the raw columns), and the chunks are all held until they are joined, so
+       peak memory is about twice the size of the resulting dataframe.
+       Returns a dataframe
+    """
+    text_columns = [list(c) for c in text_columns]
+    if streaming:
+        usecols = insights_columns
+    cache_file = None
+    if use_cache:
+        cache_file = cache_filename(excel_file, header_row, usecols, text_columns, normalizer)
+        if os.path.exists(cache_file):
+            try:
+                df = parquet_restored(pd.read_parquet(cache_file))
+                logger.info("Read {} rows from cache {}".format(len(df.index),cache_file))
+                return df
+            except Exception as err:
+                logger.warning("Ignoring unreadable cache {}: {}".format(cache_file,err))
+
+    if streaming:
+        logger.info("Streaming excel file "+excel_file+" with header in row "+str(header_row))
+        df = pd.concat([add_structured_columns(chunk, text_columns, normalizer)
+                        for chunk in stream_insights(excel_file, header_row, chunk_rows=chunk_rows)])
+    else:
+        logger.info("Importing excel file "+excel_file+" with header in row "+str(header_row))
+        # Note that "header" is zero-indexed, so must subtract one from header_row
+        df = pd.read_excel(open(excel_file,'rb'),header=header_row-1,usecols=usecols)
+        add_structured_columns(df, text_columns, normalizer)
+    rss = peak_rss()
+    if rss is not None:
+        logger.info("Read {} rows; peak memory (RSS) so far is {:.1f} MB".format(len(df.index),rss/2**20))
+
+    if cache_file:
+        try:
+            parquet_safe(df).to_parquet(cache_file)
+            logger.debug("Wrote cache {}".format(cache_file))
+        except ImportError as err:
+            logger.warning("Not caching {} - no Parquet engine available ({})".format(excel_file,err))
+        except (OSError, ValueError) as err:
+            logger.warning("Could not write cache {}: {}".format(cache_file,err))
+        else:
+            # caches for any other version of the spreadsheet's contents are now stale
+            this_version = cache_file[:cache_file.rindex("-")]
+            for old_cache in glob.glob(glob.escape(excel_file)+".*.parquet"):
+                if not old_cache.startswith(this_version):
+                    logger.debug("Removing stale cache {}".format(old_cache))
+                    os.remove(old_cache)
+    return df
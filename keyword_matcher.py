@@ -0,0 +1,158 @@
+""" Single-pass keyword matching over the tidied text columns of the Insights spreadsheet.
+
+    Rather than building a fresh '\\bkwd\\b' regex for every keyword and running it down
+    every column, each cell is split once into its word tokens and all the keywords are
+    looked up against that token set in one go.  Keywords which are not a single word
+    token (e.g. "gen-z", which only appears after synonym replacement) still get their
+    own regex, so the word-boundary semantics are identical to bool_list_of_occurrences().
+
+    Typical usage:
+        matcher = KeywordMatcher(vocab)
+        kwd_counts = matcher.keyword_counts([df.wtlma, df.actions])   # Counter of rows per keyword
+        df_for_kwd = df.loc[matcher.rows_with_keyword([df.wtlma, df.actions],"synergy")]
+
+    When the same workbook is sliced many times (by month, centre, industry...) build a
+    KeywordIncidence once instead, so each count is just a sum over a boolean matrix:
+        incidence = KeywordIncidence(all_df, ["wtlma","actions","objectives"], matcher)
+        kwd_counts = incidence.keyword_counts(df_for_month, ["wtlma","actions"])
+"""
+import re
+from collections import Counter
+import numpy as np
+import pandas as pd
+
+word_token = re.compile(r'\w+')    # same notion of a "word" as \b uses in the regex version
+
+class KeywordMatcher(object):
+    """Match a whole vocabulary of keywords against text cells in a single pass per cell
+
+       Parameters
+       ----------
+       keywords : list(str)
+         The keywords to look for, in the order they should appear in any Counter
+         we return (this keeps most_common() tie-breaks the same as the old code).
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self.token_keywords = set()     # keywords we can find with a simple token lookup
+        self.pattern_keywords = []      # (keyword, compiled regex) for everything else
+        for kwd in self.keywords:
+            if word_token.fullmatch(kwd):
+                self.token_keywords.add(kwd)
+            else:
+                self.pattern_keywords.append((kwd, re.compile(r'\b{0}\b'.format(kwd))))
+
+    def hits_in_cell(self, cell):
+        """Return the frozenset of keywords found in the text 'cell'
+        """
+        if not isinstance(cell,str) or not cell:
+            return frozenset()
+        found = self.token_keywords.intersection(word_token.findall(cell))
+        for kwd,pattern in self.pattern_keywords:
+            if pattern.search(cell):
+                found.add(kwd)
+        return frozenset(found)
+
+    def hits_in_series(self, series):
+        """Return a Series (same index as 'series') holding the frozenset of keywords found in each cell
+        """
+        return series.map(self.hits_in_cell)
+
+    def hits_in_columns(self, df_col_list):
+        """Passed a list of dataframe columns (Series sharing the same index), return a Series
+           holding, for each row, the frozenset of keywords found in any of those columns
+        """
+        hits = self.hits_in_series(df_col_list[0])
+        for col in df_col_list[1:]:
+            col_hits = self.hits_in_series(col)
+            hits = pd.Series([a | b for a,b in zip(hits,col_hits)], index=hits.index, dtype=object)
+        return hits
+
+    def keyword_counts(self, df_col_list):
+        """Count, for each keyword, the number of rows where it appears in at least one of the columns.
+           Every keyword is present in the result (with 0 if not found), in vocabulary order.
+           Returns a Counter collection of (keyword:count)
+        """
+        counts = Counter({kwd: 0 for kwd in self.keywords})
+        for row_hits in self.hits_in_columns(df_col_list):
+            counts.update(row_hits)
+        return counts
+
+    def rows_with_keyword(self, df_col_list, kwd):
+        """Return a boolean Series, True wherever at least one of the columns contains kwd.
+           Can be used to subset the original dataframe, as df.loc[matcher.rows_with_keyword(...)]
+        """
+        hits = self.hits_in_columns(df_col_list)
+        return hits.map(lambda row_hits: kwd in row_hits).astype(bool)
+
+
+class KeywordIncidence(object):
+    """A (rows x keywords) boolean matrix per text field, built once for the whole dataframe,
+       so that keyword counts for any subset of its rows are a masked column sum rather than
+       a fresh scan of the text.
+
+       Parameters
+       ----------
+       df : DataFrame
+         The full dataframe.  Its index must be unique, as subsets of it (from .loc, boolean
+         masks or pd.concat of such subsets) are mapped back to matrix rows by index label.
+
+       fields : list(str)
+         The tidied text columns of df to build a matrix for, e.g. ["wtlma","actions"]
+
+       matcher : KeywordMatcher
+         Supplies the vocabulary (and its order) and does the one-off text matching.
+    """
+
+    def __init__(self, df, fields, matcher):
+        self.keywords = list(dict.fromkeys(matcher.keywords))   # de-duplicated, order preserved
+        self.column_of = {kwd: n for n,kwd in enumerate(self.keywords)}
+        self.index = df.index
+        self.matrix = {}
+        for field in fields:
+            m = np.zeros((len(df.index), len(self.keywords)), dtype=bool)
+            for row,row_hits in enumerate(matcher.hits_in_series(df[field])):
+                for kwd in row_hits:
+                    m[row, self.column_of[kwd]] = True
+            self.matrix[field] = m
+
+    def has_keywords(self, keywords):
+        """Return True if keywords (compared by value, ignoring repeats) are the vocabulary this matrix was built
+           for, in the same order, so its counts can stand in for counting keywords afresh
+        """
+        return list(dict.fromkeys(keywords)) == self.keywords
+
+    def row_positions(self, df):
+        """Return the matrix row numbers for the rows of df, which must be a subset of the original
+           dataframe (or one of its columns - only the index is used)
+        """
+        if df.index.equals(self.index):
+            return slice(None)
+        positions = self.index.get_indexer(df.index)
+        assert (positions>=0).all(), "dataframe has rows that are not in the keyword incidence matrix"
+        return positions
+
+    def rows_by_keyword(self, df, fields):
+        """Return the (rows of df x keywords) boolean matrix, True where a keyword is in at least one of fields
+        """
+        rows = self.row_positions(df)
+        found = self.matrix[fields[0]][rows]
+        for field in fields[1:]:
+            found = found | self.matrix[field][rows]
+        return found
+
+    def keyword_counts(self, df, fields):
+        """Count, for each keyword, the rows of df where it appears in at least one of the fields.
+           Every keyword is present in the result (with 0 if not found), in vocabulary order.
+           Returns a Counter collection of (keyword:count)
+        """
+        sums = self.rows_by_keyword(df, fields).sum(axis=0)
+        return Counter(dict(zip(self.keywords, sums.tolist())))
+
+    def rows_with_keyword(self, df, fields, kwd):
+        """Return a boolean Series over the rows of df, True wherever at least one of the fields contains kwd.
+           Can be used to subset df, as df.loc[incidence.rows_with_keyword(df,["wtlma"],"foo")]
+        """
+        found = self.rows_by_keyword(df, fields)[:, self.column_of[kwd]]
+        return pd.Series(found, index=df.index)
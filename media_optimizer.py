@@ -0,0 +1,191 @@
+""" Make a finished deck smaller before it is saved, by re-encoding its pictures.
+
+    Most of a monthly deck is PNGs: wordclouds with large flat backgrounds, icons kept at the resolution
+    of their source files, and charts.  optimize_media() goes through every image part of the deck and
+      - downscales it to the largest size it is shown at on any slide, at the given dpi
+        (pictures that are cropped, or used other than as a picture, keep their size),
+      - turns a PNG of flat colours into a palette PNG: exactly, if it has at most 256 colours, or
+        else if 256 colours cover nearly all of it, as for a wordcloud's anti-aliased edges,
+      - strips metadata: PNG text chunks and the like go when it is re-encoded, and JPEG EXIF,
+        XMP and comment segments are cut out without decoding the image,
+      - then points every picture of identical bytes at one image part, so the others are not saved.
+    A re-encoded image is only kept if it is smaller.  Each image part gets a line in the report,
+    with its size before and after and what was done to it.
+
+    Typical usage:
+        report = optimize_media(prs, dpi=200)
+        prs.save(...)
+"""
+import io
+import hashlib
+import logging
+
+logger = logging.getLogger("insights.media")
+
+emu_per_inch = 914400
+flat_coverage = 0.995     # a PNG is flat if its 256 commonest colours cover this share of its pixels
+
+def picture_sizes(package):
+    """Find where each image part of the package is shown
+       Returns {image part: (largest width, largest height) in EMU it is shown at, or None if not known}
+    """
+    from pptx.oxml.ns import qn
+    from pptx.parts.image import ImagePart
+
+    sizes = {}
+    for part in package.iter_parts():
+        element = getattr(part, "_element", None)
+        if element is None:
+            continue
+        for rId, rel in part.rels.items():
+            if rel.is_external or not isinstance(rel.target_part, ImagePart):
+                continue
+            image = rel.target_part
+            for blip in element.iter(qn("a:blip")):
+                if blip.get(qn("r:embed")) != rId:
+                    continue
+                blip_fill = blip.getparent()
+                pic = blip_fill.getparent()
+                ext = pic.find(qn("p:spPr")+"/"+qn("a:xfrm")+"/"+qn("a:ext"))
+                crop = blip_fill.find(qn("a:srcRect"))
+                cropped = crop is not None and any(v not in ("0","") for v in crop.attrib.values())
+                if pic.tag != qn("p:pic") or ext is None or cropped:
+                    sizes[image] = None
+                elif sizes.get(image, (0,0)) is not None:
+                    cx, cy = int(ext.get("cx")), int(ext.get("cy"))
+                    shown = sizes.get(image, (0,0))
+                    sizes[image] = (max(shown[0],cx), max(shown[1],cy))
+            sizes.setdefault(image, None)     # referred to some other way, e.g. from an a:link
+    return sizes
+
+def strip_jpeg_metadata(blob):
+    """Cut the EXIF/XMP (APP1), other application (APP3-APP13, APP15) and comment segments out of a JPEG,
+       keeping JFIF (APP0), the ICC profile (APP2) and Adobe (APP14), which affect how it looks
+       Returns the new JPEG bytes, or blob itself if it can't be parsed
+    """
+    keep = bytearray(blob[:2])
+    pos = 2
+    while pos+4 <= len(blob) and blob[pos] == 0xff:
+        marker = blob[pos+1]
+        if marker == 0xda:                       # start of scan: the image data, to the end
+            keep += blob[pos:]
+            return bytes(keep)
+        length = int.from_bytes(blob[pos+2:pos+4], "big")
+        if not (marker == 0xe1 or 0xe3 <= marker <= 0xed or marker in (0xef, 0xfe)):
+            keep += blob[pos:pos+2+length]
+        pos += 2+length
+    return blob
+
+def palette_png(img):
+    """Convert img, an RGB or RGBA image, to a palette image if it is made of flat colours
+       Returns the palette image, and whether it was an exact conversion, or (None, None) if it isn't flat
+    """
+    import numpy as np
+    from PIL import Image
+
+    if img.getcolors(256) is None:
+        counts = sorted(img.getcolors(img.width*img.height), reverse=True)
+        if sum(n for n,_ in counts[:256]) < flat_coverage*img.width*img.height:
+            return None, None
+        method = Image.Quantize.FASTOCTREE if img.mode == "RGBA" else Image.Quantize.MEDIANCUT
+        return img.quantize(256, method=method, dither=Image.Dither.NONE), False
+
+    # at most 256 colours: number them, so no pixel changes
+    pixels = np.asarray(img).reshape(-1, len(img.mode))
+    colours, index = np.unique(pixels, axis=0, return_inverse=True)
+    palette = Image.fromarray(index.reshape(img.height, img.width).astype(np.uint8), "P")
+    palette.putpalette(colours[:, :3].astype(np.uint8).tobytes())
+    if img.mode == "RGBA":
+        palette.info["transparency"] = colours[:, 3].astype(np.uint8).tobytes()
+    return palette, True
+
+def optimize_image(blob, content_type, size, dpi):
+    """Re-encode one image, shown at size (EMU, or None if not known) at dpi
+       Returns (the new bytes, list of what was done), where the bytes are blob itself if nothing helped
+    """
+    from PIL import Image
+
+    if content_type not in ("image/png", "image/jpeg"):
+        return blob, []
+    done = []
+    best = blob
+    if content_type == "image/jpeg":
+        stripped = strip_jpeg_metadata(blob)
+        if len(stripped) < len(best):
+            best, done = stripped, ["metadata stripped"]
+
+    img = Image.open(io.BytesIO(blob))
+    steps = []
+    if size is not None:
+        width = max(1, round(size[0]*dpi/emu_per_inch))
+        height = max(1, round(size[1]*dpi/emu_per_inch))
+        if width < img.width and height < img.height:
+            steps.append("downscaled %ix%i -> %ix%i" % (img.width, img.height, width, height))
+            if img.mode not in ("RGB", "RGBA", "L", "LA"):
+                img = img.convert("RGBA")
+            img = img.resize((width, height), Image.LANCZOS)
+    if content_type == "image/jpeg" and not steps:
+        return best, done              # re-encoding a JPEG at the same size would only lose quality
+
+    if content_type == "image/png":
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA")
+        if img.mode == "RGBA" and img.getextrema()[3][0] == 255:
+            img = img.convert("RGB")   # fully opaque
+        palette, exact = palette_png(img)
+        if palette is not None:
+            img = palette
+            steps.append("palette" if exact else "palette (approximate)")
+        out = io.BytesIO()
+        img.save(out, format="PNG", optimize=True)
+    else:
+        out = io.BytesIO()
+        img.convert("RGB").save(out, format="JPEG", quality=90, optimize=True)
+    if len(out.getvalue()) < len(best):
+        return out.getvalue(), steps+["re-encoded"]
+    return best, done
+
+def optimize_media(prs, dpi=200):
+    """Shrink the pictures in the Presentation prs, as described above, and log the report
+       Returns the report, a list of (partname, bytes before, bytes after, what was done)
+    """
+    from pptx.parts.image import ImagePart
+
+    package = prs.part.package
+    sizes = picture_sizes(package)
+    # python-pptx has no public way to replace an image part's bytes or a relationship's target, so we set the
+    # private attributes behind them (python-pptx 1.0.2): check they are still what blob and target_part read
+    if not all(getattr(image, "_blob", None) is image.blob for image in sizes):
+        logger.warning("Not optimising media: this python-pptx does not keep an image part's bytes in _blob")
+        return []
+    report = []
+    for image, size in sizes.items():
+        before = len(image.blob)
+        blob, done = optimize_image(image.blob, image.content_type, size, dpi)
+        image._blob = blob
+        report.append([str(image.partname), before, len(blob), done])
+
+    # Point every reference to an image at the first image part with the same bytes
+    image_rels = [rel for part in list(package.iter_parts()) for rel in part.rels.values()
+                  if not rel.is_external and isinstance(rel.target_part, ImagePart)]
+    duplicates = set()
+    if not all(getattr(rel, "_target", None) is rel.target_part for rel in image_rels):
+        logger.warning("Not removing duplicate pictures: this python-pptx does not keep a relationship's target in _target")
+        image_rels = []
+    first_with = {}
+    for rel in image_rels:
+        first = first_with.setdefault(hashlib.sha1(rel.target_part.blob).digest(), rel.target_part)
+        if first is not rel.target_part:
+            duplicates.add(str(rel.target_part.partname))
+            rel._target = first
+    for line in report:
+        if line[0] in duplicates:
+            line[2] = 0
+            line[3].append("duplicate, removed")
+
+    for partname, before, after, done in sorted(report):
+        logger.info("%-28s %9i -> %9i bytes  %s" % (partname, before, after, ", ".join(done) or "unchanged"))
+    total_before = sum(line[1] for line in report)
+    total_after = sum(line[2] for line in report)
+    logger.info("Media optimised from %.0f kB to %.0f kB" % (total_before/1024, total_after/1024))
+    return [tuple(line) for line in report]
@@ -0,0 +1,105 @@
+""" Find the placeholder text in the shapes of a template slide, e.g. "Topic1" or "PA-interest-0", without
+    searching the text of every shape for every placeholder.
+
+    Reading text_frame.text rebuilds the text from the slide XML each time, so the old linear search cost
+    shapes x lookups of those rebuilds.  PlaceholderIndex reads each shape's text once, and maps every word
+    in it to the shapes it appears in.  Shapes whose text may have been rewritten (because they were handed
+    out by find() or replace()) are read again before the next lookup, so the index follows the slide.
+
+    It also reports template problems: words that look like placeholders (a name ending in a number) and
+    appear in more than one shape, and, at the end, those that were never filled in.
+
+    Typical usage:
+        placeholders = PlaceholderIndex(slide_shapes, "5th slide")
+        placeholders.replace("Topic1", kwd0)
+        i = placeholders.find("Customers1")
+        ...
+        placeholders.report_unused()
+"""
+import re
+import logging
+
+logger = logging.getLogger("insights.placeholders")
+
+word = re.compile(r"[\w-]+")
+placeholder_word = re.compile(r"(?<![\w-])[A-Za-z]\w*(?:-[A-Za-z]\w*)*[-_]?\d+(?![\w-])")
+
+class PlaceholderIndex(object):
+    """Index of the words in the text of each shape on one slide
+
+       Parameters
+       ----------
+       slide_shapes : pptx SlideShapes
+         The shapes of the slide, e.g. slide.shapes
+       slidename : str
+         Name of the slide used in messages, e.g. "5th slide"
+    """
+
+    def __init__(self, slide_shapes, slidename):
+        self.slide_shapes = slide_shapes
+        self.slidename = slidename
+        self.texts = {}         # shape index -> text of the shape, when last read
+        self.shapes_of = {}     # word -> shape indexes it appears in, lowest first
+        self.stale = set()      # shapes handed out since they were last read
+        self.used = set()       # words looked up
+        for i, shape in enumerate(slide_shapes):
+            if shape.has_text_frame:
+                self._add(i, shape.text_frame.text)
+        self.template_placeholders = set(w for w,shapes in self.shapes_of.items()
+                                         if placeholder_word.fullmatch(w))
+        for w in sorted(self.template_placeholders):
+            if len(self.shapes_of[w]) > 1:
+                logger.warning("Placeholder %s appears in %i shapes on %s - only the first will be filled in"
+                               % (w, len(self.shapes_of[w]), slidename))
+
+    def _add(self, i, text):
+        self.texts[i] = text
+        for w in set(word.findall(text)):
+            shapes = self.shapes_of.setdefault(w, [])
+            shapes.append(i)
+            shapes.sort()
+
+    def _refresh(self):
+        for i in self.stale:
+            for w in set(word.findall(self.texts[i])):
+                self.shapes_of[w].remove(i)
+                if not self.shapes_of[w]:
+                    del self.shapes_of[w]
+            self._add(i, self.slide_shapes[i].text_frame.text)
+        self.stale.clear()
+
+    def find(self, searchword):
+        """Find the first shape whose text includes searchword, as find_text_in_shapes did.  A whole word is
+           looked up in the index; anything else (e.g. part of a word) is searched for in the text of each shape.
+           The shape may then be written to, so it is read again before the next lookup.
+           Returns the index of the shape in slide_shapes, or -1 if it is not found
+        """
+        self._refresh()
+        self.used.add(searchword)
+        if searchword in self.shapes_of:
+            found_idx = self.shapes_of[searchword][0]
+        else:
+            found_idx = min((i for i,text in self.texts.items() if text.find(searchword)>=0), default=-1)
+        if found_idx >= 0:
+            self.stale.add(found_idx)
+        return found_idx
+
+    def replace(self, find, use):
+        """Replace the text of the shape containing the placeholder find with use
+           Returns the text_frame written, or None if find is not on the slide
+        """
+        i = self.find(find)
+        if i < 0:
+            return None
+        text_frame = self.slide_shapes[i].text_frame
+        text_frame.text = use
+        return text_frame
+
+    def report_unused(self):
+        """Log the placeholders in the template slide that were never looked up, so were left as they were
+           Returns the sorted list of them
+        """
+        unused = sorted(self.template_placeholders-self.used)
+        if unused:
+            logger.info("Placeholders not filled in on %s: %s" % (self.slidename, ", ".join(unused)))
+        return unused
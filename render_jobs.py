@@ -0,0 +1,410 @@
+""" Rendering of the wordcloud and chart images for excel_to_ppt.py, as jobs that can run in a
+    pool of worker processes.
+
+    Each *_png() function here is self-contained: it takes only plain, picklable arguments
+    (Counters, lists, colour strings, and the colour function objects below) and returns the
+    PNG it draws as bytes, without touching the disk.  So a job gives exactly the same image
+    whether it runs in this process or in a worker, and RenderScheduler can run them either way.
+
+    Nothing here uses matplotlib.pyplot.  Charts are drawn on a Figure of their own with an Agg
+    canvas (see new_figure()), and wordclouds are written straight to PNG, so there is no global
+    list of open figures to leak memory over a long run, and jobs can run in threads as well.
+
+    Typical usage:
+        renderer = RenderScheduler(jobs=4)
+        renderer.submit("wordcloud-June.png", wordcloud_png, counts, 2500, 500, 196, font_path, color_func)
+        ...                                            # submit everything else that is ready
+        slide_shapes.add_picture(renderer.image("wordcloud-June.png"), left, top)   # waits for that job
+        renderer.close()
+
+    Wordclouds can also be kept between runs in a RenderCache: last month's clouds for M-1
+    and M-2 are exactly the clouds we need again this month, and the layout is slow.
+"""
+import multiprocessing
+import random
+import os
+import io
+import threading
+import functools
+import hashlib
+import json
+import logging
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+logger = logging.getLogger("insights.render")
+
+class SimpleGroupedColorFunc(object):
+    """Create a color function object which assigns EXACT colors
+       to certain words based on the color to words mapping
+
+       Parameters
+       ----------
+       color_to_words : dict(str -> list(str))
+         A dictionary that maps a color to the list of words.
+
+       default_color : str
+         Color that will be assigned to a word that's not a member
+         of any value from color_to_words.
+    """
+
+    def __init__(self, color_to_words, default_color):
+        self.word_to_color = {word: color
+                              for (color, words) in color_to_words.items()
+                              for word in words}
+
+        self.default_color = default_color
+
+    def __call__(self, word, **kwargs):
+        return self.word_to_color.get(word, self.default_color)
+
+    def cache_key(self):
+        """Returns a JSON-able description of the colours we give, for RenderCache"""
+        return ["SimpleGroupedColorFunc", sorted(self.word_to_color.items()), self.default_color]
+
+class GroupedColorFunc(object):
+    """Create a color function object which assigns DIFFERENT SHADES of
+       specified colors to certain words based on the color to words mapping.
+
+       Uses wordcloud.get_single_color_func
+
+       Parameters
+       ----------
+       color_to_words : dict(str -> list(str))
+         A dictionary that maps a color to the list of words.
+
+       default_color : str
+         Color that will be assigned to a word that's not a member
+         of any value from color_to_words.
+    """
+
+    def __init__(self, color_to_words, default_color):
+        from wordcloud import get_single_color_func
+        self.colours = [[color, sorted(words)] for (color, words) in color_to_words.items()]   # for cache_key()
+        self.default_color = default_color
+        self.color_func_to_words = [
+            (get_single_color_func(color), set(words))
+            for (color, words) in color_to_words.items()]
+
+        self.default_color_func = get_single_color_func(default_color)
+
+    def get_color_func(self, word):
+        """Returns a single_color_func associated with the word"""
+        try:
+            color_func = next(
+                color_func for (color_func, words) in self.color_func_to_words
+                if word in words)
+        except StopIteration:
+            color_func = self.default_color_func
+
+        return color_func
+
+    def __call__(self, word, **kwargs):
+        return self.get_color_func(word)(word, **kwargs)
+
+    def cache_key(self):
+        """Returns a JSON-able description of the colours we give, for RenderCache"""
+        return ["GroupedColorFunc", self.colours, self.default_color]
+
+def hpe_color_fn(word, font_size, position, orientation, random_state=None, colour_list=(), **kwargs):
+    """Returns colour to use for given word, font_size, etc: a random choice from colour_list.
+       The choice comes from the random_state that WordCloud.recolor() passes in, so the same
+       random_state always gives the same colours.  Bind colour_list with functools.partial.
+    """
+    if random_state is None:
+        random_state = random.Random()
+    return random_state.choice(colour_list)
+
+def color_func_key(color_func):
+    """Returns a JSON-able description of a wordcloud colour function, for RenderCache,
+       or None if we can't describe it (so the wordcloud can't be cached)
+    """
+    if hasattr(color_func, "cache_key"):
+        return color_func.cache_key()
+    if isinstance(color_func, functools.partial) and color_func.func is hpe_color_fn:
+        return ["hpe_color_fn", list(color_func.args), sorted(color_func.keywords.items())]
+    return None
+
+font_digests = {}    # (font path, size, mtime) -> SHA-256 of the font file, so we read each font once
+
+def font_digest(font_path):
+    """Returns the SHA-256 hex digest of the font file, or None if there is no such file
+    """
+    try:
+        stat = os.stat(font_path)
+    except OSError:
+        return None
+    key = (font_path, stat.st_size, stat.st_mtime)
+    if key not in font_digests:
+        with open(font_path,'rb') as fhandle:
+            font_digests[key] = hashlib.sha256(fhandle.read()).hexdigest()
+    return font_digests[key]
+
+class RenderCache(object):
+    """A directory of PNGs from earlier runs, each named by a hash of everything that decides its
+       pixels.  Hits have their modification time refreshed, and the least recently used files
+       are deleted whenever the directory grows beyond max_bytes.
+
+       Parameters
+       ----------
+       cache_dir : str
+         Where to keep the PNGs; created if need be.
+
+       max_bytes : int
+         Size the cache is trimmed back to after each new PNG is added.
+    """
+    version = 2    # bump this if the rendering changes, to invalidate existing caches
+
+    def __init__(self, cache_dir, max_bytes=100*2**20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.writable = True     # until a write fails, after which we stop trying
+
+    def key(self, *parts):
+        """Returns the cache key for a PNG made from parts, which must all be JSON-able
+        """
+        text = json.dumps([self.version]+list(parts), sort_keys=True, default=str)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key+".png")
+
+    def fetch(self, key):
+        """Returns the cached PNG for key, as bytes, or None if we don't have it
+        """
+        try:
+            with open(self.path(key),'rb') as fhandle:
+                png = fhandle.read()
+            os.utime(self.path(key))      # mark as recently used
+        except OSError:
+            return None
+        logger.debug("Render cache hit for %s" % key)
+        return png
+
+    def store(self, key, png):
+        """Add png (bytes) to the cache under key, then trim the cache to max_bytes.
+           If the cache can't be written (e.g. on a read-only filesystem) we log it, and don't try again
+        """
+        if not self.writable:
+            return
+        part_file = self.path(key)+".%i-%i.part" % (os.getpid(), threading.get_ident())   # so no-one sees a half-written PNG
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(part_file,'wb') as fhandle:
+                fhandle.write(png)
+            os.replace(part_file, self.path(key))
+        except OSError as err:
+            logger.warning("Could not add to render cache {}, not trying again: {}".format(self.cache_dir,err))
+            self.writable = False
+            return
+        self.trim()
+
+    def trim(self):
+        """Delete the least recently used PNGs until the cache fits in max_bytes
+        """
+        entries = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError as err:
+            logger.warning("Could not list render cache {}: {}".format(self.cache_dir,err))
+            return
+        for name in names:
+            if name.endswith(".png"):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue     # another worker has just removed it
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            logger.debug("Render cache full, removing %s" % name)
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            total -= size
+        return
+
+def wordcloud_png(frequencies, width, height, max_font_size, font_path, color_func, recolor_random_state=None,
+                  cache=None):
+    """Render a wordcloud of frequencies (a Counter of word:count, all counts positive), coloured
+       by color_func, with FastWordCloud (the same image as WordCloud gives, sooner).
+       If cache (a RenderCache) already holds this wordcloud, take it from there instead.
+       Returns the PNG as bytes
+    """
+    ##Build a wordcloud, using the wordcloud code from Andreas Mueller
+    # (to install, run "pip install wordcloud")
+    import wordcloud
+    from fast_wordcloud import FastWordCloud
+
+    key = None
+    colour_key = color_func_key(color_func)
+    if cache is not None and colour_key is not None:
+        # the order of frequencies matters as well as the counts: it breaks ties in the layout
+        key = cache.key("wordcloud", wordcloud.__version__, list(frequencies.items()), width, height,
+                        max_font_size, font_path, font_digest(font_path), colour_key, recolor_random_state)
+        png = cache.fetch(key)
+        if png is not None:
+            return png
+
+    wc = FastWordCloud(font_path=font_path,
+                       width=width,height=height,
+                       prefer_horizontal=1.0,
+                       relative_scaling=0.7,
+                       max_font_size=max_font_size,
+                       background_color="white",
+                       random_state=1
+                       ).generate_from_frequencies(frequencies)
+    wc.recolor(color_func=color_func, random_state=recolor_random_state)
+    buffer = io.BytesIO()
+    wc.to_image().save(buffer, format="png")
+    png = buffer.getvalue()
+    if key is not None:
+        cache.store(key, png)
+    return png
+
+emu_per_inch = 914400
+
+def pixels(emu, dpi):
+    """Returns how many pixels span emu (a length in English Metric Units, as python-pptx uses) at dpi
+    """
+    return max(1, round(emu*dpi/emu_per_inch))
+
+def new_figure(**kwargs):
+    """Figure(**kwargs) on an Agg canvas, without pyplot: nothing but the caller holds on to it, so it is
+       freed once the caller is done with it, and figures in different threads share no state
+       Returns the Figure
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(**kwargs)
+    FigureCanvasAgg(fig)
+    return fig
+
+def save_fitted(fig, width_in, height_in, dpi):
+    """Save fig as a PNG trimmed to what is drawn on it, as bbox_inches="tight" does, at just the
+       resolution needed to show it width_in x height_in inches on the slide at dpi
+       Returns the PNG as bytes
+    """
+    bbox = fig.get_tightbbox(fig.canvas.get_renderer()).padded(0.1)    # 0.1 is savefig's default pad_inches
+    scale = max(width_in/bbox.width, height_in/bbox.height)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches=bbox, dpi=dpi*scale)
+    return buffer.getvalue()
+
+def line_graph_png(vals, months, line_color, width_in, height_in, dpi):
+    """Render the line graph of the three values in vals, labelled at each end with the
+       month (from months) and value as a percentage, sized to be shown width_in x height_in inches at dpi
+       Returns the PNG as bytes
+    """
+    import calendar
+
+    fig = new_figure(figsize=(5.75,3.25))
+    ax = fig.subplots()
+    ax.plot(vals,line_color,linewidth=3)
+    ax.set_axis_off()
+    ax.set_ylim(min(vals)-0.05,max(vals)+0.05)
+    m_minus_2_percent = "{0:.0f}%".format(vals[0] * 100)
+    m_this_percent    = "{0:.0f}%".format(vals[2] * 100)
+    ax.text(0,vals[0]+0.02,calendar.month_abbr[months[0]]+"\n"+m_minus_2_percent,fontsize=30)
+    ax.text(2,vals[2]+0.02,calendar.month_abbr[months[2]]+"\n"+m_this_percent,fontsize=30)
+    return save_fitted(fig, width_in, height_in, dpi)
+
+def donut_png(values, colours, legend, width_in, height_in, dpi):
+    """Render a donut pie of values, in colours, with the legend alongside, sized to be shown
+       width_in x height_in inches at dpi
+       Returns the PNG as bytes
+    """
+    fig = new_figure()
+    ax = fig.subplots()
+    ax.axis('equal')
+    outside, _ = ax.pie(values,startangle=90,counterclock=False,
+                        colors=list(colours))
+    ax.legend(legend,fontsize=24,bbox_to_anchor=(0.8,1.0),frameon=False)
+    width = 0.50  #determines the thickness of donut rim
+    for wedge in outside:
+        wedge.set(width=width, edgecolor='white')
+    return save_fitted(fig, width_in, height_in, dpi)
+
+class RenderScheduler(object):
+    """Runs rendering jobs, each named after the image it makes, and hands back their results on demand
+
+       Parameters
+       ----------
+       jobs : int
+         How many worker processes to render in.  With 1 (the default) each job runs
+         in this process as soon as it is submitted, exactly as the code used to.
+         Workers are spawned, so each imports the main script: it must do its work
+         under if __name__ == "__main__".
+
+       dump_dir : str
+         If given, every image is also written to a file of its name in this directory, for debugging.
+
+       threads : bool
+         If True, the jobs run in that many threads of this process rather than in worker processes.
+         There is no start-up cost, and the caches of fonts and wordcloud layouts are shared by all the jobs.
+    """
+
+    def __init__(self, jobs=1, dump_dir=None, threads=False):
+        self.jobs = max(1, jobs)
+        self.dump_dir = dump_dir
+        self.threads = threads
+        self.pool = None
+        self.futures = {}    # job name -> Future
+
+    def submit(self, name, fn, *args, **kwargs):
+        """Start job fn(*args, **kwargs), which must be a function of this module (so that a worker can import it)
+           Returns the name, for passing to result() or image() later
+        """
+        if self.jobs == 1:
+            future = Future()
+            future.set_result(fn(*args, **kwargs))
+        elif self.threads:
+            if self.pool is None:
+                logger.debug("Starting %i render threads" % self.jobs)
+                self.pool = ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix="render")
+            future = self.pool.submit(fn, *args, **kwargs)
+        else:
+            if self.pool is None:
+                logger.debug("Starting %i render workers" % self.jobs)
+                self.pool = ProcessPoolExecutor(max_workers=self.jobs,
+                                                mp_context=multiprocessing.get_context("spawn"))
+            future = self.pool.submit(fn, *args, **kwargs)
+        if self.dump_dir is not None:
+            future.add_done_callback(functools.partial(self.dump, name))
+        self.futures[name] = future
+        return name
+
+    def dump(self, name, future):
+        """Write the PNG from the finished job 'name' to dump_dir
+        """
+        if future.exception() is None:
+            try:
+                os.makedirs(self.dump_dir, exist_ok=True)
+                with open(os.path.join(self.dump_dir, name),'wb') as fhandle:
+                    fhandle.write(future.result())
+            except OSError as err:
+                logger.warning("Could not write {} to {}: {}".format(name,self.dump_dir,err))
+        return
+
+    def result(self, name):
+        """Wait for the named job to finish
+           Returns its result (for the *_png() jobs, the PNG as bytes)
+        """
+        return self.futures[name].result()
+
+    def image(self, name):
+        """Wait for the named *_png() job to finish
+           Returns its PNG as a file-like object, as add_picture() takes
+        """
+        return io.BytesIO(self.result(name))
+
+    def close(self):
+        """Wait for any jobs still running, and stop the workers
+        """
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        return
@@ -0,0 +1,115 @@
+""" Mean sentiment, and the number of comments it is the mean of, by month, centre, industry and keyword.
+
+    sentiment_by_month() gives one average per month.  Giving one per keyword per centre, or per keyword
+    per industry, the obvious way would mean filtering the frame again for every combination.  SentimentCube
+    instead starts from each row's compound score (the "sentiment" column from SentimentScores.score_frame())
+    and the keywords found in that row (the KeywordIncidence matrix).  It gives every commented row a cell
+    number for its (month, centre, industry), then adds each row's score into the cell of each keyword it
+    mentions with one np.bincount.  That one grouped reduction fills sums and counts arrays of shape
+    (months, centres, industries, keywords).  Any slice or total of the cube, such as a keyword in one centre
+    across all months and industries, is then a sum over those arrays.  A comment mentioning several
+    keywords counts towards each of them.
+
+    Typical usage:
+        hits = kwd_incidence.rows_by_keyword(df_6months, ["wtlma","actions"])
+        cube = SentimentCube(df_6months, hits, kwd_incidence.keywords, months, centres)
+        mean, count = cube.total(centre="PA", keyword="synergy")
+        means, counts = cube.table("keyword", "centre")         # keywords x centres, over all months and industries
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from insights_data import month_start, add_months
+
+logger = logging.getLogger("insights.sentiment")
+
+axes = ("month", "centre", "industry", "keyword")
+no_industry = "Unknown"      # industry of rows that have none
+
+class SentimentCube(object):
+    """Sums and counts of compound sentiment over (month, centre, industry, keyword)
+
+       Parameters
+       ----------
+       df : DataFrame
+         The rows to use, with the 'sentiment' column from SentimentScores.score_frame() (NaN where there is
+         no comment), and 'date', 'Ctr' and 'Industry' columns.
+       hits : array
+         The (rows of df x keywords) boolean matrix of the keywords in each row, e.g. from
+         KeywordIncidence.rows_by_keyword().
+       keywords : list(str)
+         The keywords of the columns of hits.
+       months : list((int, int))
+         The (year, month) of each month to use, in order, e.g. the last six.  Rows in other months are left out.
+       centres : list(str)
+         The centres to use.  Rows of other centres are left out.
+    """
+
+    def __init__(self, df, hits, keywords, months, centres):
+        self.labels = {"month": list(months), "centre": list(centres), "keyword": list(keywords)}
+        industry_codes, industries = pd.factorize(df["Industry"].fillna(no_industry), sort=True)
+        self.labels["industry"] = list(industries)
+        self.shape = tuple(len(self.labels[axis]) for axis in axes)
+
+        # Each row's month, centre and industry cell, or -1 if it is left out
+        edges = np.array([month_start(*m) for m in months] + [month_start(*add_months(*months[-1], 1))],
+                         dtype="datetime64[ns]") if months else np.zeros(0, dtype="datetime64[ns]")
+        month_codes = np.searchsorted(edges, df["date"].to_numpy(dtype="datetime64[ns]"), side="right") - 1
+        month_codes[month_codes >= len(months)] = -1
+        centre_codes = pd.Index(list(centres)).get_indexer(df["Ctr"]).astype(np.int64)   # -1 for other centres
+        scores = df["sentiment"].to_numpy(dtype=float)
+        used = (month_codes >= 0) & (centre_codes >= 0) & ~np.isnan(scores)
+        cells = (month_codes*self.shape[1] + centre_codes)*self.shape[2] + industry_codes
+
+        # One grouped reduction: every (row, keyword) hit of a used row, added into its cell's keyword
+        rows, kwds = np.nonzero(np.asarray(hits, dtype=bool) & used[:, None])
+        flat = cells[rows]*self.shape[3] + kwds
+        size = int(np.prod(self.shape))
+        self.sums = np.bincount(flat, weights=scores[rows], minlength=size).reshape(self.shape)
+        self.counts = np.bincount(flat, minlength=size).reshape(self.shape)
+        logger.debug("Sentiment cube of %i keyword mentions in %i scored rows, %r cells"
+                     % (len(rows), used.sum(), self.shape))
+
+    def _selection(self, **where):
+        # The index into the cube for the labels given for some axes (all of an axis if None)
+        index = []
+        for axis in axes:
+            label = where.pop(axis, None)
+            if label is None:
+                index.append(slice(None))
+            elif label in self.labels[axis]:
+                position = self.labels[axis].index(label)
+                index.append(slice(position, position+1))
+            else:
+                index.append(slice(0, 0))     # not in the cube: nothing
+        if where:
+            raise TypeError("Unknown sentiment cube axes: %s" % ", ".join(where))
+        return tuple(index)
+
+    def total(self, month=None, centre=None, industry=None, keyword=None):
+        """The mean sentiment of the comments in the given month (as (year, month)), centre, industry and
+           mentioning keyword, each over all of them if None
+           Returns (mean, number of comments), with the mean NaN if there are none
+        """
+        index = self._selection(month=month, centre=centre, industry=industry, keyword=keyword)
+        count = int(self.counts[index].sum())
+        return (float(self.sums[index].sum())/count if count else float("nan")), count
+
+    def table(self, rows, columns, **where):
+        """The mean sentiment by rows and columns (two of axes), over the whole of the other two axes or
+           the labels given for them in where, e.g. table("keyword", "centre", industry="Healthcare")
+           Returns (means, counts): DataFrames labelled by the rows and columns axes, means NaN where counts are 0
+        """
+        if rows == columns or where.get(rows) is not None or where.get(columns) is not None:
+            raise ValueError("A sentiment cube table needs two different axes, with no labels given for them")
+        index = self._selection(**where)
+        others = tuple(n for n, axis in enumerate(axes) if axis not in (rows, columns))
+        sums, counts = self.sums[index].sum(axis=others), self.counts[index].sum(axis=others)
+        if axes.index(rows) > axes.index(columns):
+            sums, counts = sums.T, counts.T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(counts > 0, sums/counts, np.nan)
+        return (pd.DataFrame(means, index=self.labels[rows], columns=self.labels[columns]),
+                pd.DataFrame(counts, index=self.labels[rows], columns=self.labels[columns]))
@@ -0,0 +1,253 @@
+""" A store of the VADER sentiment scores of comments, kept between runs.
+
+    Scoring a comment with SentimentIntensityAnalyzer.polarity_scores() takes a millisecond or so, and
+    every run scored every 'Customer Overall Comments' cell of the last six months again, although
+    comments never change once they are in the workbook.  SentimentScores answers polarity_scores()
+    from an SQLite file of the scores of every comment it has seen, keyed by the SHA-256 of the comment
+    text and the scorer (the vaderSentiment version), so a comment is scored once, whichever run or
+    script first asks for it.  The analyzer itself, which takes a while to load its lexicon, is only
+    made if there is a comment that has not been scored before.
+
+    It also counts its hits and misses, and (as the time each score took is stored with it) the time
+    the hits saved, for report().
+
+    score_frame() scores a whole column of comments at once, giving a column of each score for every
+    row, for all the sentiment figures to share.  New comments are scored in chunks, across a pool of
+    worker processes if there are enough of them to be worth starting one.  top_n() then picks the
+    best or worst few comments from a column of scores with a bounded heap.
+
+    Typical usage:
+        sentiment = SentimentScores("tmp/sentiment_scores.sqlite")
+        compound = sentiment.polarity_scores(comment)['compound']
+        scores = sentiment.scores(comments)      # many at once: one query, one write
+        df = df.join(sentiment.score_frame(df["Customer Overall Comments"], jobs=4))
+        best = top_n(df["Customer Overall Comments"], df["sentiment"], 4)
+        sentiment.report()
+"""
+import hashlib
+import heapq
+import logging
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger("insights.sentiment")
+
+score_names = ('neg', 'neu', 'pos', 'compound')
+score_columns = {'neg': 'sentiment_neg', 'neu': 'sentiment_neu', 'pos': 'sentiment_pos', 'compound': 'sentiment'}
+query_size = 500      # comments looked up per query, well inside SQLite's limit on parameters
+chunk_size = 1000     # new comments scored per job in a pool of worker processes
+pool_min = 20000      # fewer new comments than this are scored faster here than it takes to start a pool
+
+def vader_scorer():
+    """Returns the name of the scorer for VADER, which changes with its version
+    """
+    try:
+        from importlib.metadata import version
+        return "vader "+version("vaderSentiment")
+    except Exception:
+        return "vader"
+
+def text_digest(text):
+    return hashlib.sha256(text.encode('utf-8')).digest()
+
+vader_analyzer = None     # this process's SentimentIntensityAnalyzer, made when first needed
+
+def score_chunk(texts, analyzer=None):
+    """Score each of texts with analyzer (VADER if None), here or in a worker process.  An analyzer with a
+       polarity_scores_batch(texts) method scores them all at once, and each is taken to have taken an equal share
+       Returns a list of (neg, neu, pos, compound, seconds it took) for each of texts
+    """
+    global vader_analyzer
+    if analyzer is None:
+        if vader_analyzer is None:
+            from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+            vader_analyzer = SentimentIntensityAnalyzer()
+        analyzer = vader_analyzer
+    if hasattr(analyzer, "polarity_scores_batch"):
+        start = time.perf_counter()
+        batch = analyzer.polarity_scores_batch(texts)
+        secs = (time.perf_counter()-start)/max(1, len(texts))
+        return [tuple(scores[name] for name in score_names)+(secs,) for scores in batch]
+    rows = []
+    for text in texts:
+        start = time.perf_counter()
+        scores = analyzer.polarity_scores(text)
+        rows.append(tuple(scores[name] for name in score_names)+(time.perf_counter()-start,))
+    return rows
+
+def top_n(comments, scores, n, largest=True):
+    """The n comments with the highest scores (or, if not largest, the lowest), picked with a heap of n rather
+       than by sorting them all.  comments and scores are matching sequences, e.g. columns of the same frame;
+       a comment that is not a string, or whose score is NaN, is left out, as are repeats of a comment.
+       Of comments with equal scores, the first is picked.
+       Returns a list of (comment, score), best (or worst) first
+    """
+    seen = set()
+    def candidates():
+        for comment, score in zip(comments, scores):
+            if isinstance(comment, str) and score == score and comment not in seen:
+                seen.add(comment)
+                yield comment, score
+    pick = heapq.nlargest if largest else heapq.nsmallest
+    return pick(n, candidates(), key=lambda item: item[1])
+
+class SentimentScores(object):
+    """The sentiment scores of comments, each worked out once and kept in an SQLite file
+
+       Parameters
+       ----------
+       path : str
+         The SQLite file of scores, created if need be.  If None, scores are kept only while this object lives.
+       analyzer : object
+         What to score new comments with: anything with a polarity_scores(text) method returning the
+         scores in score_names (and, to score in worker processes, that can be pickled), and perhaps a
+         polarity_scores_batch(texts) method too, e.g. vector_sentiment.VectorSentimentAnalyzer.
+         Default is VADER's SentimentIntensityAnalyzer, made when first needed.
+       scorer : str
+         Name of the analyzer, kept with each score, so scores from another analyzer (or version of it)
+         are never used.  Default is the analyzer's scorer attribute if it has one, else vader_scorer().
+    """
+
+    def __init__(self, path=None, analyzer=None, scorer=None):
+        self.path = path
+        self.analyzer = analyzer
+        self.scorer = scorer or getattr(analyzer, "scorer", None) or vader_scorer()
+        self.known = {}        # digest -> (scores dict, seconds it took to score), for everything seen so far
+        self.fresh = set()     # digests scored, but not yet asked for since (their first batch counts them as misses)
+        self.new = []          # rows scored since the last write
+        self.hits = self.misses = 0
+        self.saved_secs = self.scoring_secs = 0.0
+        self.db = None
+        if path is not None:
+            try:
+                if os.path.dirname(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                self.db = sqlite3.connect(path, timeout=30)
+                self.db.execute("CREATE TABLE IF NOT EXISTS scores (scorer TEXT, digest BLOB, neg REAL, neu REAL,"
+                                " pos REAL, compound REAL, secs REAL, PRIMARY KEY (scorer, digest))")
+            except (OSError, sqlite3.Error) as err:
+                # e.g. on a read-only filesystem: the scores are kept only while this object lives
+                logger.warning("Could not open sentiment score store {}: {}".format(path,err))
+                if self.db is not None:
+                    self.db.close()
+                self.db = None
+
+    def _lookup(self, digests):
+        # Read the scores of any of digests we haven't seen yet from the file, into self.known
+        wanted = list(set(d for d in digests if d not in self.known))
+        if self.db is None:
+            return
+        for i in range(0, len(wanted), query_size):
+            chunk = wanted[i:i+query_size]
+            try:
+                rows = self.db.execute("SELECT digest, neg, neu, pos, compound, secs FROM scores WHERE scorer=?"
+                                       " AND digest IN (%s)" % ",".join("?"*len(chunk)), [self.scorer]+chunk)
+                for digest, *values, secs in rows:
+                    self.known[digest] = (dict(zip(score_names, values)), secs)
+            except sqlite3.Error as err:
+                logger.warning("Could not read sentiment score store {}: {}".format(self.path,err))
+                return
+
+    def _score_new(self, digests, texts, jobs):
+        # Score those of texts not known yet, once each: in chunks across a pool of jobs worker processes if there
+        # are at least pool_min of them, else here
+        new = {}
+        for digest, text in zip(digests, texts):
+            if digest not in self.known:
+                new.setdefault(digest, text)
+        if not new:
+            return
+        new_texts = list(new.values())
+        chunks = [new_texts[i:i+chunk_size] for i in range(0, len(new_texts), chunk_size)]
+        if jobs > 1 and len(new_texts) >= pool_min:
+            logger.debug("Scoring %i new comments in %i worker processes" % (len(new_texts), jobs))
+            with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("spawn")) as pool:
+                chunk_rows = list(pool.map(score_chunk, chunks, [self.analyzer]*len(chunks)))
+        else:
+            chunk_rows = [score_chunk(chunk, self.analyzer) for chunk in chunks]
+        for digest, row in zip(new, (row for rows in chunk_rows for row in rows)):
+            self.known[digest] = (dict(zip(score_names, row[:-1])), row[-1])
+            self.new.append((self.scorer, digest)+row)
+            self.scoring_secs += row[-1]
+        self.fresh.update(new)
+
+    def scores(self, texts, jobs=1):
+        """The scores of each of texts (strings), as polarity_scores() would give them, looking them all up at once
+           and writing any new ones to the file.  With jobs > 1, many new comments are scored in that many processes.
+           Returns a list of dicts of score_names -> score, in the order of texts
+        """
+        results = self._scores(texts, jobs)
+        self.flush()
+        return results
+
+    def _scores(self, texts, jobs=1):
+        digests = [text_digest(text) for text in texts]
+        self._lookup(digests)
+        self._score_new(digests, texts, jobs)
+        # A new comment is a miss every time this batch asks for it, repeats included, as none came from the store
+        fresh = self.fresh.intersection(digests)
+        results = []
+        for digest in digests:
+            scores, secs = self.known[digest]
+            if digest in fresh:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.saved_secs += secs
+            results.append(dict(scores))
+        self.fresh -= fresh
+        return results
+
+    def score_frame(self, comments, jobs=1):
+        """Score a column of comments, e.g. df["Customer Overall Comments"], as scores() does
+           Returns a DataFrame with the same index, of the score_columns for each row, which are NaN where
+           the cell is not a string
+        """
+        import pandas as pd
+
+        is_text = comments.map(lambda cell: isinstance(cell, str)).astype(bool)
+        texts = comments[is_text]
+        frame = pd.DataFrame(float("nan"), index=comments.index, columns=[score_columns[name] for name in score_names])
+        scored = self.scores(list(texts), jobs)
+        if scored:
+            frame.loc[is_text] = [[scores[name] for name in score_names] for scores in scored]
+        return frame
+
+    def polarity_scores(self, text):
+        """SentimentIntensityAnalyzer.polarity_scores(text), from the store if text has been scored before.
+           A new score is written to the file at the next flush(), scores() or close()
+           Returns a dict of score_names -> score
+        """
+        return self._scores([text])[0]
+
+    def flush(self):
+        """Write the scores worked out since the last flush to the file
+        """
+        if self.db is None or not self.new:
+            self.new = []
+            return
+        try:
+            with self.db:
+                self.db.executemany("INSERT OR REPLACE INTO scores VALUES (?,?,?,?,?,?,?)", self.new)
+        except sqlite3.Error as err:
+            logger.warning("Could not write to sentiment score store {}: {}".format(self.path,err))
+        self.new = []
+
+    def report(self):
+        """Log how many scores came from the store, and the time that saved
+           Returns (hits, misses, seconds saved)
+        """
+        asked = self.hits+self.misses
+        if asked:
+            logger.info("Sentiment scores: %i of %i from the store (%.0f%%), saving %.2fs; %i new, scored in %.2fs"
+                        % (self.hits, asked, 100*self.hits/asked, self.saved_secs, self.misses, self.scoring_secs))
+        return self.hits, self.misses, self.saved_secs
+
+    def close(self):
+        self.flush()
+        if self.db is not None:
+            self.db.close()
+            self.db = None
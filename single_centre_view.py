@@ -1,6 +1,5 @@
 import pandas as pd
 from datetime import datetime, date
-import matplotlib.pyplot as plt
 import collections
 from collections import Counter
 import calendar
@@ -8,10 +7,18 @@ from pptx.dml.color import RGBColor
 from pptx.enum.dml import MSO_THEME_COLOR
 from pptx.util import Pt
 import os
+import io
 import sys
 import logging
 import re
 import sys, getopt
+from keyword_matcher import KeywordMatcher, KeywordIncidence
+from synonym_normalizer import SynonymNormalizer
+from insights_data import read_insights, month_start, DateIndex
+from placeholder_index import PlaceholderIndex
+from icon_registry import IconRegistry
+from deck_template import open_template, save_deck
+from render_jobs import new_figure
 
 logger = logging.getLogger(__name__)
 ##logger.setLevel(logging.WARNING)
@@ -23,6 +30,7 @@ logger.addHandler(console)
 
 tmpdir = "tmp/"
 icondir = "icons/"
+font_path = os.path.join("fonts","Arial","arial.ttf")    # the font of the wordclouds, bundled so every machine draws the same clouds
 excel_file='Insights.xlsx'
 stop_after_wordcheck = False
 yyyy,mm=date.today().year,date.today().month
@@ -70,6 +78,7 @@ if __name__=="__main__":
             assert False, "unhandled option"
 
 
+logging.getLogger("insights").setLevel(logger.level)   # messages from the shared insights_* modules
 logger.info('Starting run for %i-%i for %s...' % (yyyy,mm,which_ctr))
 
 # Read in the ini file
@@ -104,6 +113,9 @@ vocab=[]
 for i in dict_colour_of_keywords.values():
     for j in i:
         vocab.append(j)
+kwd_matcher = KeywordMatcher(vocab)   # finds every keyword in a cell in one pass
+icons = IconRegistry(icondir)         # every icon read once, by keyword
+icons.report_missing(vocab)
 
 # load the list of synonyms (or mis-spellings) of the keywords
 synonym_list={}
@@ -111,6 +123,7 @@ for i in cfg.items('synonyms'):
     lst=json.loads(i[1])
     for j in lst:
         synonym_list[j]=i[0]
+synonym_normalizer = SynonymNormalizer(synonym_list)   # compiled once, replaces whole words only
 
 JapanAndChinaToOther=True
 industry_list=[]   # list of the industry code values
@@ -138,34 +151,11 @@ stop_words+=vocab
 
 
 
-def make_date(cell_val):
-    """Used to create a better-structured date value from the sometimes-odd values in the date column
-       Returns a datetime
-    """
-    if type(cell_val) is datetime:
-        v=cell_val.date()
-    elif type(cell_val) is str:
-        try:
-            v=datetime.strptime(cell_val,"%b %d, %Y").date()
-        except ValueError:
-            v=date.fromordinal(1)
-    else:
-        v=date.fromordinal(2)
-    return v
-
 def tidy_text(cell_val):
-    """Standardises the text in a cell:
+    """Standardises the text in a cell: removes lots of punctuation, and replaces synonyms by their root word
        Returns the tidied text
     """
-    if type(cell_val) is str:
-        cell = cell_val.lower()
-        cell=re.sub('[\n&@,.:-]',' ',cell)
-        cell=" ".join(cell.split())   # idiom to turn multiple spaces between words into single spaces
-        for k,v in synonym_list.items():
-            cell=cell.replace(k,v)
-    else:
-        cell=""
-    return cell
+    return synonym_normalizer.tidy_text(cell_val)
 
 def replace_strings(series,repl_dict):
     for k,v in repl_dict.items():
@@ -196,7 +186,8 @@ def keyword_counts_in_series(series,keywords):
     return count_list
 
 def dataframe_for_month(df, year=2018, month=1):
-    """Yields a subset the dataframe with only those rows in the given month
+    """Yields a subset the dataframe with only those rows in the given month.  df is a dataframe with a 'date'
+       column, or the whole spreadsheet's DateIndex, which finds the month's rows by binary search
        Returns a dataframe
     """
     mm=month
@@ -205,13 +196,17 @@ def dataframe_for_month(df, year=2018, month=1):
     else: mm2,yyyy2=mm+1,yyyy
 
     logger.debug("Selecting rows for %i-%i" % (yyyy,mm))
-    month_df = df.loc[ (df.date>=date(yyyy,mm,1)) & (df.date<date(yyyy2,mm2,1)) ]
+    if isinstance(df, DateIndex):
+        month_df = df.month(yyyy,mm)
+    else:
+        month_df = df.loc[ (df.date>=month_start(yyyy,mm)) & (df.date<month_start(yyyy2,mm2)) ]
     logger.debug("Found %i rows for this month" % len(month_df.index))
 
     return month_df
 
 def dataframe_for_6months(df, year=2018, month=1):
-    """Yields a subset the dataframe with those rows for last 6 months up to given month
+    """Yields a subset the dataframe with those rows for last 6 months up to given month.  df is a dataframe
+       with a 'date' column, or the whole spreadsheet's DateIndex, which finds the rows by binary search
        Returns a dataframe
     """
     mm=month
@@ -224,7 +219,10 @@ def dataframe_for_6months(df, year=2018, month=1):
     else: mm_start,yyyy_start=mm-5,yyyy
 
     logger.debug("Selecting rows for %i-%i to %i-%i" % (yyyy_start,mm_start,yyyy,mm))
-    month_df = df.loc[ (df.date>=date(yyyy_start,mm_start,1)) & (df.date<date(yyyy_end,mm_end,1)) ]
+    if isinstance(df, DateIndex):
+        month_df = df.months(yyyy,mm,count=6)
+    else:
+        month_df = df.loc[ (df.date>=month_start(yyyy_start,mm_start)) & (df.date<month_start(yyyy_end,mm_end)) ]
     logger.debug("Found %i rows for this month" % len(month_df.index))
 
     return month_df
@@ -235,21 +233,15 @@ def found_word_list(df, kwd):
        and False otherwise.  Can be used to subset the original dataframe to pick out the rows with the keyword in them:
            df[found_word_list(df,"foo")]   => subset of df with "foo" in one of the columns
     """
-    strings_wtlma = replace_strings(df.wtlma, synonym_list)
-    strings_ai = replace_strings(df.ai, synonym_list)
-    found_list = bool_list_of_occurrences(strings_wtlma,kwd) | bool_list_of_occurrences(strings_ai,kwd)
-    return found_list
+    return kwd_incidence.rows_with_keyword(df, ["wtlma","ai"], kwd)
 
 def keywords_in_dataframe(df,keyword_list):
     """ Count each keyword in the dataframe's important columns
         Returns a Counter collection of (keyword:count)
     """
-    import operator   #for sorted(), used in sorting items into OrderedDict
-    counter_words_to_freq = Counter()
-    for w in keyword_list:
-         counter_words_to_freq[w] += sum(found_word_list(df,w))
-
-    return counter_words_to_freq
+    if not kwd_incidence.has_keywords(keyword_list):
+        return KeywordMatcher(keyword_list).keyword_counts([df.wtlma, df.ai])
+    return kwd_incidence.keyword_counts(df, ["wtlma","ai"])
 
 def count_rows_with_comments(df):
     """ Count the number of rows in dataframe with a comment in either <Want to Learn More About> or <Action Items>
@@ -335,9 +327,7 @@ def file_wordcloud_for_month(keywords_for_month, useful_rows_for_month, year=201
     """
     ##Build a wordcloud, using the wordcloud code from Andreas Mueller
     # (to install, run "pip install wordcloud"
-    from wordcloud import WordCloud
-    import matplotlib.pyplot as plt
-    import os
+    from fast_wordcloud import FastWordCloud
 
     # set font so 30% occurrence of top word uses 196 point font
     percent = round(100*(keywords_for_month.most_common(1)[0][1]/useful_rows_for_month))
@@ -349,17 +339,16 @@ def file_wordcloud_for_month(keywords_for_month, useful_rows_for_month, year=201
                                                 keywords_for_month.most_common(1)[0][1],
                                                         useful_rows_for_month))
 
-    font_path = os.path.join("C:",os.sep,"Windows",os.sep,"Fonts",os.sep,'arial.ttf')
     logger.debug("Generating the wordcloud")
     keywords_for_month += Counter()    # remove any zero or negative counts from the list
-    wc_for_month = WordCloud(font_path=font_path,
-                             width=2500,height=500,
-                             prefer_horizontal=1.0,
-                             relative_scaling=0.7,
-                             max_font_size=font_for_biggest_word,
-                             background_color="white",
-                             random_state=1
-                             ).generate_from_frequencies(keywords_for_month)
+    wc_for_month = FastWordCloud(font_path=font_path,
+                                 width=2500,height=500,
+                                 prefer_horizontal=1.0,
+                                 relative_scaling=0.7,
+                                 max_font_size=font_for_biggest_word,
+                                 background_color="white",
+                                 random_state=1
+                                 ).generate_from_frequencies(keywords_for_month)
 
 
     # Words that are not in any of the dict_colour_of_keywords values
@@ -371,26 +360,20 @@ def file_wordcloud_for_month(keywords_for_month, useful_rows_for_month, year=201
     grouped_color_func = SimpleGroupedColorFunc(dict_colour_of_keywords, default_color)
     wc_for_month.recolor(color_func=grouped_color_func)
 
-    # Build the generated image
-    plt.imshow(wc_for_month,interpolation='bilinear')
-    plt.axis("off")
-    plt.figure()
-    #plt.show()
-
+    # Write the generated image
     filename = tmpdir+"wordcloud-"+calendar.month_name[month]+".png"
-    plt.imsave(filename,wc_for_month,format="png")
-    plt.close()
+    wc_for_month.to_image().save(filename,format="png")
 
     return filename
 
 
 def file_graph_for_month_kwd(kwd,kwd_pos,vals,months,line_color):
-    fig,ax=plt.subplots(figsize=(5.75,3.25))
-    ##############ax.clear()
+    fig = new_figure(figsize=(5.75,3.25))
+    ax = fig.subplots()
 
     ax.plot(vals,line_color,linewidth=3)
     ax.set_axis_off()
-    plt.ylim(min(vals)-0.05,max(vals)+0.05)
+    ax.set_ylim(min(vals)-0.05,max(vals)+0.05)
     m_minus_2_percent = "{0:.0f}%".format(vals[0] * 100)
     m_this_percent    = "{0:.0f}%".format(vals[2] * 100)
     ax.text(0,vals[0]+0.02,calendar.month_abbr[months[0]]+"\n"+m_minus_2_percent,fontsize=30)
@@ -398,25 +381,24 @@ def file_graph_for_month_kwd(kwd,kwd_pos,vals,months,line_color):
     filename = tmpdir+"graph-"+str(kwd_pos)+".png"
     logger.debug("Saving %s graph for keyword %s in file %s" % (kwd_pos,kwd,filename))
     fig.savefig(filename,bbox_inches="tight")
-    plt.close(fig)
 
     return filename
 
 def file_donut_pie_for_month(values,name):
-    fig, ax = plt.subplots()
+    fig = new_figure()
+    ax = fig.subplots()
     ax.axis('equal')
     outside, _ = ax.pie(values,startangle=90,counterclock=False,
                         colors=list(colour_list))
     ax.legend(("Palo Alto","Houston","NY","London","Singapore"),fontsize=24,bbox_to_anchor=(0.8,1.0),frameon=False)
     width = 0.50  #determines the thickness of donut rim
-    plt.setp( outside, width=width, edgecolor='white')
+    for wedge in outside:
+        wedge.set(width=width, edgecolor='white')
 
     filename = tmpdir+"donut-"+re.sub(r"[& ]","_",str(name))+".png"
     logger.debug("Saving <%s> donut in file %s with values %r" % (name, filename, values))
     fig.savefig(filename,bbox_inches="tight")
 
-    plt.close(fig)
-
     return filename
 
 def file_donut_pie_for_industries(industries,center=""):
@@ -429,7 +411,8 @@ def file_donut_pie_for_industries(industries,center=""):
         industries.Other += industries.China
         del industries['China']
 
-    fig, ax = plt.subplots()
+    fig = new_figure()
+    ax = fig.subplots()
     ax.axis('equal')
     width = 2.0
     outside, _ = ax.pie(industries.values,
@@ -437,14 +420,13 @@ def file_donut_pie_for_industries(industries,center=""):
                         colors=list(colour_list),
                         radius=5.0)
     ax.legend(industries.index.tolist(),ncol=3,fontsize=24,loc=10,bbox_to_anchor=(0.5,-2),frameon=False)
-    plt.setp( outside, width=width, edgecolor='white')
+    for wedge in outside:
+        wedge.set(width=width, edgecolor='white')
 
     filename = tmpdir+"donut-industries"+center+".png"
     logger.debug("Saving Industries donut in file %s with values %r" % (filename, industries))
     fig.savefig(filename,bbox_inches="tight")
 
-    plt.close(fig)
-
     return filename
 
 def write_customer_list(df_for_kwd,text_frame):
@@ -496,29 +478,12 @@ def write_top_keywords(text_frame,titleText,kwd_counts_for_ind,rowcount,percent=
 
     return
 
-def find_text_in_shapes(slide_shapes,searchword):
-    """Find the given text in the list of powerpoint shapes passed in slide_shapes
-    """
-    found_idx = -1
-    for i in range(len(slide_shapes)):
-        if (slide_shapes[i].has_text_frame):
-            text_frame = slide_shapes[i].text_frame
-            if (text_frame.text.find(searchword)>=0):
-                found_idx = i
-                break
-
-    return found_idx
-
-def replace_text_in_shape(slide_shapes,find,use,slidename):
-    """Find the placeholder text "find" in the slide_shapes, replace it with "use",
-       reporting an error on "slidename" if we can't find "find"
+def replace_text_in_shape(placeholders,find,use):
+    """Find the placeholder text "find" in the slide indexed by placeholders, replace it with "use",
+       reporting an error if we can't find "find"
     """
-    i = find_text_in_shapes(slide_shapes,find)
-    if (i>=0):
-        text_frame = slide_shapes[i].text_frame
-        text_frame.text = use
-    else:
-        logger.error("Could not find %s placeholder on %s" % (find,slidename))
+    if placeholders.replace(find,use) is None:
+        logger.error("Could not find %s placeholder on %s" % (find,placeholders.slidename))
 
     return
 
@@ -531,67 +496,33 @@ def new_run_in_slide(para,text='text',fontname='Arial',fontsize=24):
     font.name = fontname
     return run
 
-import struct
-import imghdr
-
-def get_image_size(fname):
-    '''Determine the image type of fname and return its width, height.
-    from draco (via stackoverflow)'''
-    with open(fname, 'rb') as fhandle:
-        head = fhandle.read(24)
-        if len(head) != 24:
-            return
-        if imghdr.what(fname) == 'png':
-            check = struct.unpack('>i', head[4:8])[0]
-            if check != 0x0d0a1a0a:
-                return
-            width, height = struct.unpack('>ii', head[16:24])
-        elif imghdr.what(fname) == 'gif':
-            width, height = struct.unpack('<HH', head[6:10])
-        elif imghdr.what(fname) == 'jpeg':
-            try:
-                fhandle.seek(0) # Read 0xff next
-                size = 2
-                ftype = 0
-                while not 0xc0 <= ftype <= 0xcf:
-                    fhandle.seek(size, 1)
-                    byte = fhandle.read(1)
-                    while ord(byte) == 0xff:
-                        byte = fhandle.read(1)
-                    ftype = ord(byte)
-                    size = struct.unpack('>H', fhandle.read(2))[0] - 2
-                # We are at a SOFn block
-                fhandle.seek(1, 1)  # Skip `precision' byte.
-                height, width = struct.unpack('>HH', fhandle.read(4))
-            except Exception: #IGNORE:W0703
-                return
-        else:
-            return
-        return width, height
-
 def add_icon(ss,icon_name,left,top,small=False):
+    """Add the icon for keyword icon_name, from the icon registry, to the slide shape ss at coordinates left,top
+       If small is True, make it a smaller icon.
+    """
     ## ok if icon exists, and use error icon if not
-    logger.debug("adding icon {}".format(icon_name))
-    try:
-        filename = icondir+icon_name+".png"
-        icon_width, icon_height = get_image_size(filename)
-        pixels_per_mm = 6
-        if small:
-            icon_width = 0.4*icon_width
-            ss.add_picture(filename,round(left-icon_width/pixels_per_mm),top,Mm(12),Mm(12))
-        else:
-            ss.add_picture(filename,round(left-icon_width/pixels_per_mm),top,Mm(34),Mm(34))
-    except:
-        logger.warning("Could not find icon {}".format(icondir+icon_name+'.png'))
+    logger.debug("adding icon <{}> at ({},{})".format(icon_name,left,top))
+    found = icons.icon(icon_name)
+    if found is None:
+        return
+    blob, icon_width, _icon_height = found
+    pixels_per_mm = 6
+    if small:
+        icon_width = 0.4*icon_width
+        ss.add_picture(io.BytesIO(blob),round(left-icon_width/pixels_per_mm),top,Mm(12),Mm(12))
+    else:
+        ss.add_picture(io.BytesIO(blob),round(left-icon_width/pixels_per_mm),top,Mm(34),Mm(34))
     return
 
-logger.info("Importing excel file "+excel_file)
-all_df = pd.read_excel(open(excel_file,'rb'),header=8,usecols="A:S")
+all_df = read_insights(excel_file, header_row=9, usecols="A:S",
+                       text_columns=[("wtlma","Want to Learn More About"),("ai","Action Items")],
+                       normalizer=synonym_normalizer)
+
+logger.debug("Indexing the months")
+date_index = DateIndex(all_df)
 
-logger.debug("Adding structured columns")
-all_df.insert(loc=0,column='date',value=all_df['Visit Date'].apply(make_date))
-all_df.insert(loc=1,column='wtlma',value=all_df['Want to Learn More About'].apply(tidy_text))
-all_df.insert(loc=2,column='ai',value=all_df['Action Items'].apply(tidy_text))
+logger.debug("Building keyword incidence matrix")
+kwd_incidence = KeywordIncidence(all_df, ["wtlma","ai"], kwd_matcher)
 
 
 ## Given the month and year, calc the number of the previous few months
@@ -615,7 +546,8 @@ LAYOUT_TITLE_AND_SUBTITLE      = 4
 LAYOUT_BLANK                   = 5
 
 ## Open up the source presentation
-prs = Presentation('GCA_Centre_Insights_Month-Year - ctr.pptx')
+template_file = 'GCA_Centre_Insights_Month-Year - ctr.pptx'
+prs = open_template(template_file)
 this_month = calendar.month_name[mm]
 earliest_month = calendar.month_name[mm_minus_2]
 logger.info("Creating presentation for %s" % (this_month))
@@ -625,7 +557,7 @@ logger.info("Creating presentation for %s" % (this_month))
 ## Build Top interests and industries for last 6 months
 ################################################
 logger.info(">>>> Top 5 interests, top 3 industries, and their top interests, by centre, for last 6 months")
-df_6months = dataframe_for_6months(all_df, year=yyyy, month=mm)
+df_6months = dataframe_for_6months(date_index, year=yyyy, month=mm)
 
 #build a dictionary of dataframes subsetted by centre, a dictionary of keywords by centre,
 #and a dict of top 3 industries per centre and their keywords (where the key is a tuple of (centre, industry) )
@@ -662,6 +594,7 @@ file_donut_ctr_ind_vols = file_donut_pie_for_industries(ctr_industry_counts,cent
 logger.info("Setting the title ")
 s = prs.slides[0]
 slide_shapes=s.shapes
+placeholders = PlaceholderIndex(slide_shapes,"Centre slide")
 #Update the title
 title_frame = slide_shapes.title.text_frame
 title_frame.clear()
@@ -679,7 +612,7 @@ left_pos=[Mm(180),Mm(210),Mm(240),Mm(270),Mm(299)]   #distances to centre of ico
 #First, the top interests for PA
 for col,p in enumerate(kwd_counts_6m_ctr[which_ctr].most_common(5)):
     # p is (keyword: count) for each of the keywords, so p[0] is the keyword itself
-    replace_text_in_shape(slide_shapes,"interest-{}".format(col),p[0],"Centre slide")
+    replace_text_in_shape(placeholders,"interest-{}".format(col),p[0])
     add_icon(slide_shapes,p[0],left=left_pos[col],top=Mm(59),small=True)
 #Next, the top industries with their interests for this centre - industry_counts_6m[c] is already ordered highest->lowest count
 n=0  #count how many displayed - need to do this separately from the loop count, as we ignore "Other" as an industry group
@@ -687,7 +620,7 @@ for ind in industry_counts_6m[which_ctr].index:
     if (ind!="Other"):
         logger.debug("For this centre, industry <%i> is <%s>" %(n,ind))
         #Write the list of top interests for this industry
-        idx = find_text_in_shapes(slide_shapes,"industry-{}".format(n))
+        idx = placeholders.find("industry-{}".format(n))
         if (idx>=0):
             write_top_keywords(slide_shapes[idx].text_frame,
                                ind,
@@ -703,9 +636,8 @@ for ind in industry_counts_6m[which_ctr].index:
 ################################################
 ## Close the source presentation
 ################################################
+placeholders.report_unused()
 logger.info("Saving Powerpoint file for "+this_month)
-prs.save('GCA_Centre_Insights_'+this_month+'-'+str(yyyy)+"-"+which_ctr+'.pptx')
-## Close any open figures
-plt.close("all")
+save_deck(prs, 'GCA_Centre_Insights_'+this_month+'-'+str(yyyy)+"-"+which_ctr+'.pptx')
 logger.info("...and we're done!")
 for h in list(logger.handlers): logger.removeHandler(h)   # may be several here if we've crashed sometimes
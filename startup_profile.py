@@ -0,0 +1,95 @@
+""" Where the time goes before a script gets down to work: its imports, and each stage of starting up.
+
+    excel_to_ppt.py -w and count_word.py spend nearly all their time starting up: importing pandas and
+    friends, reading the ini file and reading the (cached) workbook.  StartupProfile times each module
+    imported after it is made, by wrapping builtins.__import__, and the stages the script marks with
+    stage().  report() prints the total, each stage, and the slowest imports, with the time of each
+    including the modules it imported in turn and of its own, as python -X importtime does.  It must be
+    made before the imports it is to time, and times nothing (and prints nothing) if not enabled.
+
+    Typical usage, at the top of a script:
+        import sys
+        from startup_profile import StartupProfile
+        startup = StartupProfile(enabled="--startup-profile" in sys.argv)
+        import pandas as pd
+        ...
+        startup.stage("imports")
+        ...
+        startup.stage("read the workbook")
+        startup.report()
+"""
+import builtins
+import logging
+import sys
+import time
+
+logger = logging.getLogger("insights.startup")
+
+class StartupProfile(object):
+    """Times the imports and the stages of a script's start-up
+
+       Parameters
+       ----------
+       enabled : bool
+         Whether to time anything.  Default is True.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.start = self.last = time.perf_counter()
+        self.stages = []      # (name, seconds) in order
+        self.imports = {}     # module name -> [seconds including the modules it imported, seconds of its own]
+        self.nesting = []     # for each import under way, the seconds taken by the imports within it so far
+        self.original_import = builtins.__import__
+        if enabled:
+            builtins.__import__ = self._import
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # Time the first import of a module by its full name; relative imports count towards the module doing them
+        if level or name in sys.modules:
+            return self.original_import(name, globals, locals, fromlist, level)
+        self.nesting.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            secs = time.perf_counter()-start
+            within = self.nesting.pop()
+            if self.nesting:
+                self.nesting[-1] += secs
+            times = self.imports.setdefault(name, [0.0, 0.0])
+            times[0] += secs
+            times[1] += secs-within
+
+    def stage(self, name):
+        """Mark the end of a stage of start-up, which took the time since the last stage (or since this was made)
+        """
+        now = time.perf_counter()
+        if self.enabled:
+            self.stages.append((name, now-self.last))
+        self.last = now
+
+    def stop(self):
+        """Stop timing imports
+        """
+        if builtins.__import__ == self._import:
+            builtins.__import__ = self.original_import
+
+    def report(self, top=15):
+        """Stop timing imports and print the time each stage took, and the top slowest imports
+           Returns the seconds since this was made, or None if not enabled
+        """
+        self.stop()
+        if not self.enabled:
+            return None
+        total = time.perf_counter()-self.start
+        print("Startup took %.3fs:" % total)
+        for name, secs in self.stages:
+            print("  %7.3fs  %s" % (secs, name))
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][0], reverse=True)[:top]
+        if slowest:
+            print("Slowest imports (seconds including the modules they import, and of their own):")
+            for name, (secs, own) in slowest:
+                print("  %7.3fs %7.3fs  %s" % (secs, own, name))
+        logger.debug("%i modules imported at startup" % len(self.imports))
+        return total
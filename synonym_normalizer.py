@@ -0,0 +1,87 @@
+""" Token-level synonym normalisation for the free-text columns of the Insights spreadsheet.
+
+    The [synonyms] section of excel_to_ppt.ini is compiled once into a trie of its phrases,
+    which is then written out as a single regex anchored on word boundaries, e.g.
+        \b(?:f(?:c|lex(?:\ capacity|ible\ c(?:apacity|onsumption)))|...)\b
+    so each cell is rewritten in one left-to-right pass, always taking the longest synonym
+    phrase that starts at the current word, without trying every synonym at every position.  Only whole words are ever
+    replaced, so the "fc" synonym for flexcapacity no longer rewrites the inside of other
+    words, as the old str.replace() loop did.
+
+    Typical usage:
+        normalizer = SynonymNormalizer(synonym_list)     # synonym_list maps synonym -> root word
+        all_df['wtlma'] = normalizer.tidy_series(all_df['Want to Learn More About'])
+"""
+import re
+import pandas as pd
+
+punctuation = re.compile('[\n&@,.:-]')   # characters tidy_text turns into spaces
+END = None                               # trie key marking the end of a complete synonym phrase
+
+def trie_regex(node):
+    """Return the regex source matching every phrase in the character trie 'node', where a
+       longer phrase is always tried before any shorter phrase that is a prefix of it
+    """
+    alts = [re.escape(ch)+trie_regex(child) for ch,child in sorted((k,v) for k,v in node.items() if k is not END)]
+    if not alts:
+        return ''
+    body = alts[0] if len(alts)==1 else '(?:'+'|'.join(alts)+')'
+    if END in node:
+        body = '(?:'+body+')?'     # greedy, so the longer phrase wins if its word boundary matches
+    return body
+
+class SynonymNormalizer(object):
+    """Replace synonyms (or common mis-spellings) by their root word, whole words only
+
+       Parameters
+       ----------
+       synonym_list : dict(str -> str)
+         Maps each synonym phrase, e.g. "flex capacity", to the root word that replaces it,
+         e.g. "flexcapacity".
+    """
+
+    def __init__(self, synonym_list):
+        # phrases are matched against tidied text, so single-space them the same way
+        self.root_of = {" ".join(k.split()): v for k,v in synonym_list.items() if k.strip()}
+        trie = {}
+        for phrase in self.root_of:
+            node = trie
+            for ch in phrase:
+                node = node.setdefault(ch, {})
+            node[END] = True
+        if trie:
+            self.pattern = re.compile(r'\b(?:{0})\b'.format(trie_regex(trie)))
+        else:
+            self.pattern = None
+
+    def _root(self, match):
+        return self.root_of[match.group(0)]
+
+    def replace_synonyms(self, text):
+        """Replace every synonym phrase in the (already tidied) text by its root word
+           Returns the new text
+        """
+        if self.pattern is None:
+            return text
+        return self.pattern.sub(self._root, text)
+
+    def _tidy_lowered(self, cell):
+        cell = punctuation.sub(' ',cell)
+        cell = " ".join(cell.split())   # idiom to turn multiple spaces between words into single spaces
+        return self.replace_synonyms(cell)
+
+    def tidy_text(self, cell_val):
+        """Standardises the text in a cell: removes lots of punctuation, and replaces synonyms by their root word
+           Returns the tidied text
+        """
+        if type(cell_val) is str:
+            return self._tidy_lowered(cell_val.lower())
+        return ""
+
+    def tidy_series(self, series):
+        """tidy_text() for a whole Series at once.  Non-string cells become "".
+           Returns a Series of tidied text with the same index
+        """
+        is_text = series.map(lambda v: type(v) is str).astype(bool)
+        text = series.where(is_text, "").astype(object).str.lower()
+        return text.map(self._tidy_lowered)
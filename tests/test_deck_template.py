@@ -0,0 +1,51 @@
+""" save_deck against prs.save, and move_slide, on a deck from the monthly template
+"""
+import io
+import os
+import zipfile
+
+from pptx import Presentation
+
+from deck_template import TemplateCache, move_slide, save_deck
+
+template = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "GCA_Customer_Insights_Month-Year.pptx")
+
+def members(blob):
+    with zipfile.ZipFile(io.BytesIO(blob)) as deck:
+        return [(info.filename, info.compress_type, deck.read(info)) for info in deck.infolist()]
+
+def test_save_deck():
+    prs = TemplateCache().presentation(template)
+    prs.slides[2].shapes.title.text_frame.text = "Changed"
+    saved, stored = io.BytesIO(), io.BytesIO()
+    prs.save(saved)
+    size = save_deck(prs, stored, store_media=True)
+    assert size == len(stored.getvalue())
+
+    old, new = members(saved.getvalue()), members(stored.getvalue())
+    assert [(name, blob) for name, _, blob in old] == [(name, blob) for name, _, blob in new]
+    pictures = [compress for name, compress, _ in new if name.endswith((".png", ".jpeg"))]
+    assert pictures and all(compress == zipfile.ZIP_STORED for compress in pictures)
+    assert all(compress == zipfile.ZIP_DEFLATED for name, compress, _ in new if name.endswith(".xml"))
+
+def test_copies_are_independent():
+    cache = TemplateCache()
+    first, second = cache.presentation(template), cache.presentation(template)
+    first.slides[2].shapes.title.text_frame.text = "Changed"
+    assert second.slides[2].shapes.title.text_frame.text != "Changed"
+    assert cache.presentation(template).slides[2].shapes.title.text_frame.text != "Changed"
+
+def test_move_slide():
+    prs = TemplateCache().presentation(template)
+    before = [slide.slide_id for slide in prs.slides]
+    new = prs.slides.add_slide(prs.slide_layouts.get_by_name("Title Only"))
+    assert move_slide(prs, new, 3)
+    assert [slide.slide_id for slide in prs.slides] == before[:2]+[new.slide_id]+before[2:]
+    assert move_slide(prs, prs.slides[0], len(before)+1)      # an existing slide, to the end
+    assert [slide.slide_id for slide in prs.slides] == before[1:2]+[new.slide_id]+before[2:]+before[:1]
+
+    saved = io.BytesIO()
+    prs.save(saved)
+    assert [slide.slide_id for slide in Presentation(saved).slides] == \
+        [slide.slide_id for slide in prs.slides]
@@ -0,0 +1,45 @@
+""" FastWordCloud against WordCloud.generate_from_frequencies, pixel for pixel, for a fixed random_state
+"""
+import importlib
+import os
+from random import Random
+
+import numpy as np
+import pytest
+import wordcloud
+from wordcloud import WordCloud
+
+import fast_wordcloud
+from fast_wordcloud import FastWordCloud
+
+font_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fonts", "Arial", "arial.ttf")
+
+rng = Random(2018)
+frequencies = {word: rng.randint(1, 60) for word in
+               ["synergy", "aruba", "iot", "hybrid it", "3par", "gen-z", "simplivity", "nimble", "oneview",
+                "composable", "edge", "ai", "blockchain", "security", "cloud", "storage", "networking",
+                "hpc", "memory-driven", "greenlake", "pointnext", "financial services", "apollo", "synergy 12000"]}
+
+def pixels(cls, **kwargs):
+    wc = cls(font_path=font_path, width=400, height=120, background_color="white", random_state=1,
+             **kwargs).generate_from_frequencies(frequencies)
+    wc.recolor(random_state=3)
+    return np.asarray(wc.to_image())
+
+@pytest.mark.parametrize("kwargs", [dict(prefer_horizontal=1.0, relative_scaling=0.7, max_font_size=60),
+                                    dict(prefer_horizontal=0.8, max_font_size=40),
+                                    dict(relative_scaling=0.5)])
+def test_same_pixels(kwargs):
+    FastWordCloud.layouts.clear()
+    expected = pixels(WordCloud, **kwargs)
+    assert np.array_equal(pixels(FastWordCloud, **kwargs), expected)
+    assert np.array_equal(pixels(FastWordCloud, **kwargs), expected)        # the layout reused
+
+def test_other_wordcloud_versions_refused(monkeypatch):
+    monkeypatch.setattr(wordcloud, "__version__", "1.10.0")
+    try:
+        with pytest.raises(ImportError):
+            importlib.reload(fast_wordcloud)
+    finally:
+        monkeypatch.undo()
+        importlib.reload(fast_wordcloud)
@@ -0,0 +1,67 @@
+""" DateIndex against the boolean month masks it replaced
+"""
+import pandas as pd
+
+from insights_data import DateIndex, month_start, add_months
+
+df = pd.DataFrame({"date": pd.to_datetime(["2018-06-15", "2017-12-31", None, "2018-01-01", "2018-06-01",
+                                           "2018-05-31", None, "2018-06-30 23:00", "2018-07-01"], format="ISO8601"),
+                   "n": range(9)},
+                  index=[5, 3, 8, 1, 7, 0, 2, 6, 4])
+
+def masked(year, month, count=1):
+    first = month_start(*add_months(year, month, 1-count))
+    return df.loc[(df.date >= first) & (df.date < month_start(*add_months(year, month, 1)))]
+
+def test_month_matches_masks_in_spreadsheet_order():
+    date_index = DateIndex(df)
+    for year, month in [(2018,6), (2018,1), (2017,12), (2018,7), (2018,5), (2018,3), (2016,1), (2019,1)]:
+        pd.testing.assert_frame_equal(date_index.month(year, month), masked(year, month))
+    assert list(date_index.month(2018,6).n) == [0, 4, 7]
+
+def test_months_across_a_year_end():
+    date_index = DateIndex(df)
+    pd.testing.assert_frame_equal(date_index.months(2018, 1, count=2), masked(2018, 1, count=2))
+    pd.testing.assert_frame_equal(date_index.months(2018, 6, count=6), masked(2018, 6, count=6))
+
+def test_spreadsheet_is_kept_as_it_is():
+    assert DateIndex(df).df is df
+
+def test_no_dates():
+    empty = DateIndex(pd.DataFrame({"date": pd.to_datetime([None, None])}))
+    assert len(empty.month(2018, 6)) == 0
+
+def write_workbook(path):
+    import datetime
+    import openpyxl
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["Visit Date", "Want to Learn More About", "Action Items", "Objectives", "Ctr", "Industry",
+                  "Account Name", "Account Type", "Partner / Customer", "Customer Overall Comments"])
+    sheet.append([datetime.datetime(2018, 6, 4), "Synergy, aruba", "IoT", None, "PA", "Mfg", "Acme", "Direct",
+                  "Customer", "Great demo"])
+    sheet.append(["Jun 12, 2018", None, "3PAR", "simplivity", "H", "Energy", 3141, "Partner", "Partner", 5])
+    sheet.append(["TBD", "gen-z", None, None, "LON1", None, 2.5, None, "Customer", None])
+    sheet.append([None, None, None, "hybrid it", "NY1", "Mfg", True, "Direct", "Customer", "ok"])
+    sheet.append([datetime.datetime(2018, 5, 30, 14, 30), "edge", "edge", None, "SNG", "Mfg",
+                  datetime.datetime(2017, 1, 2), "Direct", "Customer", "fine"])
+    workbook.save(path)
+
+def test_cached_frame_is_the_same_as_read(tmp_path):
+    from synonym_normalizer import SynonymNormalizer
+    from insights_data import read_insights
+
+    excel_file = str(tmp_path/"Insights.xlsx")
+    write_workbook(excel_file)
+    options = dict(header_row=1, usecols="A:J", normalizer=SynonymNormalizer({"synergy": "synergy", "3par": "3par"}),
+                   text_columns=[("wtlma","Want to Learn More About"), ("actions","Action Items")])
+    for streaming in (False, True):
+        read = read_insights(excel_file, use_cache=False, streaming=streaming, **options)
+        assert read["Account Name"].map(type).nunique() > 1 and read["Visit Date"].map(type).nunique() > 1
+        written = read_insights(excel_file, streaming=streaming, **options)
+        cached = read_insights(excel_file, streaming=streaming, **options)
+        assert list(tmp_path.glob("*.parquet"))
+        pd.testing.assert_frame_equal(written, read)
+        pd.testing.assert_frame_equal(cached, read)
+        for column in read.columns[read.dtypes == object]:
+            assert list(cached[column].map(type)) == list(read[column].map(type))
@@ -0,0 +1,45 @@
+""" KeywordMatcher and KeywordIncidence against the per-keyword regex counts they replaced
+"""
+from collections import Counter
+
+import pandas as pd
+
+from keyword_matcher import KeywordMatcher, KeywordIncidence
+
+vocab = ["synergy", "aruba", "iot", "3par", "gen-z", "oneview"]
+
+df = pd.DataFrame({"wtlma": ["synergy and aruba", "", "iiot not iot", "gen-z memory", "synergy synergy", "3par"],
+                   "actions": ["oneview demo", "aruba", "", "", "follow up on iot", "3parts"]},
+                  index=[10, 11, 12, 13, 14, 15])
+
+def regex_counts(frame, fields, keywords):
+    # What kwds_in_wtlma_actions() used to do: a '\bkwd\b' regex per keyword down each column
+    counts = Counter()
+    for kwd in keywords:
+        found = pd.Series(False, index=frame.index)
+        for field in fields:
+            found = found | frame[field].str.contains(r'\b{0}\b'.format(kwd))
+        counts[kwd] = int(found.sum())
+    return counts
+
+def test_matcher_counts_match_regex():
+    assert KeywordMatcher(vocab).keyword_counts([df.wtlma, df.actions]) == regex_counts(df, ["wtlma","actions"], vocab)
+
+def test_incidence_counts_match_regex_for_subsets():
+    incidence = KeywordIncidence(df, ["wtlma","actions"], KeywordMatcher(vocab))
+    for subset in (df, df.iloc[1:4], df.loc[[15, 10]], df.iloc[0:0]):
+        for fields in (["wtlma"], ["actions"], ["wtlma","actions"]):
+            assert incidence.keyword_counts(subset, fields) == regex_counts(subset, fields, vocab)
+
+def test_incidence_rows_with_keyword():
+    incidence = KeywordIncidence(df, ["wtlma","actions"], KeywordMatcher(vocab))
+    found = incidence.rows_with_keyword(df, ["wtlma","actions"], "aruba")
+    assert list(found.index) == list(df.index)
+    assert list(df.index[found]) == [10, 11]
+
+def test_incidence_has_keywords_compares_by_value():
+    incidence = KeywordIncidence(df, ["wtlma"], KeywordMatcher(vocab))
+    assert incidence.has_keywords(list(vocab))
+    assert incidence.has_keywords(vocab + ["aruba"])       # repeats are ignored
+    assert not incidence.has_keywords(vocab[:-1])
+    assert not incidence.has_keywords(list(reversed(vocab)))
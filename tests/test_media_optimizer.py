@@ -0,0 +1,72 @@
+""" optimize_media on a deck from the template with a picture shared by two slides, a copy of it that only
+    differs in its metadata, and a hyperlink (an external relationship)
+"""
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image, PngImagePlugin
+from pptx import Presentation
+from pptx.parts.image import ImagePart
+from pptx.util import Inches
+
+from media_optimizer import optimize_media
+
+template = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "GCA_Customer_Insights_Month-Year.pptx")
+
+def png(text=None):
+    pixels = np.zeros((400, 400, 3), np.uint8)
+    pixels[100:300, 100:300] = (1, 169, 130)
+    info = PngImagePlugin.PngInfo()
+    if text:
+        info.add_text("Comment", text)
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, format="PNG", pnginfo=info)
+    return out.getvalue()
+
+def image_parts(prs):
+    return {part for part in prs.part.package.iter_parts() if isinstance(part, ImagePart)}
+
+@pytest.fixture
+def deck():
+    prs = Presentation(template)
+    layout = prs.slide_layouts[-1]
+    first = prs.slides.add_slide(layout)
+    first.shapes.add_picture(io.BytesIO(png()), Inches(1), Inches(1), Inches(1), Inches(1))
+    second = prs.slides.add_slide(layout)
+    second.shapes.add_picture(io.BytesIO(png()), Inches(1), Inches(1), Inches(2), Inches(2))
+    second.shapes.add_picture(io.BytesIO(png("made by hand")), Inches(4), Inches(1), Inches(2), Inches(2))
+    link = second.shapes.add_textbox(Inches(1), Inches(4), Inches(3), Inches(1))
+    link.text_frame.text = "insights"
+    link.click_action.hyperlink.address = "https://example.com/insights"
+    return prs, first, second
+
+def test_shared_and_duplicate_pictures(deck):
+    prs, first, second = deck
+    shared = first.shapes[-1].image
+    assert second.shapes[-3].image.sha1 == shared.sha1      # python-pptx shares the part between the slides
+    before = len(image_parts(prs))
+
+    optimize_media(prs, dpi=100)
+    saved = io.BytesIO()
+    prs.save(saved)
+    reopened = Presentation(saved)
+
+    # the copy with the text chunk is the same picture once re-encoded, so it is dropped; the rest remain
+    assert len(image_parts(reopened)) == before-1
+    first, second = reopened.slides[-2], reopened.slides[-1]
+    pictures = [first.shapes[-1], second.shapes[-3], second.shapes[-2]]
+    assert len({picture.image.sha1 for picture in pictures}) == 1
+    shown = Image.open(io.BytesIO(pictures[0].image.blob))
+    assert shown.size == (200, 200)                           # the largest it is shown at, 2 inches at 100 dpi
+    assert shown.convert("RGB").getpixel((100, 100)) == (1, 169, 130)
+
+def test_external_relationship_kept(deck):
+    prs, first, second = deck
+    optimize_media(prs, dpi=100)
+    saved = io.BytesIO()
+    prs.save(saved)
+    link = Presentation(saved).slides[-1].shapes[-1]
+    assert link.click_action.hyperlink.address == "https://example.com/insights"
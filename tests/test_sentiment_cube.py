@@ -0,0 +1,66 @@
+""" SentimentCube.total and table against filtering the frame for each combination
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from sentiment_cube import SentimentCube
+
+keywords = ["synergy", "aruba", "iot"]
+months = [(2018,5), (2018,6)]
+centres = ["PA", "H"]
+df = pd.DataFrame({"date": pd.to_datetime(["2018-05-03", "2018-05-20", "2018-06-01", "2018-06-30", "2018-06-10",
+                                           "2018-04-30", "2018-06-12", "2018-06-15"]),
+                   "Ctr": ["PA", "H", "PA", "H", "PA", "PA", "LON1", "H"],
+                   "Industry": ["Mfg", "Energy", "Mfg", None, "Energy", "Mfg", "Mfg", "Mfg"],
+                   "sentiment": [0.5, -0.2, 0.8, 0.1, float("nan"), 0.9, 0.7, -0.6]})
+hits = np.array([[1, 1, 0],
+                 [1, 0, 0],
+                 [0, 1, 1],
+                 [1, 0, 1],
+                 [1, 1, 1],
+                 [1, 0, 0],
+                 [1, 0, 0],
+                 [0, 0, 1]], dtype=bool)
+
+def filtered(month=None, centre=None, industry=None, keyword=None):
+    # The mean and count the slow way, a mask per condition
+    used = df["date"].between(pd.Timestamp(2018,5,1), pd.Timestamp(2018,6,30,23,59)) & df["Ctr"].isin(centres)
+    used &= df["sentiment"].notna()
+    if month is not None:
+        used &= (df["date"].dt.year == month[0]) & (df["date"].dt.month == month[1])
+    if centre is not None:
+        used &= df["Ctr"] == centre
+    if industry is not None:
+        used &= df["Industry"].fillna("Unknown") == industry
+    selected = [(score, row) for score, row, use in zip(df["sentiment"], hits, used) if use]
+    values = [score for score, row in selected for n, kwd in enumerate(keywords)
+              if row[n] and (keyword is None or kwd == keyword)]
+    return (sum(values)/len(values) if values else float("nan")), len(values)
+
+def same(a, b):
+    return a[1] == b[1] and (math.isclose(a[0], b[0]) or (math.isnan(a[0]) and math.isnan(b[0])))
+
+def test_total_matches_filtering():
+    cube = SentimentCube(df, hits, keywords, months, centres)
+    for month in [None] + months:
+        for centre in [None] + centres:
+            for industry in [None, "Mfg", "Energy", "Unknown"]:
+                for keyword in [None] + keywords:
+                    assert same(cube.total(month, centre, industry, keyword),
+                                filtered(month, centre, industry, keyword)), (month, centre, industry, keyword)
+
+def test_unknown_labels_have_no_comments():
+    cube = SentimentCube(df, hits, keywords, months, centres)
+    mean, count = cube.total(centre="LON1")
+    assert count == 0 and math.isnan(mean)
+    assert cube.total(month=(2018,4))[1] == 0
+
+def test_table_matches_total():
+    cube = SentimentCube(df, hits, keywords, months, centres)
+    means, counts = cube.table("keyword", "centre", industry="Mfg")
+    assert list(means.index) == keywords and list(means.columns) == centres
+    for kwd in keywords:
+        for ctr in centres:
+            assert same((means.loc[kwd, ctr], counts.loc[kwd, ctr]), cube.total(centre=ctr, industry="Mfg", keyword=kwd))
@@ -0,0 +1,40 @@
+""" top_n, and the hit and miss counts of SentimentScores
+"""
+from sentiment_scores import SentimentScores, top_n
+
+comments = ["good", "great", None, "bad", "great", "awful", "fine", "meh"]
+scores = [0.4, 0.9, 0.99, -0.5, 0.9, -0.8, float("nan"), 0.4]
+
+def test_top_n_largest_and_smallest():
+    assert top_n(comments, scores, 2) == [("great", 0.9), ("good", 0.4)]
+    assert top_n(comments, scores, 2, largest=False) == [("awful", -0.8), ("bad", -0.5)]
+
+def test_top_n_skips_non_text_nan_and_repeats():
+    picked = top_n(comments, scores, 10)
+    assert [comment for comment, _ in picked] == ["great", "good", "meh", "bad", "awful"]
+
+def test_top_n_ties_go_to_the_first():
+    assert top_n(["a", "b", "c"], [0.5, 0.5, 0.5], 2) == [("a", 0.5), ("b", 0.5)]
+
+class Analyzer(object):
+    scorer = "test"
+
+    def polarity_scores(self, text):
+        return {"neg": 0.0, "neu": 1.0, "pos": 0.0, "compound": len(text)/10}
+
+def test_repeats_of_new_comments_are_misses(tmp_path):
+    store = SentimentScores(str(tmp_path/"scores.sqlite"), analyzer=Analyzer())
+    assert [s["compound"] for s in store.scores(["ab", "ab", "abc"])] == [0.2, 0.2, 0.3]
+    assert (store.hits, store.misses) == (0, 3)
+    store.scores(["ab"])
+    assert (store.hits, store.misses) == (1, 3)
+    store.close()
+    again = SentimentScores(str(tmp_path/"scores.sqlite"), analyzer=Analyzer())
+    again.scores(["ab", "abc"])
+    assert (again.hits, again.misses) == (2, 0)
+
+def test_unwritable_store_keeps_scores_in_memory(tmp_path):
+    (tmp_path/"file").write_text("not a directory")
+    store = SentimentScores(str(tmp_path/"file"/"scores.sqlite"), analyzer=Analyzer())
+    assert store.db is None
+    assert store.polarity_scores("abcd")["compound"] == 0.4
@@ -0,0 +1,32 @@
+""" SynonymNormalizer.tidy_text
+"""
+from synonym_normalizer import SynonymNormalizer
+
+normalizer = SynonymNormalizer({"fc": "flexcapacity", "flex capacity": "flexcapacity",
+                                "flexible capacity": "flexcapacity", "azure stack": "azurestack",
+                                "simplivity 380": "simplivity380"})
+
+def test_punctuation_case_and_spaces():
+    assert normalizer.tidy_text("Synergy,  OneView:\nand Aruba-Central & more.") == \
+           "synergy oneview and aruba central more"
+
+def test_synonyms_are_replaced_by_their_root():
+    assert normalizer.tidy_text("Azure Stack and Flex Capacity") == "azurestack and flexcapacity"
+    assert normalizer.tidy_text("FC") == "flexcapacity"
+
+def test_only_whole_words_are_replaced():
+    assert normalizer.tidy_text("fcoe and sfc") == "fcoe and sfc"
+
+def test_longest_phrase_wins():
+    assert normalizer.tidy_text("flexible capacity, simplivity 380 and simplivity") == \
+           "flexcapacity simplivity380 and simplivity"
+
+def test_non_text_cells_become_empty():
+    assert normalizer.tidy_text(None) == ""
+    assert normalizer.tidy_text(float("nan")) == ""
+    assert normalizer.tidy_text(42) == ""
+
+def test_series_matches_cell_by_cell():
+    import pandas as pd
+    cells = pd.Series(["Flex Capacity", None, "azure  stack.", 3])
+    assert list(normalizer.tidy_series(cells)) == [normalizer.tidy_text(cell) for cell in cells]
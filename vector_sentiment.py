@@ -0,0 +1,270 @@
+""" VADER's sentiment scores for a batch of comments at once, with the rules applied to NumPy arrays.
+
+    SentimentIntensityAnalyzer.polarity_scores() goes through each comment a word at a time in Python.
+    For every word it looks that word and up to three words around it up in its lexicon, booster and
+    negation lists again.  That per-word loop is what the first scoring of a big backlog spends its time on.
+
+    VectorSentimentAnalyzer splits a whole batch of comments into words just once, the way VADER does.
+    It numbers each distinct word.  Everything VADER asks about a word is looked up once per distinct
+    word, into arrays indexed by that number: the word's valence, whether it is in the lexicon, whether
+    it is a booster or a negation.  VADER's rules are then applied to every word of the batch together,
+    as passes over the word numbers shifted by one, two and three places.  The rules are:
+      - "no" and the other negations,
+      - boosters and dampeners up to three words before a word,
+      - ALL CAPS emphasis,
+      - "least" and "but",
+      - emphasis from exclamation and question marks.
+    Only the idioms ("kind of", "the bomb", ...) are checked a word at a time, and only next to the
+    words they are made of.
+
+    The scores match polarity_scores() for nearly every comment.  benchmarks.py's vector_sentiment
+    benchmark reports how many match on a workbook.  The one known difference is after a "but".
+    VADER means to halve the valence of every word before the first "but" and add half to every word
+    after it.  But it finds each word by its valence, so when two words have the same valence one of
+    them can be changed twice and the other not at all.  Here every word is changed once, as intended.
+
+    It has polarity_scores(text) like VADER, and also polarity_scores_batch(texts).  SentimentScores can
+    use it as its analyzer and scores new comments a chunk at a time with it.  Its scorer name keeps its
+    scores apart from VADER's in the store.
+
+    Typical usage:
+        analyzer = VectorSentimentAnalyzer()
+        scores = analyzer.polarity_scores_batch(comments)     # a list of dicts, as polarity_scores() gives
+        sentiment = SentimentScores("tmp/sentiment_scores.sqlite", analyzer=analyzer)
+"""
+import string
+
+import numpy as np
+
+from sentiment_scores import score_names, vader_scorer
+
+version = 1        # change whenever the scores change, so that scores stored by an older version are not used
+
+rule_words = ("", "no", "or", "nor", "never", "so", "this", "without", "doubt", "least", "at", "very", "but",
+              "kind", "of")       # words the rules look for; "" stands in for no word, before or after a text
+
+def strip_punctuation(token):
+    """Strip the punctuation from both ends of token, as VADER does, unless that leaves only two characters or
+       fewer (so emoticons such as ":)" are kept)
+       Returns the stripped token
+    """
+    stripped = token.strip(string.punctuation)
+    if len(stripped) <= 2:
+        return token
+    return stripped
+
+class VectorSentimentAnalyzer(object):
+    """Scores many comments at once, with the lexicon and rules of VADER's SentimentIntensityAnalyzer
+
+       Parameters
+       ----------
+       analyzer : SentimentIntensityAnalyzer
+         The VADER analyzer whose lexicon and emoji descriptions are used.  Default is a new one.
+    """
+
+    def __init__(self, analyzer=None):
+        from vaderSentiment import vaderSentiment as vader
+
+        if analyzer is None:
+            analyzer = vader.SentimentIntensityAnalyzer()
+        self.scorer = "vector %s/%i" % (vader_scorer(), version)
+        self.lexicon = analyzer.lexicon
+        self.emojis = analyzer.emojis
+        self.emoji_chars = set(e for e in self.emojis if len(e) == 1)
+        self.boosters = dict(vader.BOOSTER_DICT)
+        self.negations = set(vader.NEGATE)
+        self.special_cases = dict(vader.SPECIAL_CASES)
+        self.c_incr, self.n_scalar = vader.C_INCR, vader.N_SCALAR
+        self.idiom_words = set(word for phrase in list(self.special_cases)+list(self.boosters) if " " in phrase
+                               for word in phrase.split())
+
+        # Every word seen so far gets a number, and an entry in each of these arrays
+        self.vocab = {}
+        self.valence = np.zeros(0)                  # the word's valence in the lexicon, or 0
+        self.in_lexicon = np.zeros(0, dtype=bool)
+        self.booster = np.zeros(0)                  # how much a booster (+) or dampener (-) changes the next words
+        self.is_booster = np.zeros(0, dtype=bool)
+        self.negates = np.zeros(0, dtype=bool)      # a negation, such as "not" or "isn't"
+        self.is_idiom_word = np.zeros(0, dtype=bool)
+        self.ids = dict(zip(rule_words, self._word_ids(rule_words)))
+
+    def _word_ids(self, lowers):
+        # The numbers of lowers (lower case words), numbering and looking up any we haven't seen before
+        vocab = self.vocab
+        known = len(vocab)
+        ids = np.array([vocab.setdefault(word, len(vocab)) for word in lowers], dtype=np.int64)
+        if len(vocab) > known:
+            new = list(vocab)[known:]
+            def grow(array, values, dtype):
+                return np.concatenate([array, np.array(values, dtype=dtype)])
+            self.valence = grow(self.valence, [self.lexicon.get(w, 0.0) for w in new], float)
+            self.in_lexicon = grow(self.in_lexicon, [w in self.lexicon for w in new], bool)
+            self.booster = grow(self.booster, [self.boosters.get(w, 0.0) for w in new], float)
+            self.is_booster = grow(self.is_booster, [w in self.boosters for w in new], bool)
+            self.negates = grow(self.negates, [w in self.negations or "n't" in w for w in new], bool)
+            self.is_idiom_word = grow(self.is_idiom_word, [w in self.idiom_words for w in new], bool)
+        return ids
+
+    def _describe_emojis(self, text):
+        # VADER's replacement of each emoji with its description
+        text_no_emoji = ""
+        prev_space = True
+        for char in text:
+            if char in self.emojis:
+                if not prev_space:
+                    text_no_emoji += ' '
+                text_no_emoji += self.emojis[char]
+                prev_space = False
+            else:
+                text_no_emoji += char
+                prev_space = char == ' '
+        return text_no_emoji
+
+    def _idiom_valence(self, valence, lowers, i, before, after):
+        # VADER's check for the idioms around word i of lowers, which has before words before it in its text and
+        # after words after it
+        words = lowers[i-min(before,3):i+min(after,2)+1]
+        i = min(before,3)
+        onezero = "%s %s" % (words[i-1], words[i])
+        twoonezero = "%s %s %s" % (words[i-2], words[i-1], words[i])
+        twoone = "%s %s" % (words[i-2], words[i-1])
+        threetwoone = "%s %s %s" % (words[i-3], words[i-2], words[i-1])
+        threetwo = "%s %s" % (words[i-3], words[i-2])
+        for seq in (onezero, twoonezero, twoone, threetwoone, threetwo):
+            if seq in self.special_cases:
+                valence = self.special_cases[seq]
+                break
+        if after > 0 and "%s %s" % (words[i], words[i+1]) in self.special_cases:
+            valence = self.special_cases["%s %s" % (words[i], words[i+1])]
+        if after > 1 and "%s %s %s" % (words[i], words[i+1], words[i+2]) in self.special_cases:
+            valence = self.special_cases["%s %s %s" % (words[i], words[i+1], words[i+2])]
+        for n_gram in (threetwoone, threetwo, twoone):
+            if n_gram in self.boosters:
+                valence = valence + self.boosters[n_gram]
+        return valence
+
+    def polarity_scores(self, text):
+        """SentimentIntensityAnalyzer.polarity_scores(text)
+           Returns a dict of score_names -> score
+        """
+        return self.polarity_scores_batch([text])[0]
+
+    def polarity_scores_batch(self, texts):
+        """The scores polarity_scores() gives each of texts (strings), worked out for all of them together
+           Returns a list of dicts of score_names -> score, in the order of texts
+        """
+        # Split the texts into words as VADER's SentiText does, all into one list, and number the words
+        tidied, lengths, tokens = [], [], []
+        for text in texts:
+            if not self.emoji_chars.isdisjoint(text):
+                text = self._describe_emojis(text)
+            text = text.strip()
+            words = [strip_punctuation(token) for token in text.split()]
+            tidied.append(text)
+            lengths.append(len(words))
+            tokens.extend(words)
+        lengths = np.array(lengths, dtype=np.int64)
+        n_texts = len(lengths)
+        doc = np.repeat(np.arange(n_texts), lengths)            # which text each word is in
+        pos = np.arange(len(tokens)) - (np.cumsum(lengths)-lengths)[doc]    # and where in it
+        after = lengths[doc] - pos - 1
+        lowers = [token.lower() for token in tokens]
+        word = self._word_ids(lowers)
+        upper = np.array([token.isupper() for token in tokens], dtype=bool)
+        n_upper = np.bincount(doc, weights=upper, minlength=n_texts)
+        cap_diff = ((n_upper > 0) & (n_upper < lengths))[doc]     # some words of the text are ALL CAPS, not all
+
+        def shifted(values, k, fill):
+            # values[i-k] for each word i (values[i+|k|] if k < 0), or fill where that word is outside i's text
+            out = np.full_like(values, fill)
+            if k > 0:
+                out[k:] = values[:len(values)-k]
+                out[pos < k] = fill
+            else:
+                out[:k] = values[-k:]
+                out[after < -k] = fill
+            return out
+
+        ids = self.ids
+        none = ids[""]
+        p1, p2, p3 = (shifted(word, k, none) for k in (1, 2, 3))
+        n1, n2 = shifted(word, -1, none), shifted(word, -2, none)
+        u1, u2, u3 = (shifted(upper, k, False) for k in (1, 2, 3))
+        in_lexicon, negates = self.in_lexicon, self.negates
+        c_incr, n_scalar = self.c_incr, self.n_scalar
+        so_this = lambda ids_: (ids_ == ids["so"]) | (ids_ == ids["this"])
+
+        # Words in the lexicon get their valence, but boosters, and "kind" of "kind of", stay 0 however they're used
+        skip = self.is_booster[word] | ((word == ids["kind"]) & (n1 == ids["of"]))
+        scored = in_lexicon[word] & ~skip
+        lexicon_valence = self.valence[word]
+        valence = np.where(scored, lexicon_valence, 0.0)
+
+        # "no" before another lexicon word only negates it; a word up to two after "no" (or three, with
+        # "no x or" between) is negated
+        valence[scored & (word == ids["no"]) & in_lexicon[n1]] = 0.0
+        after_no = (p1 == ids["no"]) | (p2 == ids["no"]) | \
+                   ((p3 == ids["no"]) & ((p1 == ids["or"]) | (p1 == ids["nor"])))
+        valence = np.where(scored & after_no, lexicon_valence*n_scalar, valence)
+
+        # ALL CAPS emphasis
+        caps = scored & upper & cap_diff
+        valence = np.where(caps, np.where(valence > 0, valence+c_incr, valence-c_incr), valence)
+
+        # Boosters, dampeners and negations one, two and three words before, in turn, as the sign of the valence
+        # so far decides which way a booster goes
+        for k, prev, prev_upper, damping in ((1, p1, u1, 1.0), (2, p2, u2, 0.95), (3, p3, u3, 0.9)):
+            active = scored & (pos >= k) & ~in_lexicon[prev]
+            boost = np.where(valence < 0, -self.booster[prev], self.booster[prev])
+            boost = boost + np.where(self.is_booster[prev] & prev_upper & cap_diff,
+                                     np.where(valence > 0, c_incr, -c_incr), 0.0)
+            valence = np.where(active, valence+boost*damping, valence)
+            if k == 1:
+                emphasis = np.zeros_like(active)
+                negate = negates[p1]
+            elif k == 2:
+                emphasis = (p2 == ids["never"]) & so_this(p1)
+                negate = ~emphasis & ~((p2 == ids["without"]) & (p1 == ids["doubt"])) & negates[p2]
+            else:
+                emphasis = ((p3 == ids["never"]) & so_this(p2)) | so_this(p1)
+                negate = ~emphasis & ~((p3 == ids["without"]) & ((p2 == ids["doubt"]) | (p1 == ids["doubt"]))) \
+                         & negates[p3]
+            valence = np.where(active & emphasis, valence*1.25, np.where(active & negate, valence*n_scalar, valence))
+            if k == 3:
+                idiom = self.is_idiom_word
+                near_idiom = active & (idiom[word] | idiom[p1] | idiom[p2] | idiom[p3] | idiom[n1] | idiom[n2])
+                for i in np.flatnonzero(near_idiom):
+                    valence[i] = self._idiom_valence(valence[i], lowers, i, pos[i], after[i])
+
+        # "least" before a word negates it, unless it is "at least" or "very least"
+        least = scored & (p1 == ids["least"]) & ~in_lexicon[p1] & (p2 != ids["at"]) & (p2 != ids["very"])
+        valence = np.where(least, valence*n_scalar, valence)
+
+        # Words before the first "but" count for half, and after it for half as much again
+        buts = np.flatnonzero(word == ids["but"])
+        first_but = np.full(n_texts, np.iinfo(np.int64).max)
+        np.minimum.at(first_but, doc[buts], pos[buts])
+        has_but = first_but[doc] < np.iinfo(np.int64).max
+        valence = np.where(has_but & (pos < first_but[doc]), valence*0.5,
+                           np.where(has_but & (pos > first_but[doc]), valence*1.5, valence))
+
+        # VADER's score_valence() for each text, summing its words' valences in the same order
+        total = np.bincount(doc, weights=valence, minlength=n_texts)
+        pos_sum = np.bincount(doc, weights=np.where(valence > 0, valence+1, 0.0), minlength=n_texts)
+        neg_sum = np.bincount(doc, weights=np.where(valence < 0, valence-1, 0.0), minlength=n_texts)
+        neu_count = np.bincount(doc, weights=valence == 0, minlength=n_texts)
+        exclamations = np.minimum([text.count("!") for text in tidied], 4)
+        questions = np.array([text.count("?") for text in tidied])
+        emphasis = exclamations*0.292 + np.where(questions > 3, 0.96, np.where(questions > 1, questions*0.18, 0))
+        total = np.where(total > 0, total+emphasis, np.where(total < 0, total-emphasis, total))
+        compound = np.clip(total/np.sqrt(total*total+15), -1.0, 1.0)
+        more_pos, more_neg = pos_sum > np.fabs(neg_sum), pos_sum < np.fabs(neg_sum)
+        pos_sum = np.where(more_pos, pos_sum+emphasis, pos_sum)
+        neg_sum = np.where(more_neg, neg_sum-emphasis, neg_sum)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weight = pos_sum + np.fabs(neg_sum) + neu_count
+            scores = np.stack([np.fabs(neg_sum/weight), np.fabs(neu_count/weight), np.fabs(pos_sum/weight), compound], 1)
+        scores[lengths == 0] = 0.0
+
+        digits = {"neg": 3, "neu": 3, "pos": 3, "compound": 4}
+        return [{name: round(float(score), digits[name]) for name, score in zip(score_names, row)} for row in scores]